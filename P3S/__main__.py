@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+
+''' Command-line entry point of P3S
+
+ Usage:
+   $ python -m P3S mbed_test --config mbed_conf -D F_SIZE=1024
+   $ python -m P3S mbed_x2_test.py --config mbed_conf --sweep MP_MAX=1,2,3 --sweep F_SIZE=256,512 \\
+                   --jobs 4 --engine codegen --output results.csv
+   $ python -m P3S mbed_test --config mbed_conf --trace run.trace (timeline trace)
+
+ Model is a module name or a file path, and its build function
+ (default: build_model) returns P3S class object. Parameters are
+ variables of the configuration module, overwritten before build.
+ Results (finished cycle, ISR latency, resource occupancy, progress,
+ wall time of each run) are written as JSON or CSV.
+'''
+
+import argparse
+import ast
+import csv
+import importlib
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from P3S import causal
+from P3S import codegen
+from P3S import define_p3s
+from P3S import store
+from P3S import timeline
+
+
+def load_module(model):
+    '''
+    Import model module from module name or file path.
+        [1] model : module name or file path
+    '''
+    if model.endswith(".py") or os.path.sep in model:
+        path = os.path.abspath(model)
+        sys.path.insert(0, os.path.dirname(path))
+        model = os.path.splitext(os.path.basename(path))[0]
+    elif os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+    return importlib.import_module(model)
+
+def parse_value(text):
+    '''
+    Parse parameter value (Python literal or name in define_p3s, ex: TaskPriority.PRIORITY_HIGH).
+        [1] text : value text
+    '''
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        pass
+    obj = define_p3s
+    for name in text.split("."):
+        obj = getattr(obj, name, None)
+        if obj == None:
+            return text
+    return obj
+
+def parse_assign(text):
+    if "=" not in text:
+        raise argparse.ArgumentTypeError("expected NAME=VALUE: %s" % text)
+    name, value = text.split("=", 1)
+    return (name.strip(), value)
+
+def get_points(args):
+    '''
+    Get list of parameters of all runs.
+        [1] args : parsed arguments
+    '''
+    base = {}
+    if args.params:
+        with open(args.params) as f:
+            loaded = json.load(f)
+        if isinstance(loaded, list):
+            return [dict(p, **{n: parse_value(v) for n, v in args.define}) for p in loaded]
+        base.update(loaded)
+    for name, value in args.define:
+        base[name] = parse_value(value)
+    names = [name for name, _ in args.sweep]
+    values = [[parse_value(v) for v in value.split(",")] for _, value in args.sweep]
+    return [dict(base, **dict(zip(names, combo))) for combo in itertools.product(*values)]
+
+def run(job):
+    '''
+    Run one simulation.
+    Return value is dict of result.
+        [1] job : (index, model, build, config, params, options)
+    '''
+    index, model, build, config, params, options = job
+    start = time.time()
+    module = load_module(model)
+    observers = []
+    def collect(sim):
+        if options["engine"] == "codegen":
+            codegen.compile_model(sim)
+        if options["progress"]:
+            observers.append(causal.ProgressCounter(options["progress"]))
+        if options["stall_cycle"]:
+            sim.stall_cycle = options["stall_cycle"]
+            sim.progress = options["progress"]
+        if options["trace"]:
+            path = options["trace"] if index == None else "%s.%d" % (options["trace"], index)
+            observers.append(timeline.TraceRecorder(path))
+        for observer in observers:
+            sim.add_observer(observer)
+        return sim
+    def build_with_options():
+        return collect(getattr(module, build)())
+    def get_metrics(sim):
+        metrics = {}
+        clock = sim.cpu.clock if sim.cpu else sim.hw[0].clock
+        for observer in observers:
+            if isinstance(observer, causal.ProgressCounter):
+                metrics["progress"] = observer.count
+                if sim.finish_cycle:
+                    metrics["throughput_per_ms"] = observer.count / (sim.finish_cycle / clock / 1000.0)
+            elif isinstance(observer, timeline.TraceRecorder):
+                observer.close(sim.finish_cycle)
+                timeline.build_summaries(observer.path)
+        metrics["finish_ms"] = (sim.finish_cycle / clock / 1000.0) if sim.finish_cycle else None
+        return metrics
+    try:
+        result = store.run_point(build_with_options, config, params, options["max_cycle"], get_metrics,
+                                 options["verbose"])
+        result["error"] = None
+    except Exception as e:
+        result = {"error": repr(e)}
+    result["run_time"] = time.time() - start
+    return result
+
+def write_results(rows, path):
+    '''
+    Write results as JSON (default) or CSV (path ends with .csv).
+        [1] rows : list of dict
+        [2] path : output path (None: stdout)
+    '''
+    if path and path.endswith(".csv"):
+        names = []
+        for row in rows:
+            for name in row:
+                if name not in names:
+                    names.append(name)
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, names)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
+        return
+    text = json.dumps(rows, indent=2, default=str)
+    if path:
+        with open(path, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m P3S", description="P3S (Parallel Process Performance Simulator)")
+    parser.add_argument("model", help="model module name or file path")
+    parser.add_argument("--build", default="build_model", help="function to build P3S class object (default: build_model)")
+    parser.add_argument("--config", help="configuration module whose variables are overwritten by parameters")
+    parser.add_argument("-D", "--define", action="append", type=parse_assign, default=[], metavar="NAME=VALUE",
+                        help="override parameter")
+    parser.add_argument("--params", help="JSON file of parameters (dict, or list of dict for runs)")
+    parser.add_argument("--sweep", action="append", type=parse_assign, default=[], metavar="NAME=V1,V2,...",
+                        help="sweep parameter (cartesian product of all sweeps)")
+    parser.add_argument("--jobs", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--engine", choices=("generic", "codegen"), default="generic", help="simulation engine")
+    parser.add_argument("--max-cycle", type=int, help="max cycle of one simulation")
+    parser.add_argument("--progress", metavar="TRANS", help="Trans class name of progress point (throughput)")
+    parser.add_argument("--stall-cycle", type=int, metavar="N",
+                        help="abort as livelock after N cycles without progress (progress point if given)")
+    parser.add_argument("--trace", metavar="PATH", help="write timeline trace (suffixed by run index for sweeps)")
+    parser.add_argument("--verbose", action="store_true", help="print location changes (single run)")
+    parser.add_argument("--store", metavar="DB", help="results store (points already stored are not simulated)")
+    parser.add_argument("--output", "-o", metavar="PATH", help="output file (.json or .csv, default: JSON to stdout)")
+    args = parser.parse_args(argv)
+    if (args.define or args.sweep or args.params) and not args.config:
+        parser.error("--config is required to override parameters")
+    start = time.time()
+    points = get_points(args)
+    options = {"engine": args.engine, "max_cycle": args.max_cycle, "progress": args.progress,
+               "stall_cycle": args.stall_cycle, "trace": args.trace, "verbose": args.verbose and len(points) == 1}
+    jobs = [(None if len(points) == 1 else x, args.model, args.build, args.config, params, options)
+            for x, params in enumerate(points)]
+    results = [None] * len(jobs)
+    result_store = None
+    if args.store:
+        module = load_module(args.model)
+        result_store = store.ResultStore(args.store)
+        model_hash = store.get_model_hash(getattr(module, args.build), args.config)
+        keys = [result_store.add(model_hash, dict(params, _options=options)) for params in points]
+        for x, key in enumerate(keys):
+            results[x] = result_store.get(key)
+    pending = [job for job, result in zip(jobs, results) if result == None]
+    if args.jobs > 1 and len(pending) > 1:
+        with multiprocessing.Pool(args.jobs) as pool:
+            done = pool.map(run, pending)
+    else:
+        done = [run(job) for job in pending]
+    done = iter(done)
+    for x in range(len(results)):
+        if results[x] == None:
+            results[x] = next(done)
+            if result_store:
+                result_store.finish(keys[x], results[x], results[x]["error"] != None)
+        else:
+            results[x]["cached"] = True
+    rows = [dict(params, **result) for params, result in zip(points, results)]
+    write_results(rows, args.output)
+    print("%d runs (%d simulated) in %.3f sec" % (len(rows), len(pending), time.time() - start), file=sys.stderr)
+    return 0 if all(row.get("error") == None for row in rows) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+
+''' Static throughput and latency bounds (and estimates) of P3S models
+
+ The Location/Trans graph of each Process is walked without simulation.
+ One iteration of a Process is a cycle through its initial location
+ (ex: one frame), or a path to its end location if it has no such cycle.
+ Self-loop transitions (ex: wait for signal) are regarded as waiting,
+ and their delays are not counted.
+
+   - Throughput : the bottleneck resource (a CPU is shared by its tasks
+                  and ISRs, a HW model by its core) bounds the iterations
+                  per msec from above. Running all stages serially gives
+                  an estimate of the low end.
+   - Latency    : the sum of minimum iteration cycles of the stages and
+                  channel delays is a lower bound. The serial estimate adds
+                  interference of higher priority tasks and ISRs on the
+                  same CPU (each of them runs once in an iteration).
+
+ Only the lower bounds of cycles (upper bound of throughput) are
+ conservative, and can_meet() uses only them. The serial estimates are
+ NOT upper bounds: waiting (self-loops) is not counted, and overheads
+ given by update actions of user code (ex: task switch cycles) are not
+ visible from the graph. The overheads can be given per Trans class as
+ trans_overhead, or measured by profile_overhead().
+
+ Usage:
+   analyzer = bounds.Analyzer(build_model(), bounds.profile_overhead(build_model))
+   analyzer.analyze()
+   analyzer.report(num_of_iteration)
+   if not analyzer.can_meet(num_of_iteration, max_finish_ms): (skip simulation)
+'''
+
+from P3S import p3s
+
+
+class OverheadProfile(p3s.Observer):
+
+    def __init__(self):
+        '''
+        Constructor of OverheadProfile class.
+        '''
+        self.overheads = {} # Trans class name : (min, max) overhead cycle
+
+    def trans_updated(self, proc, global_cycle):
+        cpu = getattr(proc, "cpu", None)
+        if cpu == None:
+            return
+        overhead = cpu.rest_isr_cycle if isinstance(proc, p3s.ISR) else cpu.rest_task_cycle
+        name = type(proc.current_trans).__name__
+        lo, hi = self.overheads.get(name, (overhead, overhead))
+        self.overheads[name] = (min(lo, overhead), max(hi, overhead))
+
+def profile_overhead(build, max_cycle=None):
+    '''
+    Measure overhead cycles set by update actions (ex: task switch) by one simulation.
+    Return value is dict of Trans class name : (min, max) overhead cycle (trans_overhead of Analyzer)
+        [1] build : function to build P3S class object
+        [2] max_cycle : Max cycle to be simulated
+    '''
+    sim = build()
+    sim.b_verbose = False
+    profile = OverheadProfile()
+    sim.add_observer(profile)
+    try:
+        sim.simulate(max_cycle)
+    except p3s.DeadlockError:
+        # Overheads observed until detection are used
+        pass
+    return profile.overheads
+
+
+class Analyzer():
+
+    def __init__(self, sim, trans_overhead=None, channel_delay=None, stages=None):
+        '''
+        Constructor of Analyzer class.
+            [1] sim : P3S class object
+            [2] trans_overhead : dict of Trans class name : overhead cycle (or (min, max))
+            [3] channel_delay : dict of Channel name : delay cycle (default: Channel.latency)
+            [4] stages : names of Process on the path of one iteration (default: all)
+        '''
+        self.sim = sim
+        self.trans_overhead = trans_overhead if trans_overhead else {}
+        self.channel_delay = channel_delay if channel_delay else {}
+        self.stages = stages
+        self.costs = {}     # Process : (min cycle, max cycle) of one iteration
+        self.demands = {}   # Model name : (min cycle, max cycle) of one iteration
+        self.latency = (0, 0) # (lower bound, serial estimate) cycle of one iteration
+        self.bottleneck = None
+
+    def get_trans_delay(self, trans):
+        '''
+        Get (min, max) delay cycle of transition.
+            [1] trans : Trans class object
+        '''
+        delays = trans.get_delay_choices()
+        if not delays:
+            delays = [trans.get_delay()]
+        overhead = self.trans_overhead.get(type(trans).__name__, 0)
+        if not isinstance(overhead, tuple):
+            overhead = (overhead, overhead)
+        return (min(delays) + overhead[0], max(delays) + overhead[1])
+
+    def get_iteration_cost(self, proc):
+        '''
+        Get (min, max) cycle of one iteration of Process.
+            [1] proc : Process class object
+        '''
+        init_loc = getattr(proc, "init_loc", None) or proc.current_loc
+        if init_loc == None:
+            return (0, 0)
+        costs = []
+        # Enumerate simple paths from initial location
+        stack = [(init_loc, [init_loc], 0, 0)]
+        while stack:
+            loc, visited, lo, hi = stack.pop()
+            if loc.b_end or len(loc.transitions) == 0:
+                costs.append((lo, hi))
+                continue
+            for trans in loc.transitions:
+                to_loc = trans.to_location
+                if to_loc == loc:
+                    continue # Waiting
+                if proc.template:
+                    trans.bind(proc)
+                d_lo, d_hi = self.get_trans_delay(trans)
+                if to_loc == init_loc:
+                    costs.append((lo + d_lo, hi + d_hi))
+                elif to_loc not in visited:
+                    stack.append((to_loc, visited + [to_loc], lo + d_lo, hi + d_hi))
+        if len(costs) == 0:
+            return (0, 0)
+        return (min(c[0] for c in costs), max(c[1] for c in costs))
+
+    def get_channels(self):
+        '''
+        Get all Channel class objects of the model.
+        '''
+        channels = []
+        for proc in self.sim.get_processes():
+            for loc in proc.locations:
+                for trans in loc.transitions:
+                    channel = trans.get_link("channel", proc)
+                    if channel and channel not in channels:
+                        channels.append(channel)
+        return channels
+
+    def get_response(self, proc):
+        '''
+        Get response cycle of one iteration of Process with interference (estimate).
+            [1] proc : Process class object
+        '''
+        response = self.costs[proc][1]
+        cpu = getattr(proc, "cpu", None)
+        if cpu == None:
+            return response
+        for isr in cpu.isrs:
+            if isr != proc:
+                response += self.costs[isr][1] + isr.entry_cycle + isr.exit_cycle
+        for task in cpu.tasks:
+            if task != proc and task.priority > proc.priority and not isinstance(proc, p3s.ISR):
+                response += self.costs[task][1]
+        return response
+
+    def analyze(self):
+        '''
+        Compute bounds of the model.
+        '''
+        procs = self.sim.get_processes()
+        self.costs = {}
+        for proc in procs:
+            self.costs[proc] = self.get_iteration_cost(proc)
+        # Demand of each resource
+        self.demands = {}
+        if self.sim.cpu:
+            lo = 0
+            hi = 0
+            for isr in self.sim.cpu.isrs:
+                lo += self.costs[isr][0] + isr.entry_cycle + isr.exit_cycle
+                hi += self.costs[isr][1] + isr.entry_cycle + isr.exit_cycle
+            for task in self.sim.cpu.tasks:
+                lo += self.costs[task][0]
+                hi += self.costs[task][1]
+            self.demands[self.sim.cpu.name] = (lo, hi)
+        for hw in self.sim.hw:
+            self.demands[hw.name] = self.costs[hw.core]
+        self.bottleneck = max(self.demands, key=lambda name: self.demands[name][0])
+        # Latency of one iteration
+        stages = [proc for proc in procs if self.stages == None or proc.name in self.stages]
+        channel_delay = 0
+        for ch in self.get_channels():
+            channel_delay += self.channel_delay.get(ch.name, ch.latency)
+        lower = channel_delay + sum(self.costs[proc][0] for proc in stages)
+        serial = channel_delay + sum(self.get_response(proc) for proc in stages)
+        self.latency = (lower, serial)
+
+    def get_clock(self):
+        return self.sim.cpu.clock if self.sim.cpu else self.sim.hw[0].clock
+
+    def to_msec(self, cycle):
+        '''
+        Convert cycle to msec.
+            [1] cycle : cycle
+        '''
+        return cycle / (self.get_clock() * 1000.0)
+
+    def get_throughput(self):
+        '''
+        Get (serial estimate, upper bound) of iterations per msec.
+        '''
+        lo = self.latency[1]
+        hi = self.demands[self.bottleneck][0]
+        return ((1.0 / self.to_msec(lo)) if lo > 0 else 0.0, (1.0 / self.to_msec(hi)) if hi > 0 else float("inf"))
+
+    def get_finish_estimate(self, num_of_iteration):
+        '''
+        Get (lower bound, serial estimate) of finished cycle of iterations.
+            [1] num_of_iteration : number of iterations (ex: NUM_OF_FRAME)
+        '''
+        lower = self.latency[0] + (num_of_iteration - 1) * self.demands[self.bottleneck][0]
+        serial = num_of_iteration * self.latency[1]
+        return (lower, serial)
+
+    def can_meet(self, num_of_iteration, max_finish_ms=None, min_throughput=None):
+        '''
+        Whether the model can possibly meet the target.
+        Return False if the target can never be met (simulation can be pruned)
+            [1] num_of_iteration : number of iterations
+            [2] max_finish_ms : target finished time (msec)
+            [3] min_throughput : target iterations per msec
+        '''
+        if max_finish_ms != None:
+            if self.to_msec(self.get_finish_estimate(num_of_iteration)[0]) > max_finish_ms:
+                return False
+        if min_throughput != None:
+            if self.get_throughput()[1] < min_throughput:
+                return False
+        return True
+
+    def report(self, num_of_iteration=None):
+        '''
+        Print bounds and estimates of the model.
+            [1] num_of_iteration : number of iterations (None: finished time is not printed)
+        '''
+        for proc, (lo, hi) in self.costs.items():
+            print("[%s] iteration: %s - %s cycle" % (proc.name, lo, hi))
+        for name, (lo, hi) in self.demands.items():
+            print("[%s] demand: %s - %s cycle%s" % (name, lo, hi, " (bottleneck)" if name == self.bottleneck else ""))
+        estimate, upper = self.get_throughput()
+        print("Throughput: <= %.3f / msec (bound), ~%.3f / msec (serial estimate)" % (upper, estimate))
+        print("Latency: >= %.6f msec (bound), ~%.6f msec (serial estimate)" %
+              (self.to_msec(self.latency[0]), self.to_msec(self.latency[1])))
+        if num_of_iteration != None:
+            lower, serial = self.get_finish_estimate(num_of_iteration)
+            print("Finished time: >= %.6f msec (bound), ~%.6f msec (serial estimate) (%s / %s cycle)" %
+                  (self.to_msec(lower), self.to_msec(serial), lower, serial))
+        if not self.trans_overhead:
+            print("(serial estimates exclude overheads of update actions and waiting)")
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+
+''' Delay calibration of P3S models from measured hardware logs
+
+ Serial logs of the firmware (mbed/main.cpp) are parsed:
+   - "total time: %d usec"   : measured time (averaged if repeated)
+   - "Free frame[%d]"        : frames processed (NUM_OF_FRAME if not given)
+ Each log is measured with its firmware settings (ex: PAYLOAD_SIZE,
+ MPOOL_SIZE, QUEUE_SIZE, HW_OFFLOAD), which are mapped to parameters of
+ the configuration module (ex: PAYLOAD_SIZE -> F_SIZE).
+ Delay parameters (ex: WAIT_SIG_DELAY, DELAY_UNIT) are fitted by pattern
+ search on integer values: all neighbors of current values (each parameter
+ is changed by -step, 0 or +step) are simulated for all configurations in
+ parallel, the best one is taken, and the step is halved when there is no
+ improvement. The objective is the mean absolute relative error of
+ simulated time.
+
+ Usage:
+   measurements = calibrate.load_manifest("logs/manifest.json")
+     ([{"log": "run1.txt", "settings": {"PAYLOAD_SIZE": 512, "MPOOL_SIZE": 5, ...}}, ...])
+   cal = calibrate.Calibrator({0: mbed_test.build_model, 1: mbed_x2_test.build_model}, "mbed_conf",
+                              {"WAIT_SIG_DELAY": 3, "SET_SIG_DELAY": 3, "DELAY_UNIT": 3},
+                              measurements, build_key="HW_OFFLOAD")
+   cal.fit()
+   cal.report()
+'''
+
+import itertools
+import json
+import multiprocessing
+import os
+import re
+
+from P3S import store
+
+# Firmware setting : parameters of configuration module
+DEFAULT_PARAM_MAP = {"PAYLOAD_SIZE": ["F_SIZE"],
+                     "MPOOL_SIZE": ["MP_MAX"],
+                     "QUEUE_SIZE": ["FQ_MAX", "CQ_MAX"],
+                     "NUM_OF_FRAME": ["NUM_OF_FRAME"]}
+
+TOTAL_TIME = re.compile(r"total time: (\d+) usec")
+FREE_FRAME = re.compile(r"Free frame\[(\d+)\]")
+
+
+class Measurement():
+
+    def __init__(self, name, settings, times, num_of_frame=None):
+        '''
+        Constructor of Measurement class.
+            [1] name : name of measurement (ex: log file name)
+            [2] settings : dict of firmware setting : value
+            [3] times : list of measured total time (usec)
+            [4] num_of_frame : number of processed frames
+        '''
+        self.name = name
+        self.settings = dict(settings)
+        self.times = times
+        if num_of_frame and "NUM_OF_FRAME" not in self.settings:
+            self.settings["NUM_OF_FRAME"] = num_of_frame
+
+    def get_time(self):
+        return sum(self.times) / len(self.times)
+
+
+def parse_log(text):
+    '''
+    Parse serial log of the firmware.
+    Return value is (list of total time (usec), number of processed frames in one run)
+        [1] text : log text
+    '''
+    times = [int(t) for t in TOTAL_TIME.findall(text)]
+    frames = [int(f) for f in FREE_FRAME.findall(text)]
+    num_of_frame = (len(frames) // len(times) if times else len(frames)) if frames else None
+    return (times, num_of_frame)
+
+def load_log(path, settings):
+    '''
+    Load Measurement from log file.
+        [1] path : path of log file
+        [2] settings : dict of firmware setting : value
+    '''
+    with open(path, errors="replace") as f:
+        times, num_of_frame = parse_log(f.read())
+    if len(times) == 0:
+        raise ValueError("%s: no total time" % path)
+    return Measurement(os.path.basename(path), settings, times, num_of_frame)
+
+def load_manifest(path):
+    '''
+    Load Measurements from manifest (JSON list of {"log": path, "settings": dict}).
+    Path of log is relative to the manifest.
+        [1] path : path of manifest file
+    '''
+    with open(path) as f:
+        entries = json.load(f)
+    base = os.path.dirname(path)
+    return [load_log(os.path.join(base, e["log"]), e.get("settings", {})) for e in entries]
+
+def get_clock(sim):
+    return {"clock": sim.cpu.clock if sim.cpu else sim.hw[0].clock}
+
+def _run_job(args):
+    return store.run_point(*args)
+
+
+class Calibrator():
+
+    def __init__(self, build, config, params, measurements, build_key=None, param_map=None,
+                 step=4, min_value=0, jobs=None, max_cycle=None):
+        '''
+        Constructor of Calibrator class.
+            [1] build : module level function to build P3S class object
+                        (or dict of value of build_key setting : function)
+            [2] config : name of configuration module
+            [3] params : dict of delay parameter name : initial value (integer)
+            [4] measurements : list of Measurement class object
+            [5] build_key : firmware setting which selects build function (ex: HW_OFFLOAD)
+            [6] param_map : dict of firmware setting : list of parameter names
+            [7] step : initial step of pattern search
+            [8] min_value : min value of delay parameters
+            [9] jobs : number of worker processes (None: number of CPUs)
+            [10] max_cycle : Max cycle of one simulation
+        '''
+        self.build = build
+        self.config = config
+        self.params = dict(params)
+        self.measurements = measurements
+        self.build_key = build_key
+        self.param_map = param_map if param_map else DEFAULT_PARAM_MAP
+        self.step = step
+        self.min_value = min_value
+        self.jobs = jobs
+        self.max_cycle = max_cycle
+        self.num_of_sim = 0
+        self.error = None
+        self.predictions = [] # predicted time (usec) of each measurement
+
+    def get_build(self, measurement):
+        if isinstance(self.build, dict):
+            return self.build[measurement.settings.get(self.build_key, 0)]
+        return self.build
+
+    def get_point(self, measurement, params):
+        '''
+        Get parameters of configuration module for measurement.
+            [1] measurement : Measurement class object
+            [2] params : dict of delay parameter name : value
+        '''
+        point = dict(params)
+        for setting, value in measurement.settings.items():
+            for name in self.param_map.get(setting, []):
+                point[name] = value
+        return point
+
+    def predict(self, candidates):
+        '''
+        Simulate all measurements with each candidate in parallel.
+        Return value is list of list of predicted time (usec) (None if not finished)
+            [1] candidates : list of dict of delay parameter name : value
+        '''
+        args = [(self.get_build(m), self.config, self.get_point(m, c), self.max_cycle, get_clock)
+                for c in candidates for m in self.measurements]
+        with multiprocessing.Pool(self.jobs) as pool:
+            results = pool.map(_run_job, args)
+        self.num_of_sim += len(args)
+        n = len(self.measurements)
+        predictions = []
+        for x in range(len(candidates)):
+            predictions.append([(r["finish"] / r["clock"]) if r["finish"] else None for r in results[x * n:(x + 1) * n]])
+        return predictions
+
+    def get_error(self, predictions):
+        '''
+        Get mean absolute relative error of predictions.
+            [1] predictions : list of predicted time (usec)
+        '''
+        total = 0.0
+        for m, predicted in zip(self.measurements, predictions):
+            if predicted == None:
+                return float("inf")
+            total += abs(predicted - m.get_time()) / m.get_time()
+        return total / len(self.measurements)
+
+    def fit(self, max_iteration=100):
+        '''
+        Fit delay parameters.
+        Return value is dict of fitted parameter name : value
+            [1] max_iteration : max number of iterations of pattern search
+        '''
+        current = dict(self.params)
+        self.predictions = self.predict([current])[0]
+        self.error = self.get_error(self.predictions)
+        step = self.step
+        for _ in range(max_iteration):
+            if step < 1:
+                break
+            candidates = []
+            names = sorted(current)
+            for deltas in itertools.product((-step, 0, step), repeat=len(names)):
+                candidate = dict(current)
+                for name, delta in zip(names, deltas):
+                    candidate[name] += delta
+                if candidate != current and min(candidate.values()) >= self.min_value:
+                    candidates.append(candidate)
+            if len(candidates) == 0:
+                break
+            predictions = self.predict(candidates)
+            errors = [self.get_error(p) for p in predictions]
+            best = min(range(len(candidates)), key=lambda x: errors[x])
+            if errors[best] < self.error:
+                current = candidates[best]
+                self.predictions = predictions[best]
+                self.error = errors[best]
+            else:
+                step //= 2
+        self.params = current
+        return current
+
+    def report(self):
+        '''
+        Print fitted parameters and prediction error of each configuration.
+        '''
+        print("Fitted parameters (%d simulations):" % self.num_of_sim)
+        for name in sorted(self.params):
+            print("  %s = %s" % (name, self.params[name]))
+        print("%-24s %-40s %12s %12s %8s" % ("Measurement", "Settings", "measured", "predicted", "error"))
+        for m, predicted in zip(self.measurements, self.predictions):
+            settings = ",".join("%s=%s" % (k, v) for k, v in sorted(m.settings.items()))
+            if predicted == None:
+                print("%-24s %-40s %12.1f %12s %8s" % (m.name, settings, m.get_time(), "-", "-"))
+            else:
+                error = 100.0 * (predicted - m.get_time()) / m.get_time()
+                print("%-24s %-40s %12.1f %12.1f %+7.2f%%" % (m.name, settings, m.get_time(), predicted, error))
+        print("Mean absolute error: %.2f%%" % (100.0 * self.error))
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+
+''' Causal profiler of P3S models ("virtual speedup")
+
+ The model is re-simulated with the delay of each transition class
+ scaled down by several speedup ratios, and transitions are ranked by
+ the impact on finished cycle and throughput.
+ Throughput is counted by a progress point, i.e. the number of times
+ the given transition class finishes (ex: a frame is freed).
+
+ Usage:
+   profiler = causal.CausalProfiler(build_model, "TransClupMpFree")
+   profiler.profile()
+   profiler.report()
+'''
+
+import multiprocessing
+
+from P3S import p3s
+
+
+class ProgressCounter(p3s.Observer):
+
+    def __init__(self, progress):
+        '''
+        Constructor of ProgressCounter class.
+            [1] progress : Trans class name of progress point
+        '''
+        self.progress = progress
+        self.count = 0
+
+    def location_changed(self, proc, global_cycle):
+        if type(proc.current_trans).__name__ == self.progress:
+            self.count += 1
+
+
+def get_trans_classes(sim):
+    '''
+    Get Trans class names which have delay in the model.
+        [1] sim : P3S class object
+    '''
+    names = []
+    for proc in sim.get_processes():
+        for loc in proc.locations:
+            for trans in loc.transitions:
+                cls = type(trans)
+                if cls.get_delay is p3s.Trans.get_delay and cls.get_delay_choices is p3s.Trans.get_delay_choices:
+                    continue
+                if cls.__name__ not in names:
+                    names.append(cls.__name__)
+    return names
+
+def run_scaled(build, delay_scale, progress, max_cycle):
+    '''
+    Simulate the model with scaled delays.
+    Return value is (finished cycle, progress count, clock)
+        [1] build : function to build P3S class object
+        [2] delay_scale : dict of Trans class name and scale factor
+        [3] progress : Trans class name of progress point
+        [4] max_cycle : Max cycle to be simulated
+    '''
+    sim = build()
+    sim.b_verbose = False
+    sim.delay_scale = delay_scale
+    counter = ProgressCounter(progress)
+    sim.add_observer(counter)
+    try:
+        finish_cycle = sim.simulate(max_cycle)
+    except p3s.DeadlockError:
+        # Not finished (progress until detection is counted)
+        finish_cycle = None
+    clock = sim.cpu.clock if sim.cpu else sim.hw[0].clock
+    return (finish_cycle, counter.count, clock)
+
+def _run_job(args):
+    return run_scaled(*args)
+
+
+class CausalProfiler():
+
+    def __init__(self, build, progress=None, speedups=(0.1, 0.25, 0.5), jobs=None, max_cycle=None):
+        '''
+        Constructor of CausalProfiler class.
+            [1] build : function to build P3S class object
+            [2] progress : Trans class name of progress point (None: no throughput)
+            [3] speedups : speedup ratios of delay (0.25: delay is scaled by 0.75)
+            [4] jobs : number of worker processes (None: number of CPUs)
+            [5] max_cycle : Max cycle of one simulation
+        '''
+        self.build = build
+        self.progress = progress
+        self.speedups = speedups
+        self.jobs = jobs
+        self.max_cycle = max_cycle
+        self.baseline = None
+        self.results = {} # Trans class name : list of (finish cycle, progress count, clock)
+
+    def profile(self):
+        '''
+        Run all simulations.
+        '''
+        names = get_trans_classes(self.build())
+        args = [(self.build, {}, self.progress, self.max_cycle)]
+        for name in names:
+            for speedup in self.speedups:
+                args.append((self.build, {name: 1.0 - speedup}, self.progress, self.max_cycle))
+        with multiprocessing.Pool(self.jobs) as pool:
+            results = pool.map(_run_job, args)
+        self.baseline = results[0]
+        self.results = {}
+        for x, name in enumerate(names):
+            start = 1 + x * len(self.speedups)
+            self.results[name] = results[start:start + len(self.speedups)]
+
+    def get_throughput(self, result):
+        '''
+        Get throughput (progress count per msec).
+            [1] result : (finished cycle, progress count, clock)
+        '''
+        finish_cycle, count, clock = result
+        if not finish_cycle:
+            return 0.0
+        return count / (finish_cycle / clock / 1000.0)
+
+    def get_impact(self, result):
+        '''
+        Get reduction ratio (%) of finished cycle.
+            [1] result : (finished cycle, progress count, clock)
+        '''
+        if result[0] == None or self.baseline[0] == None:
+            return 0.0
+        return 100.0 * (self.baseline[0] - result[0]) / self.baseline[0]
+
+    def get_ranking(self):
+        '''
+        Get Trans class names in descending order of impact by max speedup.
+        '''
+        return sorted(self.results, key=lambda name: self.get_impact(self.results[name][-1]), reverse=True)
+
+    def report(self):
+        '''
+        Print ranking of transitions.
+        '''
+        print("Baseline finished cycle: %s" % self.baseline[0])
+        if self.progress:
+            print("Baseline throughput: %.3f / msec" % self.get_throughput(self.baseline))
+        header = "%-24s" % "Transition"
+        for speedup in self.speedups:
+            header += " %10s" % ("-%d%% delay" % int(speedup * 100))
+        print(header)
+        for name in self.get_ranking():
+            line = "%-24s" % name
+            for result in self.results[name]:
+                line += " %9.2f%%" % self.get_impact(result)
+            print(line)
+            if self.progress:
+                line = "%-24s" % "  throughput"
+                base = self.get_throughput(self.baseline)
+                for result in self.results[name]:
+                    gain = (100.0 * (self.get_throughput(result) - base) / base) if base > 0 else 0.0
+                    line += " %+9.2f%%" % gain
+                print(line)
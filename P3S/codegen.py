@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+
+''' Code-generated specialized simulator of P3S models
+
+ Python source of restart() is generated for each Process of a fixed
+ model, and installed to the Process object instead of the generic
+ Process.restart()/Task.restart():
+   - locations and transitions are unrolled into if-chains
+   - guards which are not overridden (and have no channel) are folded
+   - delays which are not overridden are inlined as 0, and delays of
+     Trans classes whose b_const_delay is True are evaluated once at
+     generation time and inlined
+   - sync()/update() which are not overridden are not called
+   - observers are notified only if P3S has observers, and location
+     changes are notified to P3S directly
+ The generated source depends only on the structure of the Process,
+ so it is compiled once and cached for all identical processes.
+ If P3S has chooser or delay_scale, the generic restart() is used.
+ Hooks of P3S (chooser, delay_scale and observers) are checked when the
+ model is compiled, and the model is compiled again by P3S.start() if
+ they are changed, so generated code does not check them at each step
+ (changes during simulation are not followed).
+
+ Usage:
+   codegen.compile_model(sim)
+   sim.simulate()
+'''
+
+from P3S import define_p3s
+from P3S import p3s
+
+# Cache of compiled sources (source : factory function)
+_cache = {}
+
+
+def is_overridden(trans, name):
+    return getattr(type(trans), name) is not getattr(p3s.Trans, name)
+
+def get_generic_restart(proc):
+    '''
+    Get generic restart() of Process.
+    Return None if restart() is overridden by user class (cannot be compiled).
+        [1] proc : Process class object
+    '''
+    restart = type(proc).restart
+    if restart is p3s.Task.restart or restart is p3s.Process.restart:
+        return restart
+    return None
+
+def get_hooks(sim):
+    '''
+    Get hooks of P3S which the generated code depends on.
+    Return value is (Whether generic restart() is used, Whether observers are notified)
+        [1] sim : P3S class object
+    '''
+    return (bool(sim.chooser or sim.delay_scale), bool(sim.observers))
+
+def generate_source(proc, b_observers=True):
+    '''
+    Generate source of specialized restart() for Process.
+    Return value is (source, list of Location, list of Trans)
+        [1] proc : Process class object
+        [2] b_observers : Whether observers of P3S are notified
+    '''
+    locs = list(proc.locations)
+    transitions = []
+    for loc in locs:
+        for trans in loc.transitions:
+            if trans.to_location not in locs:
+                locs.append(trans.to_location)
+    for loc in locs:
+        transitions += loc.transitions
+    b_task = isinstance(proc, p3s.Task)
+    b_shared = proc.template != None
+    names = ["L%d" % x for x in range(len(locs))] + ["T%d" % x for x in range(len(transitions))]
+    src = []
+    src.append("def make(GENERIC, %s):" % ", ".join(names))
+    src.append("    def restart(self, global_cycle, accuracy_cycle):")
+    src.append("        runnable_cycle = accuracy_cycle")
+    src.append("        if self.current_loc == None:")
+    src.append("            return -1")
+    src.append("        while True:")
+    src.append("            trans = self.current_trans")
+    src.append("            if trans == None:")
+    src.append("                cycle = global_cycle + (accuracy_cycle - runnable_cycle)")
+    src.append("                loc = self.current_loc")
+    for x, loc in enumerate(locs):
+        src.append("                %s loc is L%d:" % ("if" if x == 0 else "elif", x))
+        if len(loc.transitions) == 0:
+            src.append("                    return runnable_cycle")
+            continue
+        b_folded = False
+        for y, trans in enumerate(loc.transitions):
+            t = "T%d" % transitions.index(trans)
+            indent = "                    "
+            if b_shared:
+                src.append(indent + "%s.bind(self)" % t)
+            if not is_overridden(trans, "guard") and trans.channel == None and not trans.link_keys:
+                # Guard is always True
+                b_folded = True
+                if y > 0:
+                    src.append(indent + "else:")
+                    indent += "    "
+            else:
+                src.append(indent + ("if" if y == 0 else "elif") + " %s.guard(cycle):" % t)
+                indent += "    "
+            if is_overridden(trans, "sync"):
+                src.append(indent + "%s.sync()" % t)
+            src.append(indent + "self.current_trans = trans = %s" % t)
+            src.append(indent + "self.trans_state = S_GET_DELAY")
+            if b_observers:
+                src.append(indent + "self.sim.trans_started(self, cycle)")
+            if trans.resources or trans.accesses or not (trans.b_const_delay or not is_overridden(trans, "get_delay")):
+                src.append(indent + "self.rest_trans_cycle = self.get_trans_delay(cycle)")
+                src.append(indent + "self.trans_state = S_UPDATE")
+                src.append(indent + "if self.rest_trans_cycle < 0:")
+                src.append(indent + "    return -1")
+            else:
+                if b_shared:
+                    trans.bind(proc)
+                src.append(indent + "self.rest_trans_cycle = %r" % trans.get_delay())
+                src.append(indent + "self.trans_state = S_UPDATE")
+            if b_folded:
+                break
+        if not b_folded:
+            src.append("                    else: # There is no transition to be able")
+            src.append("                        return runnable_cycle")
+    src.append("                else:")
+    src.append("                    return GENERIC(self, global_cycle + (accuracy_cycle - runnable_cycle), runnable_cycle)")
+    src.append("            elif self.trans_state is S_GET_DELAY:")
+    src.append("                self.rest_trans_cycle = self.get_trans_delay(global_cycle + (accuracy_cycle - runnable_cycle))")
+    src.append("                self.trans_state = S_UPDATE")
+    src.append("                if self.rest_trans_cycle < 0:")
+    src.append("                    return -1")
+    src.append("            if runnable_cycle >= 0:")
+    src.append("                rest_cycle = self.rest_trans_cycle")
+    src.append("                if rest_cycle > runnable_cycle:")
+    src.append("                    self.rest_trans_cycle = rest_cycle - runnable_cycle")
+    src.append("                    return 0")
+    src.append("                runnable_cycle -= rest_cycle")
+    src.append("                self.rest_trans_cycle = 0")
+    src.append("            if self.trans_state is S_UPDATE:")
+    updates = ["T%d" % x for x, trans in enumerate(transitions) if is_overridden(trans, "update")]
+    if updates:
+        src.append("                if trans in (%s,):" % ", ".join(updates))
+        if b_shared:
+            src.append("                    trans.bind(self)")
+        src.append("                    b_event = trans.update(global_cycle + (accuracy_cycle - runnable_cycle))")
+        src.append("                else:")
+        src.append("                    b_event = False")
+    else:
+        src.append("                b_event = False")
+    src.append("                self.trans_state = S_AFTER_UPDATE")
+    if b_observers:
+        src.append("                self.sim.trans_updated(self, global_cycle + (accuracy_cycle - runnable_cycle))")
+    if b_task:
+        src.append("                if b_event:")
+        src.append("                    return runnable_cycle")
+    src.append("            self.current_loc = trans.to_location")
+    if type(proc).location_changed is p3s.Process.location_changed:
+        src.append("            self.sim.location_changed(self, global_cycle + (accuracy_cycle - runnable_cycle))")
+    else:
+        src.append("            self.location_changed(global_cycle + (accuracy_cycle - runnable_cycle))")
+    src.append("            self.current_trans = None")
+    src.append("            self.trans_state = None")
+    ends = ["T%d" % x for x, trans in enumerate(transitions) if trans.to_location.b_end]
+    if ends:
+        src.append("            if trans in (%s,):" % ", ".join(ends))
+        src.append("                self.b_finished = True")
+        src.append("                return runnable_cycle")
+    src.append("    return restart")
+    return ("\n".join(src) + "\n", locs, transitions)
+
+def get_factory(source):
+    '''
+    Get factory function of compiled source (compiled once and cached).
+        [1] source : generated source
+    '''
+    if source not in _cache:
+        scope = {"S_GET_DELAY": define_p3s.TransState.TRANS_BEFORE_GET_DELAY,
+                 "S_UPDATE": define_p3s.TransState.TRANS_BEFORE_UPDATE,
+                 "S_AFTER_UPDATE": define_p3s.TransState.TRANS_AFTER_UPDATE}
+        exec(compile(source, "<p3s-codegen>", "exec"), scope)
+        _cache[source] = scope["make"]
+    return _cache[source]
+
+def compile_process(proc, b_observers=True):
+    '''
+    Install specialized restart() to Process.
+    Return False if the Process cannot be compiled.
+        [1] proc : Process class object
+        [2] b_observers : Whether observers of P3S are notified
+    '''
+    generic = get_generic_restart(proc)
+    if generic == None:
+        return False
+    source, locs, transitions = generate_source(proc, b_observers)
+    restart = get_factory(source)(generic, *(locs + transitions))
+    proc.restart = restart.__get__(proc)
+    return True
+
+def compile_model(sim):
+    '''
+    Install specialized restart() to all processes of the model.
+    The model is compiled again by start() if hooks of P3S are changed.
+    Return value is the number of compiled processes.
+        [1] sim : P3S class object
+    '''
+    hooks = get_hooks(sim)
+    b_generic, b_observers = hooks
+    num = 0
+    for proc in sim.get_processes():
+        proc.__dict__.pop("restart", None)
+        if not b_generic and compile_process(proc, b_observers):
+            num += 1
+    def start():
+        if get_hooks(sim) != hooks:
+            compile_model(sim)
+        return type(sim).start(sim)
+    sim.start = start
+    return num
+
+def restore_model(sim):
+    '''
+    Restore generic restart() of all processes of the model.
+        [1] sim : P3S class object
+    '''
+    sim.__dict__.pop("start", None)
+    for proc in sim.get_processes():
+        proc.__dict__.pop("restart", None)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+
+''' Critical path extraction of P3S simulation
+
+ Happens-before dependencies between transitions are recorded while
+ simulating:
+   - sequence    : previous transition of the same process
+   - signal      : set_signal() which wakes up the waiting task
+   - channel     : send (update of sender) and recv (sync of receiver)
+   - preemption  : ISR which preempts the running task or ISR
+ A transition starts when it is selected and ends when its update action
+ is executed. After simulation, the critical path is traced back from the
+ last transition by following the latest finished predecessor, and the
+ slack of each transition is computed by backward pass (with the gap
+ between the latest predecessor and the transition as edge weight, so
+ transitions on the critical path have no slack).
+
+ Usage:
+   recorder = critical.CriticalPathRecorder()
+   sim.add_observer(recorder)
+   sim.simulate()
+   recorder.analyze()
+   recorder.report()
+'''
+
+from P3S import p3s
+
+
+class Node():
+
+    def __init__(self, proc, trans, start_cycle):
+        '''
+        Constructor of Node class (one execution of transition).
+            [1] proc : Process class object
+            [2] trans : Trans class object
+            [3] start_cycle : cycle when the transition is selected
+        '''
+        self.proc = proc.name
+        self.trans = type(trans).__name__
+        self.to_location = trans.to_location.name
+        self.start = start_cycle
+        self.end = None
+        self.seq = None
+        self.preds = [] # (Node class object, kind of dependency)
+        self.succs = []
+        self.slack = None
+
+
+class CriticalPathRecorder(p3s.Observer):
+
+    def __init__(self):
+        '''
+        Constructor of CriticalPathRecorder class.
+        '''
+        self.nodes = []         # Node class objects in order of end
+        self.current = {}       # Process : Node in progress
+        self.last = {}          # Process : last finished Node
+        self.wakeups = {}       # Process : list of (Node, kind) to be linked to next Node
+        self.sends = {}         # Channel : list of sender Nodes
+        self.num_of_recv = {}   # (Channel, Process) : number of received data
+        self.preemptors = {}    # ISR : list of preempted Nodes
+        self.path = []
+        self.finish_cycle = None
+
+    def add_dep(self, pred, node, kind):
+        node.preds.append((pred, kind))
+        pred.succs.append(node)
+
+    def trans_started(self, proc, global_cycle):
+        trans = proc.current_trans
+        node = Node(proc, trans, global_cycle)
+        if proc in self.last:
+            self.add_dep(self.last[proc], node, "sequence")
+        for pred, kind in self.wakeups.pop(proc, []):
+            self.add_dep(pred, node, kind)
+        if trans.channel and not trans.b_send:
+            key = (trans.channel, proc if proc in trans.channel.fifos else None)
+            index = self.num_of_recv.get(key, 0)
+            sends = self.sends.get(trans.channel, [])
+            if index < len(sends):
+                self.add_dep(sends[index], node, "channel")
+            self.num_of_recv[key] = index + 1
+        self.current[proc] = node
+
+    def trans_updated(self, proc, global_cycle):
+        node = self.current.pop(proc, None)
+        if node == None:
+            return
+        node.end = global_cycle
+        node.seq = len(self.nodes)
+        self.nodes.append(node)
+        self.last[proc] = node
+        trans = proc.current_trans
+        if trans.channel and trans.b_send:
+            self.sends.setdefault(trans.channel, []).append(node)
+        if proc in self.preemptors:
+            for victim in self.preemptors[proc]:
+                self.add_dep(node, victim, "preemption")
+            if proc.b_finished or trans.to_location == getattr(proc, "init_loc", None):
+                del self.preemptors[proc]
+
+    def signal_set(self, src_task, dst_task, sig_id):
+        node = self.current.get(src_task)
+        if node:
+            self.wakeups.setdefault(dst_task, []).append((node, "signal"))
+
+    def preempted(self, task, isr, global_cycle):
+        node = self.current.get(task)
+        if node:
+            self.preemptors.setdefault(isr, []).append(node)
+
+    def analyze(self):
+        '''
+        Compute critical path and slack of each transition.
+        Return value is list of (Node, kind of dependency to next Node)
+        '''
+        self.path = []
+        if len(self.nodes) == 0:
+            return self.path
+        self.finish_cycle = self.nodes[-1].end
+        # Backward pass (self.nodes is in topological order)
+        # A node depends on the end of its latest predecessor, and the time
+        # from it to the end of the node (including channel latency and
+        # scheduling wait) is kept as the weight of its incoming edges.
+        ready = {}
+        for node in self.nodes:
+            ends = [pred.end for pred, kind in node.preds if pred.end != None]
+            ready[node] = max(ends) if ends else node.start
+        latest_end = {}
+        for node in reversed(self.nodes):
+            end = self.finish_cycle
+            for succ in node.succs:
+                if succ in latest_end:
+                    end = min(end, latest_end[succ] - (succ.end - ready[succ]))
+            latest_end[node] = end
+            node.slack = end - node.end
+        # Trace back from the last transition
+        node = self.nodes[-1]
+        kind = None
+        while node:
+            self.path.append((node, kind))
+            finished = [(pred, k) for pred, k in node.preds if pred.end != None]
+            if len(finished) == 0:
+                break
+            node, kind = max(finished, key=lambda p: (p[0].end, p[0].seq))
+        self.path.reverse()
+        return self.path
+
+    def get_summary(self):
+        '''
+        Get summary of each Trans class.
+        Return value is dict of Trans class name : [count, total cycle, cycle on critical path, min slack]
+        '''
+        summary = {}
+        for node in self.nodes:
+            item = summary.setdefault(node.trans, [0, 0, 0, None])
+            item[0] += 1
+            item[1] += node.end - node.start
+            if item[3] == None or node.slack < item[3]:
+                item[3] = node.slack
+        for node, kind in self.path:
+            summary[node.trans][2] += node.end - node.start
+        return summary
+
+    def report(self):
+        '''
+        Print critical path and slack of each Trans class.
+        '''
+        if len(self.path) == 0:
+            self.analyze()
+        print("Critical path (finished cycle: %s):" % self.finish_cycle)
+        prev = None
+        for node, kind in self.path:
+            if prev != None and node.start > prev.end:
+                print("    (wait %d)" % (node.start - prev.end))
+            print("  C:%s-%s %s %s -> %s%s" % (node.start, node.end, node.proc, node.trans, node.to_location,
+                                              (" [%s]" % kind) if kind else ""))
+            prev = node
+        print("%-24s %6s %8s %9s %6s" % ("Transition", "count", "cycle", "critical", "slack"))
+        summary = self.get_summary()
+        for name in sorted(summary, key=lambda n: summary[n][2], reverse=True):
+            count, total, critical, slack = summary[name]
+            print("%-24s %6d %8s %9s %6s" % (name, count, total, critical, slack))
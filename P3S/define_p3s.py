@@ -23,6 +23,10 @@ class TransState(Enum):
     TRANS_BEFORE_UPDATE    = 2
     TRANS_AFTER_UPDATE     = 3
 
+class ArbitrationPolicy(Enum):
+    FIFO     = 0 # First come, first served
+    PRIORITY = 1 # Higher task priority is served first
+
 # Signal
 SIGNAL_ID_NO_WAIT = -1
 SIGNAL_INIT_PRI = -1
@@ -0,0 +1,401 @@
+#!/usr/bin/env python
+
+''' Differential equivalence harness of P3S simulation engines
+
+ A model is simulated under two engines (ex: generic restart() and
+ code-generated restart()), and the full event sequence (transition
+ start/update, location change, signal, preemption) and final state
+ (finished cycle, location/state of each process, cycle of each model)
+ are compared. The first divergence is reported with context.
+ Random models are generated for fuzzing: a pipeline of tasks with random
+ priorities, bounded queues and signals, random work graphs (chains,
+ branches, constant and variable delays), and H/W offload by channels
+ and ISRs (random priorities, entry/exit cost and tail-chaining).
+
+ Usage:
+   harness = equiv.Harness(build_model)
+   if not harness.compare("generic", "codegen"):
+       harness.report()
+   equiv.fuzz(1000)
+'''
+
+import random
+
+from P3S import codegen
+from P3S import define_p3s
+from P3S import p3s
+
+
+class EventLog(p3s.Observer):
+
+    def __init__(self):
+        '''
+        Constructor of EventLog class.
+        '''
+        self.events = []
+
+    def location_changed(self, proc, global_cycle):
+        self.events.append(("location", global_cycle, proc.name, proc.current_loc.name))
+
+    def trans_started(self, proc, global_cycle):
+        self.events.append(("start", global_cycle, proc.name, type(proc.current_trans).__name__))
+
+    def trans_updated(self, proc, global_cycle):
+        self.events.append(("update", global_cycle, proc.name, type(proc.current_trans).__name__))
+
+    def signal_set(self, src_task, dst_task, sig_id):
+        self.events.append(("signal", None, src_task.name if src_task else None, (dst_task.name, int(sig_id))))
+
+    def preempted(self, task, isr, global_cycle):
+        self.events.append(("preempt", global_cycle, task.name, isr.name))
+
+
+def get_final_state(sim):
+    '''
+    Get final state of Simulation.
+        [1] sim : P3S class object
+    '''
+    state = [("finish", sim.finish_cycle), ("cycle", sim.cycle)]
+    for model in ([sim.cpu] if sim.cpu else []) + sim.hw:
+        state.append((model.name, model.cycle))
+    for proc in sim.get_processes():
+        state.append((proc.name, proc.current_loc.name if proc.current_loc else None,
+                      str(getattr(proc, "task_state", None)), proc.b_finished))
+    return state
+
+def run_engine(build, engine, max_cycle=None):
+    '''
+    Simulate model with engine.
+    Return value is (list of events, final state)
+        [1] build : function to build P3S class object
+        [2] engine : "generic", "codegen" or function(sim) to set up engine
+        [3] max_cycle : Max cycle to be simulated
+    '''
+    sim = build()
+    sim.b_verbose = False
+    if engine == "codegen":
+        codegen.compile_model(sim)
+    elif callable(engine):
+        engine(sim)
+    log = EventLog()
+    sim.add_observer(log)
+    sim.simulate(max_cycle)
+    return (log.events, get_final_state(sim))
+
+
+class Harness():
+
+    def __init__(self, build, max_cycle=None, context=5):
+        '''
+        Constructor of Harness class.
+            [1] build : function to build P3S class object
+            [2] max_cycle : Max cycle to be simulated
+            [3] context : number of events printed before divergence
+        '''
+        self.build = build
+        self.max_cycle = max_cycle
+        self.context = context
+        self.engines = None
+        self.runs = None
+        self.divergence = None # (kind, index)
+
+    def compare(self, engine_a="generic", engine_b="codegen"):
+        '''
+        Compare two engines.
+        Return True if event sequences and final states are identical.
+            [1] engine_a : reference engine
+            [2] engine_b : engine to be checked
+        '''
+        self.engines = (engine_a, engine_b)
+        self.runs = (run_engine(self.build, engine_a, self.max_cycle), run_engine(self.build, engine_b, self.max_cycle))
+        self.divergence = None
+        for kind, x in (("event", 0), ("state", 1)):
+            a = self.runs[0][x]
+            b = self.runs[1][x]
+            for index in range(max(len(a), len(b))):
+                if index >= len(a) or index >= len(b) or a[index] != b[index]:
+                    self.divergence = (kind, index)
+                    return False
+        return True
+
+    def get_name(self, engine):
+        return engine if isinstance(engine, str) else getattr(engine, "__name__", repr(engine))
+
+    def report(self):
+        '''
+        Print result of comparison (first divergence with context).
+        '''
+        names = [self.get_name(e) for e in self.engines]
+        if self.divergence == None:
+            print("Equivalent: %s == %s (%d events)" % (names[0], names[1], len(self.runs[0][0])))
+            return
+        kind, index = self.divergence
+        x = 0 if kind == "event" else 1
+        print("Divergence at %s %d: %s != %s" % (kind, index, names[0], names[1]))
+        for y in range(max(0, index - self.context), index):
+            print("    %s" % (self.runs[0][x][y],))
+        for name, run in zip(names, self.runs):
+            print("  %-8s> %s" % (name, run[x][index] if index < len(run[x]) else "(end)"))
+
+
+# Random model generation (fuzzing)
+def wait_signal_update(task, sig_id, delay):
+    task.signal.wait_signal(task, sig_id)
+    task.cpu.current_task = None
+    task.cpu.rest_task_cycle = delay
+
+def set_signal_update(task, dst_task, sig_id, delay):
+    task.signal.set_signal(dst_task, sig_id)
+    task.task_state = define_p3s.TaskState.READY
+    task.cpu.current_task = None
+    task.cpu.rest_task_cycle = delay
+
+class Pipeline():
+
+    def __init__(self, num_of_stage, capacities, num_of_item, switch_delay):
+        '''
+        Constructor of Pipeline class (shared state of random model).
+        '''
+        self.queues = [0] * num_of_stage
+        self.capacities = capacities
+        self.rest = num_of_item
+        self.num_of_item = num_of_item
+        self.done = 0
+        self.switch_delay = switch_delay
+
+class FuzzTask(p3s.Task):
+    def __init__(self, name, priority, stage):
+        super().__init__(name, priority)
+        self.stage = stage
+        self.count = 0
+        self.prev = None
+        self.next = None
+
+class TransProduce(p3s.Trans):
+    def guard(self, global_cycle):
+        return self.proc.pipe.rest > 0
+    def update(self, global_cycle):
+        self.proc.pipe.rest -= 1
+        self.proc.count += 1
+        return False
+
+class TransProduceEnd(p3s.Trans):
+    def guard(self, global_cycle):
+        return self.proc.pipe.rest == 0
+    def update(self, global_cycle):
+        self.proc.task_state = define_p3s.TaskState.INACTIVE
+        self.proc.cpu.rest_task_cycle = self.proc.pipe.switch_delay
+        self.proc.cpu.current_task = None
+        return False
+
+class TransQueueEmpty(p3s.Trans):
+    def guard(self, global_cycle):
+        return self.proc.pipe.queues[self.proc.stage - 1] == 0
+    def update(self, global_cycle):
+        wait_signal_update(self.proc, 2 * self.proc.stage + 1, self.proc.pipe.switch_delay)
+        return True
+
+class TransQueueGet(p3s.Trans):
+    def guard(self, global_cycle):
+        return self.proc.pipe.queues[self.proc.stage - 1] > 0
+    def update(self, global_cycle):
+        proc = self.proc
+        proc.pipe.queues[proc.stage - 1] -= 1
+        proc.count += 1
+        set_signal_update(proc, proc.prev, 2 * proc.stage, proc.pipe.switch_delay)
+        return True
+
+class TransQueueFull(p3s.Trans):
+    def guard(self, global_cycle):
+        return self.proc.pipe.queues[self.proc.stage] >= self.proc.pipe.capacities[self.proc.stage]
+    def update(self, global_cycle):
+        wait_signal_update(self.proc, 2 * (self.proc.stage + 1), self.proc.pipe.switch_delay)
+        return True
+
+class TransQueuePut(p3s.Trans):
+    def guard(self, global_cycle):
+        return self.proc.pipe.queues[self.proc.stage] < self.proc.pipe.capacities[self.proc.stage]
+    def update(self, global_cycle):
+        proc = self.proc
+        proc.pipe.queues[proc.stage] += 1
+        set_signal_update(proc, proc.next, 2 * (proc.stage + 1) + 1, proc.pipe.switch_delay)
+        return True
+
+class TransConsume(p3s.Trans):
+    def guard(self, global_cycle):
+        return self.proc.pipe.done + 1 < self.proc.pipe.num_of_item
+    def update(self, global_cycle):
+        self.proc.pipe.done += 1
+        return False
+
+class TransConsumeEnd(p3s.Trans):
+    def guard(self, global_cycle):
+        return self.proc.pipe.done + 1 == self.proc.pipe.num_of_item
+    def update(self, global_cycle):
+        self.proc.pipe.done += 1
+        return False
+
+class TransWork(p3s.Trans):
+    b_const_delay = True
+    def __init__(self, proc, to_location, delay):
+        super().__init__(proc, None, False, to_location, None)
+        self.delay = delay
+    def get_delay(self):
+        return self.delay
+
+class TransWorkVar(p3s.Trans):
+    def __init__(self, proc, to_location, delay, mod):
+        super().__init__(proc, None, False, to_location, None)
+        self.delay = delay
+        self.mod = mod
+    def get_delay(self):
+        return self.delay + self.proc.count % self.mod
+
+class TransBranch(p3s.Trans):
+    def __init__(self, proc, to_location, parity):
+        super().__init__(proc, None, False, to_location, None)
+        self.parity = parity
+    def guard(self, global_cycle):
+        return self.proc.count % 2 == self.parity
+
+class TransKick(p3s.Trans):
+    def update(self, global_cycle):
+        self.channel.send(1, global_cycle, self.proc.kick_delay)
+        wait_signal_update(self.proc, 100 + self.proc.stage, self.proc.pipe.switch_delay)
+        return True
+
+class TransHwRecv(p3s.Trans):
+    def sync(self):
+        self.channel.recv()
+
+class TransHwCalc(p3s.Trans):
+    def __init__(self, proc, channel, to_location, delay, send_delay):
+        super().__init__(proc, channel, True, to_location, None)
+        self.delay = delay
+        self.send_delay = send_delay
+    def get_delay(self):
+        return self.delay
+    def update(self, global_cycle):
+        self.channel.send(1, global_cycle, self.send_delay)
+        return False
+
+class TransIsr(p3s.Trans):
+    def sync(self):
+        self.channel.recv()
+    def update(self, global_cycle):
+        self.sig_task.signal.set_signal(self.sig_task, 100 + self.sig_task.stage)
+        self.proc.cpu.rest_isr_cycle = self.proc.overhead
+        self.proc.b_finished = True
+        return False
+
+
+def generate_model(seed):
+    '''
+    Get function to build random model.
+        [1] seed : seed of random numbers
+    '''
+    def build():
+        rnd = random.Random(seed)
+        def delay():
+            return rnd.choice((0, 1, 2, 3, 5, 8, 13, 2.5, rnd.randint(0, 40)))
+        num = rnd.randint(2, 4)
+        pipe = Pipeline(num, [rnd.randint(1, 4) for _ in range(num)], rnd.randint(1, 12), rnd.randint(0, 4))
+        sim = p3s.P3S(rnd.choice((1, 2, 5, 10)))
+        cpu = p3s.CPU_Model("CPU", 100, rnd.choice((None, 0, 2)))
+        priorities = list(define_p3s.TaskPriority)[:4]
+        tasks = []
+        for stage in range(num):
+            task = FuzzTask("TASK%d" % stage, rnd.choice(priorities), stage)
+            task.pipe = pipe
+            tasks.append(task)
+        for stage, task in enumerate(tasks):
+            task.prev = tasks[stage - 1] if stage > 0 else None
+            task.next = tasks[stage + 1] if stage < num - 1 else None
+            loc_in = p3s.Location("T%d_IN" % stage, False)
+            task.add_location(loc_in, True)
+            # Work graph
+            loc = p3s.Location("T%d_W0" % stage, False)
+            task.add_location(loc, False)
+            if stage == 0:
+                loc_in.add_trans(TransProduce(task, None, False, loc, None))
+                loc_done = p3s.Location("T0_DONE", False)
+                task.add_location(loc_done, False)
+                loc_in.add_trans(TransProduceEnd(task, None, False, loc_done, None))
+            else:
+                loc_in.add_trans(TransQueueEmpty(task, None, False, loc_in, None))
+                loc_in.add_trans(TransQueueGet(task, None, False, loc, None))
+            for x in range(rnd.randint(0, 3)):
+                next_loc = p3s.Location("T%d_W%d" % (stage, x + 1), False)
+                task.add_location(next_loc, False)
+                kind = rnd.randint(0, 2)
+                if kind == 0:
+                    loc.add_trans(TransWork(task, next_loc, delay()))
+                elif kind == 1:
+                    loc.add_trans(TransWorkVar(task, next_loc, delay(), rnd.randint(1, 4)))
+                else:
+                    other = p3s.Location("T%d_B%d" % (stage, x + 1), False)
+                    task.add_location(other, False)
+                    parity = rnd.randint(0, 1)
+                    loc.add_trans(TransBranch(task, other, parity))
+                    loc.add_trans(TransBranch(task, next_loc, 1 - parity))
+                    other.add_trans(TransWork(task, next_loc, delay()))
+                loc = next_loc
+            # H/W offload
+            if rnd.random() < 0.4:
+                ch_start = p3s.Channel("CH_START%d" % stage)
+                ch_finish = p3s.Channel("CH_FINISH%d" % stage)
+                task.kick_delay = rnd.randint(0, 6)
+                next_loc = p3s.Location("T%d_KICKED" % stage, False)
+                task.add_location(next_loc, False)
+                loc.add_trans(TransKick(task, ch_start, True, next_loc, None))
+                loc = next_loc
+                core = p3s.Process("HW%d" % stage)
+                hw_wait = p3s.Location("HW%d_WAIT" % stage, False)
+                hw_calc = p3s.Location("HW%d_CALC" % stage, False)
+                hw_wait.add_trans(TransHwRecv(core, ch_start, False, hw_calc, None))
+                hw_calc.add_trans(TransHwCalc(core, ch_finish, hw_wait, delay(), rnd.randint(0, 6)))
+                core.add_location(hw_wait, True)
+                core.add_location(hw_calc, False)
+                sim.add_hw(p3s.HW_Model("HW%d" % stage, 100, core))
+                isr = p3s.ISR("ISR%d" % stage, rnd.randint(3, 6), rnd.randint(0, 3), rnd.randint(0, 3))
+                isr.overhead = rnd.randint(0, 7)
+                isr_loc = p3s.Location("ISR%d_INIT" % stage, False)
+                isr_loc.add_trans(TransIsr(isr, ch_finish, False, isr_loc, task))
+                isr.add_location(isr_loc, True)
+                cpu.add_isr(isr)
+            # Output
+            if stage == num - 1:
+                loc_end = p3s.Location("T%d_END" % stage, True)
+                task.add_location(loc_end, False)
+                loc.add_trans(TransConsume(task, None, False, loc_in, None))
+                loc.add_trans(TransConsumeEnd(task, None, False, loc_end, None))
+            else:
+                loc.add_trans(TransQueueFull(task, None, False, loc, None))
+                loc.add_trans(TransQueuePut(task, None, False, loc_in, None))
+            cpu.add_task(task)
+        sim.add_cpu(cpu)
+        return sim
+    return build
+
+def fuzz(num, seed=0, engine_a="generic", engine_b="codegen", max_cycle=100000, b_verbose=True):
+    '''
+    Compare engines with random models.
+    Return value is list of seeds of models which diverge.
+        [1] num : number of random models
+        [2] seed : first seed
+        [3] engine_a : reference engine
+        [4] engine_b : engine to be checked
+        [5] max_cycle : Max cycle of one simulation
+        [6] b_verbose : Whether divergences are printed
+    '''
+    failures = []
+    for x in range(seed, seed + num):
+        harness = Harness(generate_model(x), max_cycle)
+        if not harness.compare(engine_a, engine_b):
+            failures.append(x)
+            if b_verbose:
+                print("[seed %d]" % x)
+                harness.report()
+    if b_verbose:
+        print("%d models, %d divergences" % (num, len(failures)))
+    return failures
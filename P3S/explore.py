@@ -0,0 +1,387 @@
+#!/usr/bin/env python
+
+''' Exhaustive worst-case exploration of P3S models
+
+ All nondeterministic choices of a model, i.e. two or more transitions
+ able at a location and candidate delays of Trans.get_delay_choices(),
+ are explored by re-simulating the model from the beginning with
+ a sequence of choices (stateless search).
+ The state at each choice point is hashed, and visited states are stored
+ as 64-bit hash values (hash compaction) or as bits of a bit array
+ (bitstate hashing) to prune the search.
+
+ Usage:
+   explorer = explore.Explorer(build_model, state_fn=get_state)
+   explorer.explore()
+   explorer.report()
+
+   build_model : function to build new P3S class object (and to reset
+                 all global vars of the model)
+   get_state   : function to return global vars of the model (tuple)
+ Both functions must be module level functions if jobs > 1.
+'''
+
+import hashlib
+import multiprocessing
+
+from P3S import p3s
+
+
+class Pruned(Exception):
+    '''
+    Raised when the search reaches a visited state.
+    '''
+    pass
+
+
+class HashCompactionSet():
+
+    def __init__(self):
+        '''
+        Constructor of HashCompactionSet class.
+        '''
+        self.hashes = set()
+
+    def add(self, h):
+        self.hashes.add(h)
+
+    def __contains__(self, h):
+        return h in self.hashes
+
+    def __len__(self):
+        return len(self.hashes)
+
+
+class BitstateSet():
+
+    def __init__(self, bits):
+        '''
+        Constructor of BitstateSet class.
+        (two bits are set for each state, so it may have false positives)
+            [1] bits : log2 of the number of bits of the bit array
+        '''
+        self.mask = (1 << bits) - 1
+        self.array = bytearray((1 << bits) // 8 + 1)
+        self.count = 0
+
+    def get_index(self, h):
+        return (h & self.mask, (h >> 32) & self.mask)
+
+    def add(self, h):
+        for x in self.get_index(h):
+            self.array[x >> 3] |= (1 << (x & 7))
+        self.count += 1
+
+    def __contains__(self, h):
+        for x in self.get_index(h):
+            if not self.array[x >> 3] & (1 << (x & 7)):
+                return False
+        return True
+
+    def __len__(self):
+        return self.count
+
+
+def get_scalar_vars(obj):
+    '''
+    Get scalar attributes of object (user defined variables of Process etc.)
+        [1] obj : object
+    '''
+    return tuple((k, v) for k, v in sorted(vars(obj).items()) if isinstance(v, (int, float, str)))
+
+def get_state(sim, global_cycle, state_fn):
+    '''
+    Get state of simulation model.
+        [1] sim : P3S class object
+        [2] global_cycle : Current cycle
+        [3] state_fn : function to return global vars of the model
+    '''
+    state = [global_cycle]
+    channels = []
+    resources = []
+    for proc in sim.get_processes():
+        trans_index = -1
+        rest_cycle = 0
+        if proc.current_trans:
+            trans_index = proc.current_loc.transitions.index(proc.current_trans)
+            rest_cycle = proc.rest_trans_cycle
+        state.append((proc.name, proc.current_loc.name if proc.current_loc else None,
+                      trans_index, rest_cycle, str(proc.trans_state), str(getattr(proc, "task_state", None)),
+                      getattr(getattr(proc, "signal", None), "wait_id", None), get_scalar_vars(proc)))
+        for loc in proc.locations:
+            for trans in loc.transitions:
+                channel = trans.get_link("channel", proc)
+                if channel and channel not in channels:
+                    channels.append(channel)
+                for resource, size in trans.resources:
+                    if resource not in resources:
+                        resources.append(resource)
+    for ch in channels:
+        state.append((ch.name, ch.link_free_cycle, tuple((str(k), tuple(v)) for k, v in ch.fifos.items())))
+    for resource in resources:
+        state.append((resource.name, tuple((r[3], r[4]) for r in resource.reservations)))
+    if sim.cpu:
+        cpu = sim.cpu
+        state.append((cpu.cycle, cpu.rest_task_cycle, cpu.rest_isr_cycle,
+                      (cpu.tail_chain[0].name, cpu.tail_chain[1]) if cpu.tail_chain else None,
+                      cpu.current_task.name if cpu.current_task else None,
+                      cpu.current_isr.name if cpu.current_isr else None))
+    for hw in sim.hw:
+        state.append(hw.cycle)
+    if state_fn:
+        state.append(state_fn())
+    return state
+
+def hash_state(state):
+    '''
+    Get 64-bit hash value of state.
+        [1] state : state of simulation model
+    '''
+    return int.from_bytes(hashlib.blake2b(repr(state).encode(), digest_size=8).digest(), "little")
+
+def get_dependent_processes(sim):
+    '''
+    Get processes which can affect finished cycle.
+    Processes are dependent if they share CPU, channel, signal or resource.
+    Processes which are independent of the processes having end location
+    cannot affect finished cycle, so their choices need not be explored.
+    (Dependency via global vars of user code is NOT detected.)
+        [1] sim : P3S class object
+    '''
+    procs = sim.get_processes()
+    links = {proc: set() for proc in procs}
+    shared = {}
+    for proc in procs:
+        if getattr(proc, "cpu", None):
+            shared.setdefault(proc.cpu, []).append(proc)
+        for loc in proc.locations:
+            for trans in loc.transitions:
+                channel = trans.get_link("channel", proc)
+                sig_task = trans.get_link("sig_task", proc)
+                if channel:
+                    shared.setdefault(channel, []).append(proc)
+                if sig_task in links:
+                    links[proc].add(sig_task)
+                    links[sig_task].add(proc)
+                for resource, size in trans.resources:
+                    shared.setdefault(resource, []).append(proc)
+    for members in shared.values():
+        for proc in members:
+            links[proc].update(members)
+    dependent = set()
+    stack = [proc for proc in procs if any(loc.b_end for loc in proc.locations)]
+    while stack:
+        proc = stack.pop()
+        if proc not in dependent:
+            dependent.add(proc)
+            stack.extend(links[proc])
+    return dependent
+
+
+class Chooser(p3s.Observer):
+
+    def __init__(self, sim, prefix, visited, state_fn, dependent):
+        '''
+        Constructor of Chooser class.
+            [1] sim : P3S class object
+            [2] prefix : choices to be replayed
+            [3] visited : set of visited state hashes (None: not pruned)
+            [4] state_fn : function to return global vars of the model
+            [5] dependent : processes whose choices are explored (None: all)
+        '''
+        self.sim = sim
+        self.prefix = prefix
+        self.visited = visited
+        self.state_fn = state_fn
+        self.dependent = dependent
+        self.choices = [] # taken option at each choice point
+        self.points = []  # (number of options, state hash) at each choice point
+        self.trace = []
+
+    def choose(self, proc, num, global_cycle):
+        if self.dependent != None and proc not in self.dependent:
+            return 0
+        depth = len(self.choices)
+        h = hash_state(get_state(self.sim, global_cycle, self.state_fn))
+        if depth < len(self.prefix):
+            index = self.prefix[depth]
+        else:
+            if self.visited != None:
+                if h in self.visited:
+                    raise Pruned()
+                self.visited.add(h)
+            index = 0
+        self.choices.append(index)
+        self.points.append((num, h))
+        return index
+
+    def choose_trans(self, proc, enabled, global_cycle):
+        index = self.choose(proc, len(enabled), global_cycle)
+        self.trace.append("#" + proc.name + " C:{0} : choose transition to ".format(global_cycle) + enabled[index].to_location.name)
+        return enabled[index]
+
+    def choose_delay(self, proc, trans, delays, global_cycle):
+        index = self.choose(proc, len(delays), global_cycle)
+        self.trace.append("#" + proc.name + " C:{0} : choose delay {1}".format(global_cycle, delays[index]))
+        return delays[index]
+
+    def location_changed(self, proc, global_cycle):
+        self.trace.append("@" + proc.name + " C:{0} : change location to ".format(global_cycle) + proc.current_loc.name)
+
+
+def run_path(build, prefix, visited, state_fn, max_cycle, b_reduce):
+    '''
+    Simulate one path of the model.
+    Return value is dict of result.
+        [1] build : function to build P3S class object
+        [2] prefix : choices to be replayed
+        [3] visited : set of visited state hashes (None: not pruned)
+        [4] state_fn : function to return global vars of the model
+        [5] max_cycle : Max cycle to be simulated
+        [6] b_reduce : Whether choices of independent processes are skipped
+    '''
+    sim = build()
+    sim.b_verbose = False
+    dependent = get_dependent_processes(sim) if b_reduce else None
+    chooser = Chooser(sim, prefix, visited, state_fn, dependent)
+    sim.chooser = chooser
+    sim.add_observer(chooser)
+    finish_cycle = None
+    b_pruned = False
+    deadlock = None
+    try:
+        finish_cycle = sim.simulate(max_cycle)
+    except Pruned:
+        b_pruned = True
+    except p3s.DeadlockError as error:
+        # Path is not finished (wait-for graph is kept in trace)
+        deadlock = error.kind
+        chooser.trace += str(error).splitlines()
+    latency = {}
+    if sim.cpu:
+        for isr in sim.cpu.isrs:
+            latency[isr.name] = isr.latency_hist.max
+    return {"prefix": prefix, "choices": chooser.choices, "points": chooser.points,
+            "trace": chooser.trace, "finish": finish_cycle, "pruned": b_pruned, "deadlock": deadlock,
+            "latency": latency}
+
+def _run_job(args):
+    return run_path(*args)
+
+
+class Explorer():
+
+    def __init__(self, build, state_fn=None, max_cycle=None, bitstate_bits=0, jobs=1, max_paths=None, b_reduce=False):
+        '''
+        Constructor of Explorer class.
+            [1] build : function to build P3S class object
+            [2] state_fn : function to return global vars of the model
+            [3] max_cycle : Max cycle of one path (path is regarded as not finished)
+            [4] bitstate_bits : log2 of bits for bitstate hashing (0: hash compaction)
+            [5] jobs : number of worker processes
+            [6] max_paths : Max number of paths to be simulated (None: no limit)
+            [7] b_reduce : Whether choices of independent processes are skipped
+        '''
+        self.build = build
+        self.state_fn = state_fn
+        self.max_cycle = max_cycle
+        self.bitstate_bits = bitstate_bits
+        self.jobs = jobs
+        self.max_paths = max_paths
+        self.b_reduce = b_reduce
+        self.visited = None
+        self.num_of_paths = 0
+        self.num_of_pruned = 0
+        self.num_of_unfinished = 0
+        self.num_of_deadlock = 0
+        self.worst = None
+        self.deadlock = None # First path stopped by DeadlockError
+        self.best_cycle = None
+        self.worst_latency = {}
+
+    def expand(self, result, b_checked, frontier):
+        '''
+        Add unexplored choices of a simulated path to frontier.
+            [1] result : result of run_path()
+            [2] b_checked : Whether visited states were checked while simulating
+            [3] frontier : list of prefixes to be simulated
+        '''
+        self.num_of_paths += 1
+        choices = result["choices"]
+        for x in range(len(result["prefix"]), len(result["points"])):
+            num, h = result["points"][x]
+            if not b_checked:
+                if h in self.visited:
+                    break
+                self.visited.add(h)
+            for index in range(1, num):
+                frontier.append(choices[:x] + [index])
+        # Latency observed until a visited state is reached is merged too
+        for name, latency in result["latency"].items():
+            if latency != None and latency > self.worst_latency.get(name, -1):
+                self.worst_latency[name] = latency
+        if result["pruned"]:
+            self.num_of_pruned += 1
+            return
+        if result["finish"] == None:
+            self.num_of_unfinished += 1
+            if result["deadlock"]:
+                self.num_of_deadlock += 1
+                if self.deadlock == None:
+                    self.deadlock = result
+            return
+        if self.worst == None or result["finish"] > self.worst["finish"]:
+            self.worst = result
+        if self.best_cycle == None or result["finish"] < self.best_cycle:
+            self.best_cycle = result["finish"]
+
+    def explore(self):
+        '''
+        Explore all paths of the model.
+        Return value is worst-case finished cycle
+        '''
+        if self.bitstate_bits > 0:
+            self.visited = BitstateSet(self.bitstate_bits)
+        else:
+            self.visited = HashCompactionSet()
+        frontier = [[]]
+        if self.jobs > 1:
+            with multiprocessing.Pool(self.jobs) as pool:
+                while frontier and not self.is_over():
+                    # Expand frontier level by level
+                    batch = frontier[:self.jobs * 16]
+                    del frontier[:self.jobs * 16]
+                    args = [(self.build, prefix, None, self.state_fn, self.max_cycle, self.b_reduce) for prefix in batch]
+                    for result in pool.imap(_run_job, args):
+                        self.expand(result, False, frontier)
+        else:
+            while frontier and not self.is_over():
+                prefix = frontier.pop()
+                result = run_path(self.build, prefix, self.visited, self.state_fn, self.max_cycle, self.b_reduce)
+                self.expand(result, True, frontier)
+        return self.worst["finish"] if self.worst else None
+
+    def is_over(self):
+        return self.max_paths != None and self.num_of_paths >= self.max_paths
+
+    def report(self):
+        '''
+        Print result of exploration and worst-case path.
+        '''
+        print("Explored paths: %d (pruned: %d, not finished: %d, deadlock: %d)" % (self.num_of_paths, self.num_of_pruned,
+                                                                                  self.num_of_unfinished, self.num_of_deadlock))
+        print("Visited states: %d" % len(self.visited))
+        for name, latency in sorted(self.worst_latency.items()):
+            print("Worst-case latency of %s: %d" % (name, latency))
+        if self.deadlock:
+            print("Deadlocked path:")
+            for line in self.deadlock["trace"]:
+                print(line)
+        if self.worst == None:
+            print("No path is finished.")
+            return
+        print("Best-case finished cycle: %d" % self.best_cycle)
+        print("Worst-case finished cycle: %d" % self.worst["finish"])
+        print("Worst-case path:")
+        for line in self.worst["trace"]:
+            print(line)
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+
+''' Parametric memory hierarchy model of P3S transitions
+
+ Memory regions (flash, SRAM, ...) have address ranges and wait cycles,
+ and cacheable regions are accessed through a set-associative cache
+ (LRU, write-through without write-allocate), such as a flash
+ accelerator or a data cache.
+ A transition describes its access pattern (ex: sequential copy of N
+ bytes from region A to region B) by Trans.add_access(), and the delay
+ of the accesses is added to its delay. One MemoryModel is shared by all
+ tasks on the same CPU, so the cache state is affected by accesses of
+ other tasks.
+ Cache states are interned, and the result (delay, next state) of each
+ access pattern from each state is memoized, so repeated frames do not
+ re-simulate identical access streams.
+
+ Usage:
+   mem = memory.get_lpc1768()
+   app_tr2.add_access(mem, lambda: mem.copy("FLASH", "AHB_SRAM0", mbed_conf.F_SIZE))
+   cksm_tr3.add_access(mem, lambda: mem.read("AHB_SRAM0", mbed_conf.F_SIZE))
+   ...
+   sim.simulate()
+   mem.report()
+'''
+
+
+class Region():
+
+    def __init__(self, name, base, size, wait_cycle=0, b_cacheable=False, width=4):
+        '''
+        Constructor of Region class.
+            [1] name : Name of Region class object
+            [2] base : base address
+            [3] size : size (bytes)
+            [4] wait_cycle : wait cycles of one bus access
+            [5] b_cacheable : Whether accessed through cache
+            [6] width : bus width (bytes)
+        '''
+        self.name = name
+        self.base = base
+        self.size = size
+        self.wait_cycle = wait_cycle
+        self.b_cacheable = b_cacheable
+        self.width = width
+
+
+class Access():
+
+    def __init__(self, streams, element=4):
+        '''
+        Constructor of Access class (access pattern of a transition).
+            [1] streams : list of (Region, offset, size, stride, b_write)
+                          (streams are interleaved element by element, ex: copy)
+            [2] element : access size of one load/store (bytes)
+        '''
+        self.streams = tuple(streams)
+        self.element = element
+        self.key = (tuple((r.name, offset, size, stride, b_write) for r, offset, size, stride, b_write in self.streams),
+                    element)
+
+    def get_addresses(self):
+        '''
+        Get list of (Region, address, b_write) in access order.
+        '''
+        iters = []
+        for region, offset, size, stride, b_write in self.streams:
+            iters.append([(region, region.base + (offset + x) % region.size, b_write)
+                          for x in range(0, size, stride)])
+        addresses = []
+        for x in range(max(len(i) for i in iters) if iters else 0):
+            for i in iters:
+                if x < len(i):
+                    addresses.append(i[x])
+        return addresses
+
+
+class Cache():
+
+    def __init__(self, name, size, line_size, ways, hit_cycle=0):
+        '''
+        Constructor of Cache class (set-associative, LRU).
+            [1] name : Name of Cache class object
+            [2] size : size (bytes)
+            [3] line_size : line size (bytes)
+            [4] ways : associativity
+            [5] hit_cycle : additional cycles of hit
+        '''
+        self.name = name
+        self.line_size = line_size
+        self.ways = ways
+        self.num_of_set = max(1, size // (line_size * ways))
+        self.hit_cycle = hit_cycle
+
+    def get_empty_state(self):
+        return tuple(() for _ in range(self.num_of_set))
+
+
+class MemoryModel():
+
+    def __init__(self, name, regions, cache=None, access_cycle=1, scale=1.0, memo_size=1 << 16):
+        '''
+        Constructor of MemoryModel class.
+            [1] name : Name of MemoryModel class object
+            [2] regions : list of Region class object
+            [3] cache : Cache class object (None: no cache)
+            [4] access_cycle : cycles of one load/store without wait
+            [5] scale : delay of transition per memory cycle
+                        (ex: 1/64 if delays of the model are in units of 64 cycles)
+            [6] memo_size : max number of memoized results (cleared when exceeded)
+        '''
+        self.name = name
+        self.regions = dict((r.name, r) for r in regions)
+        self.cache = cache
+        self.access_cycle = access_cycle
+        self.scale = scale
+        self.memo_size = memo_size
+        self.states = []    # interned cache states
+        self.state_ids = {} # cache state : index of self.states
+        self.memo = {}      # (state index, Access.key) : (delay, next state index)
+        self.state = self.intern(cache.get_empty_state() if cache else ())
+        self.num_of_access = 0
+        self.num_of_memo_hit = 0
+        self.hits = 0
+        self.misses = 0
+        self.cycles = 0
+
+    def intern(self, state):
+        if state not in self.state_ids:
+            self.state_ids[state] = len(self.states)
+            self.states.append(state)
+        return self.state_ids[state]
+
+    def get_region(self, name):
+        return self.regions[name] if isinstance(name, str) else name
+
+    def read(self, region, size, offset=0, stride=None):
+        '''
+        Get Access of sequential read.
+            [1] region : Region class object or its name
+            [2] size : size (bytes)
+            [3] offset : start offset in region
+            [4] stride : stride (bytes, None: element size)
+        '''
+        return Access([(self.get_region(region), offset, size, stride or 4, False)])
+
+    def write(self, region, size, offset=0, stride=None):
+        '''
+        Get Access of sequential write.
+            [1] region : Region class object or its name
+            [2] size : size (bytes)
+            [3] offset : start offset in region
+            [4] stride : stride (bytes, None: element size)
+        '''
+        return Access([(self.get_region(region), offset, size, stride or 4, True)])
+
+    def copy(self, src, dst, size, src_offset=0, dst_offset=0):
+        '''
+        Get Access of sequential copy (load and store of each element).
+            [1] src : source Region class object or its name
+            [2] dst : destination Region class object or its name
+            [3] size : size (bytes)
+            [4] src_offset : start offset in source region
+            [5] dst_offset : start offset in destination region
+        '''
+        return Access([(self.get_region(src), src_offset, size, 4, False),
+                       (self.get_region(dst), dst_offset, size, 4, True)])
+
+    def simulate(self, state, access):
+        '''
+        Simulate access pattern from cache state.
+        Return value is (memory cycles, next cache state, hits, misses)
+            [1] state : cache state (tuple of tags of each set in LRU order)
+            [2] access : Access class object
+        '''
+        cache = self.cache
+        sets = [list(s) for s in state] if cache else []
+        cycles = 0
+        hits = 0
+        misses = 0
+        for region, address, b_write in access.get_addresses():
+            cycles += self.access_cycle
+            bus_cycle = region.wait_cycle * max(1, -(-access.element // region.width))
+            if cache == None or not region.b_cacheable:
+                cycles += bus_cycle
+                continue
+            line = address // cache.line_size
+            tags = sets[line % cache.num_of_set]
+            tag = line // cache.num_of_set
+            if tag in tags:
+                hits += 1
+                tags.remove(tag)
+                tags.append(tag)
+                cycles += cache.hit_cycle
+                if b_write:
+                    cycles += bus_cycle
+            else:
+                misses += 1
+                if b_write:
+                    cycles += bus_cycle
+                    continue
+                # Line fill
+                cycles += region.wait_cycle * max(1, cache.line_size // region.width)
+                if len(tags) >= cache.ways:
+                    tags.pop(0)
+                tags.append(tag)
+        return (cycles, tuple(tuple(s) for s in sets), hits, misses)
+
+    def access(self, access):
+        '''
+        Access memory by pattern.
+        Return value is delay of transition (memory cycles x scale)
+            [1] access : Access class object
+        '''
+        self.num_of_access += 1
+        key = (self.state, access.key)
+        result = self.memo.get(key)
+        if result == None:
+            cycles, state, hits, misses = self.simulate(self.states[self.state], access)
+            if len(self.memo) >= self.memo_size:
+                self.memo.clear()
+                self.states = [self.states[self.state]]
+                self.state_ids = {self.states[0]: 0}
+                key = (0, access.key)
+            result = (cycles, self.intern(state), hits, misses)
+            self.memo[key] = result
+        else:
+            self.num_of_memo_hit += 1
+        cycles, self.state, hits, misses = result
+        self.hits += hits
+        self.misses += misses
+        self.cycles += cycles
+        return cycles * self.scale
+
+    def report(self):
+        '''
+        Print statistics of this memory model.
+        '''
+        total = self.hits + self.misses
+        print("[%s] accesses: %d (memoized %d), cycles: %d, cache hit: %d / %d (%.1f%%), states: %d" %
+              (self.name, self.num_of_access, self.num_of_memo_hit, self.cycles, self.hits, total,
+               (100.0 * self.hits / total) if total else 0.0, len(self.states)))
+
+
+def get_lpc1768(scale=1.0):
+    '''
+    Get MemoryModel of LPC1768 (flash accelerator: 128-bit lines, 5 wait states at 96MHz).
+        [1] scale : delay of transition per memory cycle
+    '''
+    regions = [Region("FLASH", 0x00000000, 512 * 1024, 4, True, 16),
+               Region("SRAM", 0x10000000, 32 * 1024, 0),
+               Region("AHB_SRAM0", 0x2007C000, 16 * 1024, 1),
+               Region("AHB_SRAM1", 0x20080000, 16 * 1024, 1)]
+    return MemoryModel("LPC1768", regions, Cache("FLASH_ACCEL", 128, 16, 8), scale=scale)
@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+
+''' Analytical queueing-network estimator of P3S models (MVA)
+
+ A P3S model is mapped onto a closed queueing network:
+   - customers : units of work (ex: frames), the population is given
+                 by a parameter (ex: MP_MAX, frames of the memory pool)
+   - stations  : each CPU_Model (all tasks and ISRs share one server)
+                 and each HW_Model
+   - demand    : sum of (visits per unit) x (delay) of transitions of
+                 the processes on the station, plus the overhead cycles
+                 set by update actions (task switch, ISR overhead) and
+                 ISR entry/exit costs
+   - delay     : delays of data sent to channels (outside of stations)
+ Visits and overheads are profiled by one reference simulation, and
+ delays are evaluated by get_delay() with the parameters of each
+ configuration, so no simulation is needed for estimates.
+ Finite buffers (ex: frame queue and cleanup queue on the CPU) limit
+ the number of units in a station; they are approximated by the
+ equivalent population whose number of states without blocking is
+ closest to that of the network with blocking (Akyildiz).
+ The network is solved by exact MVA (single class). Latency of each task
+ is approximated by preemptive priority scheduling on its CPU
+ (demand stretched by utilization of higher priority tasks).
+ Contention of Resources is not modeled, and a task blocked while its
+ unit is on a HW model (ex: waiting for the end of offloaded calculation)
+ is regarded as free, so the estimate is optimistic for such models.
+
+ Usage:
+   est = mva.Estimator(mbed_x2_test.build_model, "mbed_conf", "TransClupMpFree",
+                       population="MP_MAX", capacities={"CPU": ["FQ_MAX", "CQ_MAX", 3]})
+   print(est.estimate({"MP_MAX": 5, "F_SIZE": 1024}).cycle_per_unit)
+   est.validate([{"MP_MAX": 1}, {"MP_MAX": 3, "F_SIZE": 256}])
+   est.report()
+'''
+
+import importlib
+import multiprocessing
+import time
+
+from P3S import causal
+from P3S import p3s
+from P3S import store
+
+
+def solve_mva(demands, population, think=0.0):
+    '''
+    Solve closed queueing network by exact MVA (single class, single server stations).
+    Return value is (throughput, list of response time, list of queue length)
+        [1] demands : list of service demand of each station (cycle per unit)
+        [2] population : number of customers
+        [3] think : delay (cycle per unit) outside of stations
+    '''
+    queues = [0.0] * len(demands)
+    responses = list(demands)
+    throughput = 0.0
+    for n in range(1, population + 1):
+        responses = [d * (1.0 + q) for d, q in zip(demands, queues)]
+        total = think + sum(responses)
+        throughput = n / total if total > 0 else float("inf")
+        queues = [throughput * r for r in responses]
+    return (throughput, responses, queues)
+
+def count_states(capacities, population):
+    '''
+    Count states of closed network (distributions of customers on stations).
+        [1] capacities : list of capacity of each station (None: infinite)
+        [2] population : number of customers
+    '''
+    counts = [1] + [0] * population
+    for capacity in capacities:
+        limit = population if capacity == None else min(capacity, population)
+        counts = [sum(counts[n - k] for k in range(0, min(n, limit) + 1)) for n in range(population + 1)]
+    return counts[population]
+
+def get_equivalent_population(capacities, population):
+    '''
+    Get population of network without blocking equivalent to network with finite buffers.
+        [1] capacities : list of capacity of each station (None: infinite)
+        [2] population : number of customers
+    '''
+    if population == 0 or all(c == None or c >= population for c in capacities):
+        return population
+    target = count_states(capacities, population)
+    unlimited = [None] * len(capacities)
+    return min(range(1, population + 1), key=lambda n: (abs(count_states(unlimited, n) - target), -n))
+
+
+class Profile(p3s.Observer):
+
+    def __init__(self, progress):
+        '''
+        Constructor of Profile class (visits and overheads of transitions).
+            [1] progress : Trans class name of progress point (end of one unit)
+        '''
+        self.progress = progress
+        self.units = 0
+        self.visits = {}    # (Process, Trans) : number of updates
+        self.overheads = {} # (Process, Trans) : sum of overhead cycles set by update
+        self.transit = 0    # sum of delay of data sent to channels
+
+    def trans_updated(self, proc, global_cycle):
+        key = (proc, proc.current_trans)
+        self.visits[key] = self.visits.get(key, 0) + 1
+        cpu = getattr(proc, "cpu", None)
+        if cpu:
+            overhead = cpu.rest_isr_cycle if isinstance(proc, p3s.ISR) else cpu.rest_task_cycle
+            self.overheads[key] = self.overheads.get(key, 0) + overhead
+        channel = proc.current_trans.get_link("channel", proc)
+        if channel and proc.current_trans.b_send:
+            # Sent data is appended to FIFOs of all receivers
+            fifo = next(iter(channel.fifos.values()))
+            if fifo:
+                self.transit += max(0, fifo[-1][1] - global_cycle)
+        if type(proc.current_trans).__name__ == self.progress:
+            self.units += 1
+
+
+class Estimate():
+
+    def __init__(self, throughput, population, stations, demands, responses, task_latency):
+        '''
+        Constructor of Estimate class.
+            [1] throughput : units per cycle
+            [2] population : equivalent population
+            [3] stations : list of station names
+            [4] demands : list of demand of each station (cycle per unit)
+            [5] responses : list of response time of each station (cycle per unit)
+            [6] task_latency : dict of task name : latency per unit (cycle)
+        '''
+        self.throughput = throughput
+        self.population = population
+        self.stations = stations
+        self.demands = demands
+        self.responses = responses
+        self.task_latency = task_latency
+        self.cycle_per_unit = (1.0 / throughput) if throughput > 0 else float("inf")
+        self.latency = (population / throughput) if throughput > 0 else float("inf")
+
+    def get_utilization(self):
+        return {name: self.throughput * d for name, d in zip(self.stations, self.demands)}
+
+
+class CountingBuild():
+
+    def __init__(self, build, progress):
+        '''
+        Constructor of CountingBuild class (build function with progress counter).
+            [1] build : module level function to build P3S class object
+            [2] progress : Trans class name of progress point
+        '''
+        self.build = build
+        self.progress = progress
+
+    def __call__(self):
+        sim = self.build()
+        sim.add_observer(causal.ProgressCounter(self.progress))
+        return sim
+
+def get_units(sim):
+    for observer in sim.observers:
+        if isinstance(observer, causal.ProgressCounter):
+            return {"units": observer.count}
+    return {"units": None}
+
+def _run_job(args):
+    return store.run_point(*args)
+
+
+class Estimator():
+
+    def __init__(self, build, config, progress, population, capacities=None, params=None, max_cycle=None):
+        '''
+        Constructor of Estimator class.
+            [1] build : module level function to build P3S class object
+            [2] config : name of configuration module
+            [3] progress : Trans class name of progress point (end of one unit)
+            [4] population : number of units in the network (int or parameter name)
+            [5] capacities : dict of station name : capacity
+                             (int, parameter name, or list of them which are summed)
+            [6] params : dict of parameter name : value of reference simulation
+            [7] max_cycle : Max cycle of simulations
+        '''
+        self.build = build
+        self.config = config
+        self.progress = progress
+        self.population = population
+        self.capacities = capacities if capacities else {}
+        self.params = params if params else {}
+        self.max_cycle = max_cycle
+        self.module = importlib.import_module(config) if config else None
+        self.results = [] # (params, estimated cycle per unit, simulated cycle per unit, estimate time (sec))
+        self.profile()
+
+    def set_params(self, params):
+        saved = {}
+        if self.module:
+            for name, value in params.items():
+                saved[name] = getattr(self.module, name, None)
+                setattr(self.module, name, value)
+        return saved
+
+    def profile(self):
+        '''
+        Simulate reference point and profile visits and overheads of transitions per unit.
+        '''
+        saved = self.set_params(self.params)
+        try:
+            self.sim = self.build()
+            self.sim.b_verbose = False
+            prof = Profile(self.progress)
+            self.sim.add_observer(prof)
+            self.sim.simulate(self.max_cycle)
+        finally:
+            self.set_params(saved)
+        if prof.units == 0:
+            raise ValueError("progress point %s is not reached" % self.progress)
+        self.units = prof.units
+        self.station_names = ([self.sim.cpu.name] if self.sim.cpu else []) + [hw.name for hw in self.sim.hw]
+        stations = {}
+        if self.sim.cpu:
+            for proc in self.sim.cpu.isrs + self.sim.cpu.tasks:
+                stations[proc] = self.sim.cpu.name
+        for hw in self.sim.hw:
+            stations[hw.core] = hw.name
+        # (station, Process, Trans, visits per unit, overhead per unit)
+        self.entries = [(stations[proc], proc, trans, count / prof.units, prof.overheads.get((proc, trans), 0) / prof.units)
+                        for (proc, trans), count in prof.visits.items() if proc in stations]
+        self.think = prof.transit / prof.units
+        # ISR entry/exit cost per unit
+        self.isr_cost = 0.0
+        if self.sim.cpu:
+            for isr in self.sim.cpu.isrs:
+                self.isr_cost += isr.exec_hist.count * (isr.entry_cycle + isr.exit_cycle) / prof.units
+
+    def get_value(self, spec, params):
+        if spec == None:
+            return None
+        if isinstance(spec, (list, tuple)):
+            return sum(self.get_value(s, params) for s in spec)
+        if isinstance(spec, str):
+            return params[spec] if spec in params else getattr(self.module, spec)
+        return spec
+
+    def estimate(self, params=None):
+        '''
+        Estimate throughput and latency of configuration.
+        Return value is Estimate class object
+            [1] params : dict of parameter name : value
+        '''
+        params = dict(self.params, **(params if params else {}))
+        saved = self.set_params(params)
+        try:
+            demands = dict((name, 0.0) for name in self.station_names)
+            task_demands = {}
+            for station, proc, trans, visits, overhead in self.entries:
+                if proc.template:
+                    trans.bind(proc)
+                delay = trans.get_delay() * self.sim.delay_scale.get(type(trans).__name__, 1)
+                demand = visits * delay + overhead
+                demands[station] += demand
+                task_demands[proc] = task_demands.get(proc, 0.0) + demand
+            if self.sim.cpu:
+                demands[self.sim.cpu.name] += self.isr_cost
+            population = self.get_value(self.population, params)
+            capacities = [self.get_value(self.capacities.get(name), params) for name in self.station_names]
+        finally:
+            self.set_params(saved)
+        equivalent = get_equivalent_population(capacities, population)
+        values = [demands[name] for name in self.station_names]
+        throughput, responses, _ = solve_mva(values, equivalent, self.think)
+        # Preemptive priority on CPU
+        task_latency = {}
+        if self.sim.cpu:
+            higher = 0.0
+            for proc in self.sim.cpu.isrs + self.sim.cpu.tasks:
+                demand = task_demands.get(proc, 0.0)
+                rest = 1.0 - throughput * higher
+                task_latency[proc.name] = (demand / rest) if rest > 0 else float("inf")
+                higher += demand
+        return Estimate(throughput, equivalent, self.station_names, values, responses, task_latency)
+
+    def validate(self, points, jobs=None):
+        '''
+        Compare estimates with simulations.
+        Return value is mean absolute relative error of cycles per unit.
+            [1] points : list of dict of parameter name : value
+            [2] jobs : number of worker processes (None: number of CPUs)
+        '''
+        build = CountingBuild(self.build, self.progress)
+        args = [(build, self.config, dict(self.params, **p), self.max_cycle, get_units) for p in points]
+        with multiprocessing.Pool(jobs) as pool:
+            results = pool.map(_run_job, args)
+        self.results = []
+        for point, result in zip(points, results):
+            start = time.perf_counter()
+            estimate = self.estimate(point)
+            elapsed = time.perf_counter() - start
+            simulated = (result["finish"] / result["units"]) if result["finish"] and result["units"] else None
+            self.results.append((point, estimate.cycle_per_unit, simulated, elapsed))
+        errors = [abs(e - s) / s for _, e, s, _ in self.results if s]
+        return (sum(errors) / len(errors)) if errors else None
+
+    def report(self, params=None):
+        '''
+        Print estimate and result of validation.
+            [1] params : dict of parameter name : value of printed estimate
+        '''
+        estimate = self.estimate(params)
+        print("Reference: %d units profiled, population %s" % (self.units, estimate.population))
+        print("Throughput: %.6f units/cycle (%.3f cycle/unit), latency %.3f cycle" %
+              (estimate.throughput, estimate.cycle_per_unit, estimate.latency))
+        utilization = estimate.get_utilization()
+        for name, demand, response in zip(estimate.stations, estimate.demands, estimate.responses):
+            print("  [%s] demand %.3f, response %.3f, utilization %.1f%%" % (name, demand, response, 100.0 * utilization[name]))
+        for name, latency in estimate.task_latency.items():
+            print("  [%s] latency %.3f" % (name, latency))
+        if len(self.results) == 0:
+            return
+        print("%-40s %12s %12s %8s %10s" % ("Point", "estimated", "simulated", "error", "time(us)"))
+        for point, estimated, simulated, elapsed in self.results:
+            label = ",".join("%s=%s" % (k, v) for k, v in sorted(point.items()))
+            if simulated:
+                error = "%+7.2f%%" % (100.0 * (estimated - simulated) / simulated)
+            else:
+                error = "-"
+            print("%-40s %12.3f %12s %8s %10.1f" % (label, estimated, ("%.3f" % simulated) if simulated else "-", error, 1e6 * elapsed))
@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+
+''' Design-space optimizer of P3S models
+
+ Parameters of the configuration module (ex: MP_MAX, F_SIZE, task
+ priorities) are searched by evolutionary search within a budget of
+ simulations, instead of a full grid sweep.
+   - Each generation makes offspring by crossover and mutation of
+     parents selected by tournament (Pareto rank, then objectives).
+   - Constraints are checked before simulation, so infeasible points
+     (ex: total pool memory) are never simulated.
+   - If fidelity is given (ex: NUM_OF_FRAME), offspring are filtered by
+     successive halving: all of them are simulated with the shortest run,
+     and only the best 1/eta survive to the next longer run.
+   - Simulations of one generation are run in parallel.
+ All objectives are minimized, and the Pareto front of points simulated
+ with full fidelity is returned.
+
+ Usage:
+   space = {"MP_MAX": [1, 2, 3, 4, 5], "F_SIZE": [256, 512, 1024],
+            "APP_TASK_PRIORITY": list(define_p3s.TaskPriority)[:4]}
+   opt = optimize.Optimizer(build_model, "mbed_conf", space, ["finish"],
+                            constraints=[lambda p: p["MP_MAX"] * p["F_SIZE"] <= 4096],
+                            fidelity=("NUM_OF_FRAME", [2, 5, 10]), budget=200)
+   front = opt.search()
+   opt.report()
+'''
+
+import multiprocessing
+import random
+
+from P3S import store
+
+
+def dominates(a, b):
+    '''
+    Whether objective values a dominate b.
+        [1] a : list of objective values
+        [2] b : list of objective values
+    '''
+    return all(x <= y for x, y in zip(a, b)) and any(x < y for x, y in zip(a, b))
+
+def get_ranks(values):
+    '''
+    Get Pareto rank of each objective values (0: non-dominated).
+        [1] values : list of list of objective values
+    '''
+    ranks = [None] * len(values)
+    rest = list(range(len(values)))
+    rank = 0
+    while rest:
+        front = [x for x in rest if not any(dominates(values[y], values[x]) for y in rest if y != x)]
+        for x in front:
+            ranks[x] = rank
+        rest = [x for x in rest if ranks[x] == None]
+        rank += 1
+    return ranks
+
+def _run_job(args):
+    return store.run_point(*args)
+
+
+class Optimizer():
+
+    def __init__(self, build, config, space, objectives, constraints=None, fidelity=None, eta=3,
+                 budget=100, population=8, jobs=None, max_cycle=None, collect=None, result_store=None, seed=0):
+        '''
+        Constructor of Optimizer class.
+            [1] build : module level function to build P3S class object
+            [2] config : name of configuration module
+            [3] space : dict of parameter name : list of candidate values
+            [4] objectives : list of result name or function(params, result) to be minimized
+            [5] constraints : list of function(params) which returns False if infeasible
+            [6] fidelity : (parameter name, list of values in ascending order of run length)
+            [7] eta : reduction ratio of successive halving
+            [8] budget : max number of simulations
+            [9] population : number of points kept in each generation
+            [10] jobs : number of worker processes (None: number of CPUs)
+            [11] max_cycle : Max cycle of one simulation
+            [12] collect : module level function to return dict of statistics from P3S class object
+            [13] result_store : store.ResultStore class object (None: results are not stored)
+            [14] seed : seed of random numbers
+        '''
+        self.build = build
+        self.config = config
+        self.space = space
+        self.names = sorted(space)
+        self.objectives = objectives
+        self.constraints = constraints if constraints else []
+        self.fidelity = fidelity
+        self.eta = eta
+        self.budget = budget
+        self.population = population
+        self.jobs = jobs
+        self.max_cycle = max_cycle
+        self.collect = collect
+        self.result_store = result_store
+        self.random = random.Random(seed)
+        self.num_of_sim = 0
+        self.evaluated = {} # point (tuple of values) : objective values with full fidelity
+        self.front = []
+
+    def is_feasible(self, params):
+        return all(constraint(params) for constraint in self.constraints)
+
+    def to_params(self, point, fidelity_value=None):
+        params = dict(zip(self.names, point))
+        if self.fidelity and fidelity_value != None:
+            params[self.fidelity[0]] = fidelity_value
+        return params
+
+    def get_objectives(self, params, result):
+        '''
+        Get objective values of simulation result.
+            [1] params : dict of parameter name : value
+            [2] result : dict of result (None if failed)
+        '''
+        values = []
+        for objective in self.objectives:
+            if callable(objective):
+                value = objective(params, result)
+            else:
+                value = result.get(objective) if result else None
+            values.append(float("inf") if value == None else value)
+        return values
+
+    def simulate(self, points, fidelity_value=None):
+        '''
+        Simulate points in parallel.
+        Return value is list of objective values.
+            [1] points : list of point (tuple of values)
+            [2] fidelity_value : value of fidelity parameter (None: default of the model)
+        '''
+        params = [self.to_params(point, fidelity_value) for point in points]
+        if self.result_store:
+            sweep = store.Sweep(self.result_store, self.build, self.config, self.max_cycle, self.collect)
+            results = [result for _, result in sweep.run(params, self.jobs if self.jobs else multiprocessing.cpu_count())]
+        else:
+            args = [(self.build, self.config, p, self.max_cycle, self.collect) for p in params]
+            with multiprocessing.Pool(self.jobs) as pool:
+                results = pool.map(_run_job, args)
+        self.num_of_sim += len(points)
+        return [self.get_objectives(p, result) for p, result in zip(params, results)]
+
+    def evaluate(self, points):
+        '''
+        Evaluate points (successive halving if fidelity is given).
+        Evaluated points are added to self.evaluated.
+            [1] points : list of point (tuple of values)
+        '''
+        points = [point for point in points if point not in self.evaluated]
+        if self.fidelity:
+            for fidelity_value in self.fidelity[1][:-1]:
+                if len(points) <= 1 or self.num_of_sim + len(points) > self.budget:
+                    break
+                values = self.simulate(points, fidelity_value)
+                ranks = get_ranks(values)
+                order = sorted(range(len(points)), key=lambda x: (ranks[x], values[x]))
+                points = [points[x] for x in order[:max(1, len(points) // self.eta)]]
+            fidelity_value = self.fidelity[1][-1]
+        else:
+            fidelity_value = None
+        points = points[:max(0, self.budget - self.num_of_sim)]
+        if points:
+            for point, values in zip(points, self.simulate(points, fidelity_value)):
+                self.evaluated[point] = values
+
+    def random_point(self):
+        return tuple(self.random.choice(self.space[name]) for name in self.names)
+
+    def mutate(self, point):
+        '''
+        Change one parameter of point to neighboring candidate value.
+            [1] point : tuple of values
+        '''
+        point = list(point)
+        x = self.random.randrange(len(self.names))
+        candidates = self.space[self.names[x]]
+        index = candidates.index(point[x]) + self.random.choice((-1, 1))
+        point[x] = candidates[min(max(index, 0), len(candidates) - 1)]
+        return tuple(point)
+
+    def crossover(self, a, b):
+        return tuple(self.random.choice((x, y)) for x, y in zip(a, b))
+
+    def select(self, points, ranks):
+        '''
+        Select parent by binary tournament.
+            [1] points : list of point
+            [2] ranks : dict of point : Pareto rank
+        '''
+        a = self.random.choice(points)
+        b = self.random.choice(points)
+        return min(a, b, key=lambda p: (ranks[p], self.evaluated[p]))
+
+    def make_points(self, num, parents=None, ranks=None):
+        '''
+        Make new feasible points.
+            [1] num : number of points
+            [2] parents : list of parent points (None: random points)
+            [3] ranks : dict of point : Pareto rank
+        '''
+        points = []
+        for _ in range(num * 100):
+            if len(points) >= num:
+                break
+            if parents:
+                point = self.mutate(self.crossover(self.select(parents, ranks), self.select(parents, ranks)))
+            else:
+                point = self.random_point()
+            if point in self.evaluated or point in points or not self.is_feasible(self.to_params(point)):
+                continue
+            points.append(point)
+        return points
+
+    def search(self):
+        '''
+        Search design space until the budget is used up.
+        Return value is Pareto front (list of (params, objective values))
+        '''
+        # More points are made for successive halving
+        num = self.population * (self.eta ** (len(self.fidelity[1]) - 1) if self.fidelity else 1)
+        self.evaluate(self.make_points(num))
+        while self.num_of_sim < self.budget:
+            parents = list(self.evaluated)
+            values = [self.evaluated[p] for p in parents]
+            ranks = dict(zip(parents, get_ranks(values)))
+            parents = sorted(parents, key=lambda p: (ranks[p], self.evaluated[p]))[:self.population]
+            offspring = self.make_points(num, parents, ranks)
+            if len(offspring) == 0:
+                break # Design space is exhausted
+            self.evaluate(offspring)
+        points = list(self.evaluated)
+        ranks = get_ranks([self.evaluated[p] for p in points])
+        self.front = sorted([(self.to_params(p), self.evaluated[p]) for p, r in zip(points, ranks) if r == 0],
+                            key=lambda item: item[1])
+        return self.front
+
+    def report(self):
+        '''
+        Print Pareto front.
+        '''
+        print("Simulations: %d, Evaluated points: %d" % (self.num_of_sim, len(self.evaluated)))
+        names = [o if not callable(o) else o.__name__ for o in self.objectives]
+        print("Pareto front (%s):" % ", ".join(names))
+        for params, values in self.front:
+            print("  %s : %s" % (", ".join("%s=%s" % (n, int(v) if hasattr(v, "value") else v) for n, v in params.items()),
+                                 ", ".join(str(v) for v in values)))
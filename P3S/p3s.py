@@ -6,6 +6,16 @@
  ===========================================================
  Date           Version   Description
  ===========================================================
+ 19 Oct. 2026   1.14      Add memory accesses of transitions (memory hierarchy model)
+ 19 Oct. 2026   1.13      Deadlock/livelock detection (DeadlockError, wait-for graph)
+ 19 Oct. 2026   1.12      Split simulate() into start()/step() (incremental run)
+ 19 Oct. 2026   1.11      Add ProcessTemplate class (shared Location/Trans graph)
+ 19 Oct. 2026   1.10      Add Observer class (transition/signal/preemption events)
+ 19 Oct. 2026   1.9       Add delay scaling of transitions (virtual speedup)
+ 19 Oct. 2026   1.8       Add choice hook, observers and quiet mode to P3S
+ 19 Oct. 2026   1.7       Nested interrupt (entry/exit cost, mask, tail-chain)
+ 19 Oct. 2026   1.6       Add Resource class (shared bus/memory contention)
+ 19 Oct. 2026   1.5       Buffered Channel (FIFO, bandwidth, broadcast)
  19 Feb. 2017   1.4       Add ISR class
  11 Feb. 2017   1.3       Signal belonged to Task
   9 Feb. 2017   1.2       Add Signal class
@@ -14,11 +24,13 @@
  -----------------------------------------------------------
 '''
 
-__version__ = "1.4"
-__date__    = "19 Feb. 2017"
+__version__ = "1.14"
+__date__    = "19 Oct. 2026"
 __author__  = "Shun SUGIMOTO <sugimoto.shun@gmail.com>"
 
+from collections import deque
 from P3S import define_p3s
+from P3S import stats
 
 class Process():
 
@@ -32,7 +44,12 @@ class Process():
         self.current_loc = None
         self.current_trans = None
         self.trans_state = None
+        self.rest_trans_cycle = 0
         self.b_finished = False
+        self.sim = None
+        self.template = None
+        self.links = {}
+        self.b_select_inline = False # Whether restart() selects transition without select_trans()
 
     def add_location(self, loc, b_init):
         '''
@@ -44,6 +61,74 @@ class Process():
         if b_init:
             self.current_loc = loc
 
+    def link(self, key, obj):
+        '''
+        Link object to this Process.
+        Shared Trans class objects of ProcessTemplate refer to it by key
+        (ex: sig_task and channel given as key string).
+            [1] key : key string
+            [2] obj : object (Task, Channel etc.)
+        '''
+        self.links[key] = obj
+
+    def select_trans(self, global_cycle):
+        '''
+        Select transition to be able at current location.
+        Return value is Trans class object (None if there is no transition to be able)
+        If P3S has chooser and two or more transitions are able,
+        the chooser selects one of them.
+            [1] global_cycle : Current cycle
+        '''
+        if self.template:
+            for trans in self.current_loc.transitions:
+                trans.bind(self)
+        if self.sim and self.sim.chooser:
+            enabled = [trans for trans in self.current_loc.transitions if trans.guard(global_cycle)]
+            if len(enabled) > 1:
+                return self.sim.chooser.choose_trans(self, enabled, global_cycle)
+            return enabled[0] if enabled else None
+        for trans in self.current_loc.transitions:
+            if trans.guard(global_cycle):
+                return trans
+        return None
+
+    def get_trans_delay(self, global_cycle):
+        '''
+        Get delay cycle of current transition.
+        If P3S has chooser and the transition has some candidate delays,
+        the chooser selects one of them.
+            [1] global_cycle : Current cycle
+        '''
+        trans = self.current_trans
+        if self.template:
+            trans.bind(self)
+        delay = None
+        if self.sim and self.sim.chooser:
+            delays = trans.get_delay_choices()
+            if delays:
+                delay = self.sim.chooser.choose_delay(self, trans, delays, global_cycle)
+        if delay == None:
+            delay = trans.get_delay()
+        if trans.accesses:
+            delay += trans.get_access_delay()
+        if self.sim and self.sim.delay_scale:
+            delay *= self.sim.delay_scale.get(type(trans).__name__, 1)
+            if self.sim.b_round_delay:
+                delay = round(delay)
+        if trans.resources:
+            delay = trans.reserve_resources(global_cycle, delay)
+        return delay
+
+    def location_changed(self, global_cycle):
+        '''
+        Notify that location of this Process is changed.
+            [1] global_cycle : Current cycle
+        '''
+        if self.sim:
+            self.sim.location_changed(self, global_cycle)
+        else:
+            print("@" + self.name + " C:{0} : change location to ".format(global_cycle) + self.current_loc.name)
+
     def restart(self, global_cycle, accuracy_cycle):
         '''
         Restart this Process.
@@ -57,31 +142,42 @@ class Process():
         # State transition loop
         while True:
             if self.current_trans == None:
-                for trans in self.current_loc.transitions:
-                    if trans.guard(global_cycle+(accuracy_cycle-runnable_cycle)):
-                        trans.sync()
-                        self.current_trans = trans
-                        self.trans_state = define_p3s.TransState.TRANS_BEFORE_GET_DELAY
-                        break
-                else: # There is no transition to be able
+                if self.b_select_inline:
+                    for trans in self.current_loc.transitions:
+                        if trans.guard(global_cycle+(accuracy_cycle-runnable_cycle)):
+                            break
+                    else:
+                        trans = None
+                else:
+                    trans = self.select_trans(global_cycle+(accuracy_cycle-runnable_cycle))
+                if trans == None: # There is no transition to be able
                     return runnable_cycle
+                trans.sync()
+                self.current_trans = trans
+                self.trans_state = define_p3s.TransState.TRANS_BEFORE_GET_DELAY
+                if self.sim and self.sim.observers:
+                    self.sim.trans_started(self, global_cycle+(accuracy_cycle-runnable_cycle))
             if self.trans_state == define_p3s.TransState.TRANS_BEFORE_GET_DELAY:
-                self.current_trans.rest_cycle = self.current_trans.get_delay()
+                self.rest_trans_cycle = self.get_trans_delay(global_cycle+(accuracy_cycle-runnable_cycle))
                 self.trans_state = define_p3s.TransState.TRANS_BEFORE_UPDATE
-                if self.current_trans.rest_cycle < 0:
+                if self.rest_trans_cycle < 0:
                     return -1
             if runnable_cycle >= 0:
-                if self.current_trans.rest_cycle > runnable_cycle:
-                    self.current_trans.rest_cycle -= runnable_cycle
+                if self.rest_trans_cycle > runnable_cycle:
+                    self.rest_trans_cycle -= runnable_cycle
                     return 0
                 else:
-                    runnable_cycle -= self.current_trans.rest_cycle
-                    self.current_trans.rest_cycle = 0
+                    runnable_cycle -= self.rest_trans_cycle
+                    self.rest_trans_cycle = 0
             if self.trans_state == define_p3s.TransState.TRANS_BEFORE_UPDATE:
+                if self.template:
+                    self.current_trans.bind(self)
                 self.current_trans.update(global_cycle+(accuracy_cycle-runnable_cycle))
                 self.trans_state = define_p3s.TransState.TRANS_AFTER_UPDATE
+                if self.sim and self.sim.observers:
+                    self.sim.trans_updated(self, global_cycle+(accuracy_cycle-runnable_cycle))
             self.current_loc = self.current_trans.to_location
-            print("@" + self.name + " C:{0} : change location to ".format(global_cycle+(accuracy_cycle-runnable_cycle)) + self.current_loc.name)
+            self.location_changed(global_cycle+(accuracy_cycle-runnable_cycle))
             self.current_trans = None
             self.trans_state = None
             if self.current_loc.b_end:
@@ -109,8 +205,56 @@ class Location():
         self.transitions.append(trans)
 
 
+class ProcessTemplate():
+
+    def __init__(self, name):
+        '''
+        Constructor of ProcessTemplate class.
+        Location/Trans graph of a template is shared by all of its
+        instances (flyweight), and each instance has only its own state.
+            [1] name : Name of ProcessTemplate class object
+        '''
+        self.name = name
+        self.locations = []
+        self.init_loc = None
+
+    def add_location(self, loc, b_init):
+        '''
+        Add new location to this template.
+            [1] loc    : Location class object
+            [2] b_init : Whether this location is initial location
+        '''
+        self.locations.append(loc)
+        if b_init:
+            self.init_loc = loc
+
+    def instantiate(self, proc, links=None):
+        '''
+        Make Process an instance of this template.
+        Return value is the Process class object
+            [1] proc  : Process class object (ex: Task, ISR) without locations
+            [2] links : dict of key string : object linked to the Process
+        '''
+        proc.template = self
+        proc.locations = self.locations
+        proc.current_loc = self.init_loc
+        if isinstance(proc, ISR):
+            proc.init_loc = self.init_loc
+        if links:
+            for key, obj in links.items():
+                proc.link(key, obj)
+        return proc
+
+
 class Trans():
 
+    # Whether get_delay() returns the same value during simulation
+    # (delay is inlined by code generation if True)
+    b_const_delay = False
+    # Whether guard() depends on global_cycle (can become True without any
+    # event of other processes; see get_next_cycle() and P3S.is_quiescent())
+    b_time_guard = False
+
     def __init__(self, proc, channel, b_send, to_location, sig_task):
         '''
         Constructor of Trans class.
@@ -119,13 +263,21 @@ class Trans():
             [3] b_send : Whether this is send (not recv) part if channel exists
             [4] to_location : Destination Location class object of this tansition
             [5] sig_task: signal destination task
+        For Trans class object of ProcessTemplate, proc is None and
+        channel/sig_task can be key string of Process.link().
         '''
         self.proc = proc
         self.channel = channel
         self.b_send = b_send
         self.to_location = to_location
-        self.rest_cycle = 0
         self.sig_task = sig_task
+        self.resources = []
+        self.accesses = []
+        self.fifo = None # FIFO of channel for proc (cached by get_fifo())
+        self.link_keys = {}
+        for attr, value in (("channel", channel), ("sig_task", sig_task)):
+            if isinstance(value, str):
+                self.link_keys[attr] = value
 
     def guard(self, global_cycle):
         '''
@@ -136,11 +288,41 @@ class Trans():
             [1] global_cycle : Current cycle
         '''
         if self.channel:
-            if not self.b_send:
-                if not self.channel.b_sent or self.channel.sent_cycle > global_cycle:
+            if self.b_send:
+                if self.channel.is_full():
+                    return False
+            else:
+                fifo = self.fifo
+                if fifo == None:
+                    fifo = self.get_fifo()
+                if not fifo or fifo[0][1] > global_cycle:
                     return False
         return True
 
+    def get_fifo(self):
+        '''
+        Get FIFO of channel for Process of this transition.
+        It is cached until receivers of the channel are added or this
+        transition is bound to another Process.
+        '''
+        self.fifo = self.channel.get_fifo(self.proc)
+        self.channel.cached.add(self)
+        return self.fifo
+
+    def get_next_cycle(self, global_cycle):
+        '''
+        Get cycle at which guard of this transition can become True
+        without any event of other processes (ex: guard depends on cycle).
+        Return None if guard can be changed only by events (ex: channel,
+        variables updated by other processes).
+        The next cycle is returned if b_time_guard is True. Override this
+        method to return the exact cycle (ex: arrival cycle of trace).
+            [1] global_cycle : Current cycle
+        '''
+        if self.b_time_guard:
+            return global_cycle + 1
+        return None
+
     def sync(self):
         '''
         Synchronous communication of this transition.
@@ -164,9 +346,75 @@ class Trans():
         '''
         return 0
 
+    def get_delay_choices(self):
+        '''
+        Get candidate delay cycles of this transition (ex: [min, max]).
+        This is used when all of nondeterministic delays are explored.
+        Return None if delay is deterministic (get_delay() is used).
+        '''
+        return None
+
     def add_sig_task(self, sig_task):
         self.sig_task = sig_task
 
+    def bind(self, proc):
+        '''
+        Bind this (shared) transition to Process before its callbacks.
+            [1] proc : Process class object
+        '''
+        if proc is not self.proc:
+            self.fifo = None
+        self.proc = proc
+        for attr, key in self.link_keys.items():
+            setattr(self, attr, proc.links[key])
+
+    def get_link(self, attr, proc):
+        '''
+        Get channel or sig_task of this transition for Process.
+            [1] attr : "channel" or "sig_task"
+            [2] proc : Process class object
+        '''
+        if attr in self.link_keys:
+            return proc.links[self.link_keys[attr]]
+        return getattr(self, attr)
+
+    def add_resource(self, resource, size):
+        '''
+        Add shared resource accessed by this transition.
+            [1] resource : Resource class object
+            [2] size     : access size (bytes) per transition
+        '''
+        self.resources.append((resource, size))
+
+    def add_access(self, memory, access):
+        '''
+        Add memory access of this transition (delay by memory hierarchy is added).
+            [1] memory : MemoryModel class object (see memory.py, shared by tasks of a CPU)
+            [2] access : memory.Access class object, or function which returns it
+                         (evaluated for each transition, ex: size given by parameter)
+        '''
+        self.accesses.append((memory, access))
+
+    def get_access_delay(self):
+        '''
+        Get delay cycle of memory accesses of this transition.
+        '''
+        delay = 0
+        for memory, access in self.accesses:
+            delay += memory.access(access() if callable(access) else access)
+        return delay
+
+    def reserve_resources(self, global_cycle, delay):
+        '''
+        Reserve shared resources of this transition.
+        Return value is delay cycle stretched by contention.
+            [1] global_cycle : current cycle
+            [2] delay        : delay cycle without contention
+        '''
+        for resource, size in self.resources:
+            delay = resource.reserve(self.proc, global_cycle, delay, size)
+        return delay
+
 
 class Task(Process):
 
@@ -179,7 +427,7 @@ class Task(Process):
         super().__init__(name)
         self.priority = priority
         self.task_state = define_p3s.TaskState.READY
-        self.signal = Signal()
+        self.signal = Signal(self)
         self.wait_sig_id = None
         self.cpu = None
 
@@ -196,33 +444,44 @@ class Task(Process):
         # State transition loop
         while True:
             if self.current_trans == None:
-                for trans in self.current_loc.transitions:
-                    if trans.guard(global_cycle+(accuracy_cycle-runnable_cycle)):
-                        trans.sync()
-                        self.current_trans = trans
-                        self.trans_state = define_p3s.TransState.TRANS_BEFORE_GET_DELAY
-                        break
-                else: # There is no transition to be able
+                if self.b_select_inline:
+                    for trans in self.current_loc.transitions:
+                        if trans.guard(global_cycle+(accuracy_cycle-runnable_cycle)):
+                            break
+                    else:
+                        trans = None
+                else:
+                    trans = self.select_trans(global_cycle+(accuracy_cycle-runnable_cycle))
+                if trans == None: # There is no transition to be able
                     return runnable_cycle
+                trans.sync()
+                self.current_trans = trans
+                self.trans_state = define_p3s.TransState.TRANS_BEFORE_GET_DELAY
+                if self.sim and self.sim.observers:
+                    self.sim.trans_started(self, global_cycle+(accuracy_cycle-runnable_cycle))
             if self.trans_state == define_p3s.TransState.TRANS_BEFORE_GET_DELAY:
-                self.current_trans.rest_cycle = self.current_trans.get_delay()
+                self.rest_trans_cycle = self.get_trans_delay(global_cycle+(accuracy_cycle-runnable_cycle))
                 self.trans_state = define_p3s.TransState.TRANS_BEFORE_UPDATE
-                if self.current_trans.rest_cycle < 0:
+                if self.rest_trans_cycle < 0:
                     return -1
             if runnable_cycle >= 0:
-                if self.current_trans.rest_cycle > runnable_cycle:
-                    self.current_trans.rest_cycle -= runnable_cycle
+                if self.rest_trans_cycle > runnable_cycle:
+                    self.rest_trans_cycle -= runnable_cycle
                     return 0
                 else:
-                    runnable_cycle -= self.current_trans.rest_cycle
-                    self.current_trans.rest_cycle = 0
+                    runnable_cycle -= self.rest_trans_cycle
+                    self.rest_trans_cycle = 0
             if self.trans_state == define_p3s.TransState.TRANS_BEFORE_UPDATE:
+                if self.template:
+                    self.current_trans.bind(self)
                 b_event = self.current_trans.update(global_cycle+(accuracy_cycle-runnable_cycle))
                 self.trans_state = define_p3s.TransState.TRANS_AFTER_UPDATE
+                if self.sim and self.sim.observers:
+                    self.sim.trans_updated(self, global_cycle+(accuracy_cycle-runnable_cycle))
                 if b_event:
                     return runnable_cycle
             self.current_loc = self.current_trans.to_location
-            print("@" + self.name + " C:{0} : change location to ".format(global_cycle+(accuracy_cycle-runnable_cycle)) + self.current_loc.name)
+            self.location_changed(global_cycle+(accuracy_cycle-runnable_cycle))
             self.current_trans = None
             self.trans_state = None
             if self.current_loc.b_end:
@@ -232,15 +491,26 @@ class Task(Process):
 
 class ISR(Task):
 
-    def __init__(self, name, priority):
+    def __init__(self, name, priority, entry_cycle=0, exit_cycle=0):
         '''
         Constructor of ISR class.
             [1] name : name of Task class object
             [2] priority : task priority
+            [3] entry_cycle : exception entry cost (cycle)
+            [4] exit_cycle  : exception exit cost (cycle)
         '''
         super().__init__(name, priority)
         self.task_state = define_p3s.TaskState.WAITING
         self.init_loc = None
+        self.entry_cycle = entry_cycle
+        self.exit_cycle = exit_cycle
+        self.b_masked = False
+        self.b_entering = False
+        self.rest_entry_cycle = 0
+        self.pending_cycle = None
+        self.start_cycle = 0
+        self.latency_hist = stats.Histogram("latency", 1)
+        self.exec_hist = stats.Histogram("execution", 1)
 
     def interrupt(self, current_cycle):
         '''
@@ -249,6 +519,8 @@ class ISR(Task):
         if not self.current_loc == self.init_loc:
             return False
         for trans in self.init_loc.transitions:
+            if self.template:
+                trans.bind(self)
             if trans.guard(current_cycle):
                 return True
         else:
@@ -275,6 +547,7 @@ class Model():
         self.name = name
         self.clock = clock
         self.cycle = 0
+        self.sim = None
 
     def run(self, runnable_cycle):
         '''
@@ -316,11 +589,12 @@ class HW_Model(Model):
 
 class CPU_Model(Model):
 
-    def __init__(self, name, clock):
+    def __init__(self, name, clock, tail_chain_cycle=None):
         '''
         Constructor of CPU_Model class.
             [1] name  : Name of CPU_Model class object
             [2] clock : clock (MHz) of this model
+            [3] tail_chain_cycle : entry cost of tail-chained ISR (None: no tail-chaining)
         '''
         super().__init__(name, clock)
         self.tasks = []
@@ -329,6 +603,9 @@ class CPU_Model(Model):
         self.isrs = []
         self.current_isr = None
         self.rest_isr_cycle = 0
+        self.tail_chain_cycle = tail_chain_cycle
+        self.tail_chain = None # (ISR to be tail-chained, exit cycle of returned ISR)
+        self.mask_priority = None # ISRs of this priority or lower are masked
 
     def run(self, runnable_cycle):
         '''
@@ -338,6 +615,7 @@ class CPU_Model(Model):
         rest_cycle = runnable_cycle
         running_cycle = 0
         # ISRs (Interrupt Service Routines)
+        self.poll_isrs(self.cycle)
         if self.current_isr == None and self.rest_isr_cycle > 0:
             if rest_cycle > self.rest_isr_cycle:
                 running_cycle += self.rest_isr_cycle
@@ -349,31 +627,62 @@ class CPU_Model(Model):
                 return False
         for isr in self.isrs:
             if isr.task_state == define_p3s.TaskState.RUNNING:
-                rest_cycle = self.current_isr.restart((self.cycle + running_cycle), rest_cycle)
+                pass
             elif isr.task_state == define_p3s.TaskState.READY:
                 self.current_isr = isr
                 self.current_isr.task_state = define_p3s.TaskState.RUNNING
-                rest_cycle = self.current_isr.restart((self.cycle + running_cycle), rest_cycle)
             elif isr.task_state == define_p3s.TaskState.WAITING:
+                if isr.b_masked or (self.mask_priority != None and isr.priority <= self.mask_priority):
+                    # Masked (is_masked() is inlined)
+                    continue
+                if self.current_isr and self.current_isr.priority >= isr.priority:
+                    continue
                 if isr.interrupt(self.cycle + running_cycle):
                     # Interrupted!
                     if not self.current_isr == None:
                         self.current_isr.task_state = define_p3s.TaskState.READY
+                        if self.sim and self.sim.observers:
+                            self.sim.preempted(self.current_isr, isr, self.cycle + running_cycle)
                     if not self.current_task == None:
                         self.current_task.task_state = define_p3s.TaskState.READY
+                        if self.sim and self.sim.observers:
+                            self.sim.preempted(self.current_task, isr, self.cycle + running_cycle)
                         self.current_task = None
                     self.current_isr = isr
                     self.current_isr.task_state = define_p3s.TaskState.RUNNING
-                    rest_cycle = self.current_isr.restart((self.cycle + running_cycle), rest_cycle)
+                    if isr.pending_cycle == None:
+                        isr.pending_cycle = self.cycle + running_cycle
+                    # Interrupts pending at the same time wait for this ISR
+                    self.poll_isrs(self.cycle + running_cycle)
+                    if self.tail_chain != None and self.tail_chain[0] is isr:
+                        isr.rest_entry_cycle = self.tail_chain_cycle
+                    elif self.tail_chain != None:
+                        # Another ISR is entered: returned ISR exits first
+                        isr.rest_entry_cycle = self.tail_chain[1] + isr.entry_cycle
+                    else:
+                        isr.rest_entry_cycle = isr.entry_cycle
+                    self.tail_chain = None
+                    isr.b_entering = True
                 else:
                     continue
             else:
                 continue
+            # Exception entry
+            if self.current_isr.b_entering:
+                if rest_cycle >= self.current_isr.rest_entry_cycle:
+                    rest_cycle -= self.current_isr.rest_entry_cycle
+                    self.current_isr.rest_entry_cycle = 0
+                    self.current_isr.b_entering = False
+                    self.current_isr.start_cycle = self.cycle + (runnable_cycle - rest_cycle)
+                    self.current_isr.latency_hist.add(self.current_isr.start_cycle - self.current_isr.pending_cycle)
+                else:
+                    self.current_isr.rest_entry_cycle -= rest_cycle
+                    self.cycle += runnable_cycle
+                    return False
+            rest_cycle = self.current_isr.restart((self.cycle + running_cycle), rest_cycle)
             # After restart()
             if self.current_isr and self.current_isr.b_finished:
-                self.current_isr.current_loc = self.current_isr.init_loc
-                self.current_isr.task_state = define_p3s.TaskState.WAITING
-                self.current_isr = None
+                self.finish_isr(self.current_isr, self.cycle + (runnable_cycle - rest_cycle))
             if rest_cycle == 0:
                 self.cycle += runnable_cycle
                 return False
@@ -385,6 +694,18 @@ class CPU_Model(Model):
                     self.rest_isr_cycle -= rest_cycle
                     self.cycle += runnable_cycle
                     return False
+        if self.tail_chain != None:
+            # Pending ISR is not entered right after return (exit cost is paid)
+            self.rest_isr_cycle += self.tail_chain[1]
+            self.tail_chain = None
+            if rest_cycle > self.rest_isr_cycle:
+                rest_cycle -= self.rest_isr_cycle
+                running_cycle = runnable_cycle - rest_cycle
+                self.rest_isr_cycle = 0
+            else:
+                self.rest_isr_cycle -= rest_cycle
+                self.cycle += runnable_cycle
+                return False
         # Tasks
         while True:
             if self.current_task == None:
@@ -407,6 +728,7 @@ class CPU_Model(Model):
                     self.cycle += runnable_cycle
                     return False
             # task restart
+            prev_rest_cycle = rest_cycle
             rest_cycle = self.current_task.restart((self.cycle + running_cycle), rest_cycle)
             if self.current_task and self.current_task.b_finished:
                 self.cycle += (runnable_cycle - rest_cycle)
@@ -435,11 +757,72 @@ class CPU_Model(Model):
                 else: # All tasks are WAITING
                     self.cycle += runnable_cycle
                     return False
+                if self.current_task and self.current_task.current_trans == None and rest_cycle == prev_rest_cycle:
+                    # Running task has no transition to be able (busy wait)
+                    self.cycle += runnable_cycle
+                    return False
             if rest_cycle == 0:
                 self.cycle += runnable_cycle
                 return False
             running_cycle = runnable_cycle - rest_cycle
 
+    def is_masked(self, isr):
+        '''
+        Whether ISR is masked.
+            [1] isr : ISR class object
+        '''
+        if isr.b_masked:
+            return True
+        return self.mask_priority != None and isr.priority <= self.mask_priority
+
+    def poll_isrs(self, current_cycle):
+        '''
+        Record the cycle when each interrupt becomes pending while it
+        cannot be entered (masked or blocked by another ISR).
+        Otherwise ISRs are checked only by dispatch in run().
+            [1] current_cycle : current cycle
+        '''
+        b_busy = self.current_isr != None
+        mask_priority = self.mask_priority
+        for isr in self.isrs:
+            if b_busy or isr.b_masked or (mask_priority != None and isr.priority <= mask_priority):
+                if isr.pending_cycle == None and isr.task_state == define_p3s.TaskState.WAITING and isr.interrupt(current_cycle):
+                    isr.pending_cycle = current_cycle
+
+    def finish_isr(self, isr, current_cycle):
+        '''
+        Return from ISR.
+        Tail-chaining to the pending ISR if this CPU supports it (exit cost
+        is added later if the ISR is not entered right after return),
+        otherwise exception exit cost is added.
+            [1] isr : ISR class object
+            [2] current_cycle : current cycle
+        '''
+        isr.exec_hist.add(current_cycle - isr.start_cycle)
+        isr.current_loc = isr.init_loc
+        isr.task_state = define_p3s.TaskState.WAITING
+        isr.b_finished = False
+        isr.pending_cycle = None
+        self.current_isr = None
+        if self.tail_chain_cycle != None:
+            for next_isr in self.isrs:
+                if next_isr.task_state == define_p3s.TaskState.READY:
+                    break
+                if next_isr.task_state == define_p3s.TaskState.WAITING and not self.is_masked(next_isr) and next_isr.interrupt(current_cycle):
+                    self.tail_chain = (next_isr, isr.exit_cycle)
+                    return
+        self.rest_isr_cycle += isr.exit_cycle
+
+    def report(self, b_bins=False):
+        '''
+        Print interrupt latency and ISR execution time of each ISR.
+            [1] b_bins : Whether all bins of histograms are printed
+        '''
+        for isr in self.isrs:
+            print("[%s] interrupts: %d" % (isr.name, isr.exec_hist.count))
+            isr.latency_hist.report("  ", b_bins)
+            isr.exec_hist.report("  ", b_bins)
+
     def add_task(self, task):
         '''
         Add new task to this CPU.
@@ -477,43 +860,144 @@ class CPU_Model(Model):
 
 class Channel():
 
-    def __init__(self, name):
+    def __init__(self, name, depth=1, bandwidth=0, latency=0):
         '''
         Constructor of Channel class.
-            [1] name : Name of Channel class object
+            [1] name      : Name of Channel class object
+            [2] depth     : Number of data which can be buffered (FIFO depth)
+            [3] bandwidth : Link bandwidth (bytes per cycle, 0 is infinite)
+            [4] latency   : Link latency (cycle)
         '''
         self.name = name
-        self.b_sent = False
-        self.sent_cycle = 0
-        self.data = 0
+        self.depth = depth
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self.link_free_cycle = 0
+        self.receivers = []
+        # FIFO of (data, arrival cycle) for each receiver
+        # (key None is used when no receiver is added, i.e. unicast)
+        self.fifos = {None: deque()}
+        self.cached = set() # Trans class objects which cache FIFO
+
+    def add_receiver(self, proc):
+        '''
+        Add receiver of this channel.
+        If receivers are added, sent data is broadcasted to all of them.
+            [1] proc : Process class object to receive data
+        '''
+        if len(self.receivers) == 0:
+            self.fifos = {}
+        self.receivers.append(proc)
+        self.fifos[proc] = deque()
+        for trans in self.cached:
+            trans.fifo = None
+        self.cached.clear()
+
+    def get_fifo(self, receiver=None):
+        '''
+        Get FIFO for receiver.
+        (receiver can be omitted if this channel has only one FIFO)
+            [1] receiver : Process class object to receive data
+        '''
+        if receiver in self.fifos:
+            return self.fifos[receiver]
+        if len(self.fifos) == 1:
+            return next(iter(self.fifos.values()))
+        raise ValueError("%s is not a receiver of channel %s" % (getattr(receiver, "name", receiver), self.name))
+
+    def is_full(self):
+        '''
+        Whether this channel cannot accept data any more.
+        (sender should wait for receiver: backpressure)
+        '''
+        for fifo in self.fifos.values():
+            if len(fifo) >= self.depth:
+                return True
+        return False
+
+    def is_arrived(self, global_cycle, receiver=None):
+        '''
+        Whether data has arrived at receiver.
+            [1] global_cycle : current cycle
+            [2] receiver     : Process class object to receive data
+        '''
+        fifo = self.get_fifo(receiver)
+        return len(fifo) > 0 and fifo[0][1] <= global_cycle
+
+    def get_serialize_delay(self, size):
+        '''
+        Get cycle for which data occupies the link.
+            [1] size : data size (bytes)
+        '''
+        if self.bandwidth > 0:
+            return -(-size // self.bandwidth)
+        return 0
+
+    def get_transfer_delay(self, size):
+        '''
+        Get transfer delay cycle of data by bandwidth/latency model.
+            [1] size : data size (bytes)
+        '''
+        return self.get_serialize_delay(size) + self.latency
 
-    def send(self, data, global_cycle, delay):
+    def send(self, data, global_cycle, delay=None, size=0):
         '''
         Send data to this channel.
+        Return value:
+          True  > Data is sent
+          False > Data is NOT sent (channel is full)
             [1] data : send data
             [2] global_cycle : current cycle
-            [3] delay : network delay
+            [3] delay : network delay (None: computed from size by link model)
+            [4] size : data size (bytes)
         '''
-        self.data = data
-        self.b_sent = True
-        self.sent_cycle = global_cycle + delay
+        if self.is_full():
+            return False
+        if delay == None:
+            # Data is serialized on the link
+            start_cycle = max(global_cycle, self.link_free_cycle)
+            self.link_free_cycle = start_cycle + self.get_serialize_delay(size)
+            arrival_cycle = self.link_free_cycle + self.latency
+        else:
+            arrival_cycle = global_cycle + delay
+        for fifo in self.fifos.values():
+            fifo.append((data, arrival_cycle))
+        return True
 
-    def recv(self):
+    def recv(self, receiver=None):
         '''
         Receive data from this channel.
-        Return value is received data.
+        Return value is received data (None if there is no data).
+            [1] receiver : Process class object to receive data
         '''
-        self.b_sent = False
-        self.current_cycle = 0
-        return self.data
+        fifo = self.get_fifo(receiver)
+        if len(fifo) == 0:
+            return None
+        return fifo.popleft()[0]
+
+    @property
+    def b_sent(self):
+        return len(self.get_fifo()) > 0
+
+    @property
+    def sent_cycle(self):
+        fifo = self.get_fifo()
+        return fifo[0][1] if fifo else 0
+
+    @property
+    def data(self):
+        fifo = self.get_fifo()
+        return fifo[0][0] if fifo else None
 
 
 class Signal():
 
-    def __init__(self):
+    def __init__(self, task=None):
         '''
         Constructor of Signal class.
+            [1] task : Task class object this Signal class object belongs
         '''
+        self.task = task
         self.wait_id = define_p3s.SIGNAL_ID_NO_WAIT
         self.tsk_pri = define_p3s.SIGNAL_INIT_PRI
 
@@ -530,6 +1014,8 @@ class Signal():
             dst_task.task_state = define_p3s.TaskState.READY
             self.wait_id = define_p3s.SIGNAL_ID_NO_WAIT
             self.tsk_pri = define_p3s.SIGNAL_INIT_PRI
+            if dst_task.sim and dst_task.sim.observers:
+                dst_task.sim.signal_set(self.task, dst_task, sig_id)
             return True
         else:
             return False
@@ -545,6 +1031,132 @@ class Signal():
         src_task.task_state = define_p3s.TaskState.WAITING
 
 
+class Resource():
+
+    def __init__(self, name, bandwidth, policy=define_p3s.ArbitrationPolicy.FIFO):
+        '''
+        Constructor of Resource class (shared bus or memory port).
+            [1] name      : Name of Resource class object
+            [2] bandwidth : bytes per cycle
+            [3] policy    : arbitration policy (define_p3s.ArbitrationPolicy)
+        '''
+        self.name = name
+        self.bandwidth = bandwidth
+        self.policy = policy
+        self.reservations = [] # [proc, priority, request cycle, start cycle, end cycle]
+        self.busy_cycle = 0
+        self.num_of_access = 0
+        self.wait_cycle = 0
+        self.max_wait_cycle = 0
+
+    def reserve(self, proc, global_cycle, delay, size):
+        '''
+        Reserve this resource.
+        Return value is delay cycle of the transition:
+          (queueing delay) + max(delay, occupancy cycle of this resource)
+            [1] proc         : Process class object to access this resource
+            [2] global_cycle : current cycle
+            [3] delay        : delay cycle without contention
+            [4] size         : access size (bytes)
+        '''
+        occupancy = -(-size // self.bandwidth)
+        priority = getattr(proc, "priority", 0)
+        self.reservations = [r for r in self.reservations if r[4] > global_cycle]
+        # Find insertion point by arbitration policy
+        index = len(self.reservations)
+        if self.policy == define_p3s.ArbitrationPolicy.PRIORITY:
+            for x in range(0, len(self.reservations)):
+                if self.reservations[x][3] > global_cycle and priority > self.reservations[x][1]:
+                    index = x
+                    break
+        if index > 0:
+            start_cycle = max(global_cycle, self.reservations[index-1][4])
+        else:
+            start_cycle = global_cycle
+        # Lower priority reservations (not started yet) are pushed back
+        # (each one after the end of the previous one)
+        prev_end = start_cycle + occupancy
+        for r in self.reservations[index:]:
+            shift = max(0, prev_end - r[3])
+            prev_end = r[4] + shift
+            r[3] += shift
+            r[4] += shift
+            r[0].rest_trans_cycle += shift
+            self.wait_cycle += shift
+            self.max_wait_cycle = max(self.max_wait_cycle, r[3] - r[2])
+        self.reservations.insert(index, [proc, priority, global_cycle, start_cycle, start_cycle + occupancy])
+        wait = start_cycle - global_cycle
+        self.busy_cycle += occupancy
+        self.num_of_access += 1
+        self.wait_cycle += wait
+        self.max_wait_cycle = max(self.max_wait_cycle, wait)
+        return wait + max(delay, occupancy)
+
+    def report(self, total_cycle):
+        '''
+        Print occupancy and queueing delay of this resource.
+            [1] total_cycle : simulated cycle
+        '''
+        occupancy = (100.0 * self.busy_cycle / total_cycle) if total_cycle > 0 else 0.0
+        mean_wait = (self.wait_cycle / self.num_of_access) if self.num_of_access > 0 else 0.0
+        print("[%s] occupancy: %.1f%%, access: %d, queueing delay: total %d / mean %.2f / max %d" % (self.name, occupancy, self.num_of_access, self.wait_cycle, mean_wait, self.max_wait_cycle))
+
+
+class Observer():
+    '''
+    Base class of simulation event observer (see P3S.add_observer()).
+    '''
+
+    def location_changed(self, proc, global_cycle):
+        '''
+        Location of Process is changed.
+        (proc.current_trans is the transition which has just finished)
+        '''
+        pass
+
+    def trans_started(self, proc, global_cycle):
+        '''
+        Transition proc.current_trans is selected (after sync()).
+        '''
+        pass
+
+    def trans_updated(self, proc, global_cycle):
+        '''
+        Update action of proc.current_trans is executed.
+        '''
+        pass
+
+    def signal_set(self, src_task, dst_task, sig_id):
+        '''
+        Signal from src_task wakes up dst_task.
+        '''
+        pass
+
+    def preempted(self, task, isr, global_cycle):
+        '''
+        Task (or ISR) is preempted by ISR.
+        '''
+        pass
+
+
+class DeadlockError(Exception):
+
+    def __init__(self, kind, cycle, graph):
+        '''
+        Constructor of DeadlockError class.
+            [1] kind  : "deadlock" (no future event) or "livelock" (no progress)
+            [2] cycle : cycle of detection
+            [3] graph : wait-for graph (list of (process, state, wait reason, list of process names))
+        '''
+        self.kind = kind
+        self.cycle = cycle
+        self.graph = graph
+        lines = ["%s detected at cycle %s" % (kind.capitalize(), cycle), "Wait-for graph:"]
+        for name, state, reason, dsts in graph:
+            lines.append("  %s [%s] --%s--> %s" % (name, state, reason, ", ".join(dsts) if dsts else "?"))
+        super().__init__("\n".join(lines))
+
+
 class P3S():
 
     def __init__(self, accuracy_cycle):
@@ -556,7 +1168,24 @@ class P3S():
         self.hw = []
         self.memory = []
         self.channel = []
+        self.resources = []
         self.accuracy_cycle = accuracy_cycle
+        self.cycle = 0
+        self.finish_cycle = None
+        self.b_verbose = True
+        self.chooser = None
+        self.observers = []
+        self.delay_scale = {} # Trans class name : scale factor of delay
+        self.b_round_delay = False # Whether delays scaled by delay_scale are rounded to integer cycles
+        self.b_deadlock_check = True # Whether DeadlockError is raised when no event can occur
+        self.b_skip_idle = False # Whether simulate() skips steps in which no event can occur (see skip())
+        self.stall_cycle = None # DeadlockError is raised after this cycle without progress (None: no check)
+        self.progress = None # Trans class name of progress point (None: any location change)
+        self.num_of_change = 0
+        self.checked_change = 0
+        self.num_of_idle_step = 0 # Steps without location change
+        self.progress_cycle = 0
+        self.channels = [] # All Channel class objects (set by start())
 
     def add_cpu(self, cpu):
         '''
@@ -572,24 +1201,438 @@ class P3S():
         '''
         self.hw.append(hw)
 
-    def simulate(self):
+    def add_resource(self, resource):
         '''
-        Start this Simulation.
+        Add shared resource (bus, memory port) to this Simulation.
+            [1] resource : Resource class object to be added
+        '''
+        self.resources.append(resource)
+
+    def report(self, total_cycle, b_bins=False):
+        '''
+        Print statistics of this Simulation.
+            [1] total_cycle : simulated cycle
+            [2] b_bins : Whether all bins of histograms are printed
+        '''
+        if self.cpu:
+            self.cpu.report(b_bins)
+        for resource in self.resources:
+            resource.report(total_cycle)
+
+    def add_observer(self, observer):
+        '''
+        Add observer of simulation events.
+            [1] observer : Observer class object
+        '''
+        self.observers.append(observer)
+
+    def get_processes(self):
+        '''
+        Get all Process class objects of this Simulation.
+        '''
+        procs = []
+        if self.cpu:
+            procs += self.cpu.isrs + self.cpu.tasks
+        for hw in self.hw:
+            procs.append(hw.core)
+        return procs
+
+    def location_changed(self, proc, global_cycle):
+        '''
+        Notify that location of Process is changed.
+            [1] proc : Process class object
+            [2] global_cycle : Current cycle
+        '''
+        if self.b_verbose:
+            print("@" + proc.name + " C:{0} : change location to ".format(global_cycle) + proc.current_loc.name)
+        self.num_of_change += 1
+        if self.progress == None or type(proc.current_trans).__name__ == self.progress:
+            self.progress_cycle = global_cycle
+        for observer in self.observers:
+            observer.location_changed(proc, global_cycle)
+
+    def trans_started(self, proc, global_cycle):
+        for observer in self.observers:
+            observer.trans_started(proc, global_cycle)
+
+    def trans_updated(self, proc, global_cycle):
+        for observer in self.observers:
+            observer.trans_updated(proc, global_cycle)
+
+    def signal_set(self, src_task, dst_task, sig_id):
+        for observer in self.observers:
+            observer.signal_set(src_task, dst_task, sig_id)
+
+    def preempted(self, task, isr, global_cycle):
+        for observer in self.observers:
+            observer.preempted(task, isr, global_cycle)
+
+    def finish(self, finish_cycle):
+        '''
+        Finish this Simulation.
+            [1] finish_cycle : Finished cycle
+        '''
+        self.finish_cycle = finish_cycle
+        if self.b_verbose:
+            print("Finished cycle: %d" % finish_cycle)
+            self.report(finish_cycle)
+        return finish_cycle
+
+    def start(self):
+        '''
+        Prepare this Simulation to be run by step().
+        Return False if there is no model.
         '''
         if len(self.hw) == 0 and self.cpu == None:
             return False
-        while True:
-            # run HW models
-            for hw in self.hw:
-                ret = hw.run(self.accuracy_cycle)
-                if ret:
-                    # Simulation finished
-                    print("Finished cycle: %d" % hw.cycle)
-                    return
-            # run CPU model
+        for proc in self.get_processes():
+            proc.sim = self
+            # No chooser nor shared transitions: first enabled transition is taken
+            proc.b_select_inline = (self.chooser == None and proc.template == None and
+                                    "select_trans" not in vars(proc) and type(proc).select_trans is Process.select_trans)
+        for model in ([self.cpu] if self.cpu else []) + self.hw:
+            model.sim = self
+        self.channels = self.get_channels()
+        return True
+
+    def step(self):
+        '''
+        Run all models for accuracy cycle.
+        Return value is True if Simulation finished (self.finish_cycle is set)
+        '''
+        # run HW models
+        for hw in self.hw:
+            ret = hw.run(self.accuracy_cycle)
+            if ret:
+                # Simulation finished
+                self.finish(hw.cycle)
+                return True
+        # run CPU model
+        if self.cpu:
             ret = self.cpu.run(self.accuracy_cycle)
             if ret:
                 # Simulation finished
-                print("Finished cycle: %d" % self.cpu.cycle)
-                return
+                self.finish(self.cpu.cycle)
+                return True
+        self.cycle += self.accuracy_cycle
+        if self.num_of_change != self.checked_change:
+            # Location is changed (not deadlock)
+            self.checked_change = self.num_of_change
+            self.num_of_idle_step = 0
+        else:
+            # Checked after 1, 2, 4, 8, ... steps without location change
+            self.num_of_idle_step += 1
+            if self.num_of_idle_step & (self.num_of_idle_step - 1) == 0:
+                self.check_deadlock()
+        if self.stall_cycle != None and self.cycle - self.progress_cycle >= self.stall_cycle:
+            raise DeadlockError("livelock", self.cycle, self.get_wait_for_graph())
+        return False
+
+    def check_deadlock(self):
+        '''
+        Check deadlock (no event can occur) after steps without location change.
+        Raise DeadlockError if detected.
+        (Quiescence is not checked before 8 steps while CPU is running or
+         switching a task or ISR, and it is checked after 1, 2, 4, 8, ...
+         steps, so deadlock is detected within twice the idle time)
+        '''
+        if not self.b_deadlock_check:
+            return
+        cpu = self.cpu
+        if self.num_of_idle_step < 8 and cpu and (cpu.current_task != None or cpu.current_isr != None or
+                                                  cpu.rest_task_cycle > 0 or cpu.rest_isr_cycle > 0):
+            return
+        if self.is_quiescent():
+            raise DeadlockError("deadlock", self.cycle, self.get_wait_for_graph())
+
+    def get_transitions(self, proc):
+        '''
+        Get all Trans class objects reachable in Process.
+            [1] proc : Process class object
+        '''
+        locs = list(proc.locations)
+        transitions = []
+        for loc in locs:
+            for trans in loc.transitions:
+                transitions.append(trans)
+                if trans.to_location not in locs:
+                    locs.append(trans.to_location)
+        return transitions
+
+    def get_channels(self):
+        '''
+        Get all Channel class objects used by transitions.
+        '''
+        channels = list(self.channel)
+        for proc in self.get_processes():
+            for trans in self.get_transitions(proc):
+                channel = trans.get_link("channel", proc)
+                if channel and channel not in channels:
+                    channels.append(channel)
+        return channels
+
+    def is_enabled(self, proc, global_cycle):
+        '''
+        Whether Process has a transition to be able at current location.
+            [1] proc : Process class object
+            [2] global_cycle : Current cycle
+        '''
+        for trans in proc.current_loc.transitions:
+            if proc.template:
+                trans.bind(proc)
+            if trans.guard(global_cycle):
+                return True
+        return False
 
+    def get_next_cycle(self, proc, global_cycle):
+        '''
+        Get cycle at which a transition of Process at current location can
+        become able without any event of other processes (None: no such cycle).
+            [1] proc : Process class object
+            [2] global_cycle : Current cycle
+        '''
+        cycles = []
+        for trans in proc.current_loc.transitions:
+            if proc.template:
+                trans.bind(proc)
+            cycle = trans.get_next_cycle(global_cycle)
+            if cycle != None:
+                cycles.append(cycle)
+        return min(cycles) if cycles else None
+
+    def is_quiescent(self):
+        '''
+        Whether no event can occur any more.
+        (no transition is in progress, able or able in future by time
+         (Trans.get_next_cycle), no task is READY, no ISR is pending,
+         and no data is in flight on channels)
+        '''
+        for hw in self.hw:
+            if hw.core.current_trans != None:
+                return False
+        for channel in self.channels:
+            for fifo in channel.fifos.values():
+                for data, arrival_cycle in fifo:
+                    if arrival_cycle > self.cycle:
+                        return False
+        if self.cpu:
+            cpu = self.cpu
+            if cpu.rest_task_cycle > 0 or cpu.rest_isr_cycle > 0 or cpu.current_isr != None:
+                return False
+            for task in cpu.tasks:
+                if task.task_state == define_p3s.TaskState.READY:
+                    return False
+                if task.task_state == define_p3s.TaskState.RUNNING and task.current_trans != None:
+                    return False
+            for isr in cpu.isrs:
+                if isr.task_state != define_p3s.TaskState.WAITING:
+                    return False
+                if not cpu.is_masked(isr) and isr.interrupt(self.cycle):
+                    return False
+                if isr.current_loc == isr.init_loc and self.get_next_cycle(isr, self.cycle) != None:
+                    return False
+            for task in cpu.tasks:
+                if task.task_state == define_p3s.TaskState.RUNNING:
+                    if self.is_enabled(task, self.cycle):
+                        return False
+                    if self.get_next_cycle(task, self.cycle) != None:
+                        return False
+        for hw in self.hw:
+            if self.is_enabled(hw.core, self.cycle):
+                return False
+            if self.get_next_cycle(hw.core, self.cycle) != None:
+                return False
+        return True
+
+    def get_rest_cycle(self, proc):
+        '''
+        Get cycle until Process can cause an event by itself.
+        Return value is 0 if it can in next step, None if it waits only
+        for events of other processes.
+            [1] proc : Process class object
+        '''
+        if proc.current_trans != None:
+            if proc.trans_state != define_p3s.TransState.TRANS_BEFORE_UPDATE:
+                return 0
+            return proc.rest_trans_cycle
+        if self.is_enabled(proc, self.cycle):
+            return 0
+        cycle = self.get_next_cycle(proc, self.cycle)
+        return None if cycle == None else cycle - self.cycle
+
+    def get_rest_cycles(self, max_cycle=None):
+        '''
+        Generator of cycles until an event can occur (0: in next step,
+        None: no limit), in order of cost to be checked.
+            [1] max_cycle : Max cycle to be simulated (None: no limit)
+        '''
+        WAITING = define_p3s.TaskState.WAITING
+        RUNNING = define_p3s.TaskState.RUNNING
+        READY = define_p3s.TaskState.READY
+        if max_cycle != None:
+            yield max_cycle - self.cycle
+        if self.stall_cycle != None:
+            yield self.progress_cycle + self.stall_cycle - self.cycle
+        cpu = self.cpu
+        if cpu:
+            isr = cpu.current_isr
+            task = cpu.current_task
+            if cpu.tail_chain != None:
+                yield 0
+            elif isr != None:
+                if isr.b_entering:
+                    yield isr.rest_entry_cycle
+                elif isr.current_trans != None:
+                    yield self.get_rest_cycle(isr)
+                else:
+                    yield 0
+            elif cpu.rest_isr_cycle > 0:
+                yield cpu.rest_isr_cycle
+            elif task != None:
+                if task.task_state != RUNNING or cpu.rest_task_cycle > 0:
+                    yield 0
+                # Running task must be the highest priority one
+                for t in cpu.tasks:
+                    if t.task_state == READY or t.task_state == RUNNING:
+                        break
+                yield self.get_rest_cycle(task) if t is task else 0
+            elif cpu.rest_task_cycle > 0:
+                yield cpu.rest_task_cycle
+            else:
+                for t in cpu.tasks:
+                    if t.task_state == READY or t.task_state == RUNNING:
+                        yield 0
+        for hw in self.hw:
+            yield self.get_rest_cycle(hw.core)
+        for channel in self.channels:
+            for fifo in channel.fifos.values():
+                for data, arrival_cycle in fifo:
+                    if arrival_cycle > self.cycle:
+                        yield arrival_cycle - self.cycle
+        if cpu:
+            for isr in cpu.isrs:
+                if isr.task_state == WAITING:
+                    if isr.interrupt(self.cycle):
+                        yield 0
+                    elif isr.current_loc == isr.init_loc:
+                        cycle = self.get_next_cycle(isr, self.cycle)
+                        yield None if cycle == None else cycle - self.cycle
+                elif isr is not cpu.current_isr or isr.task_state != RUNNING:
+                    # Preempted ISR is resumed
+                    yield 0
+
+    def skip(self, max_cycle=None):
+        '''
+        Skip steps in which no event can occur, i.e. every model only counts
+        down the delay of a transition, a task switch or an exception
+        entry/exit, or waits for guards which can be changed only by events
+        (or after Trans.get_next_cycle(), or by arrival of data on channels).
+        Location changes and all cycles of events are the same as step().
+        Return value is the number of skipped steps.
+            [1] max_cycle : Max cycle to be simulated (None: no limit)
+        '''
+        rest_cycle = None
+        for rest in self.get_rest_cycles(max_cycle):
+            if rest == None:
+                continue
+            if rest <= self.accuracy_cycle:
+                return 0
+            if rest_cycle == None or rest < rest_cycle:
+                rest_cycle = rest
+        if rest_cycle == None:
+            # Nothing can occur (deadlock is detected by step())
+            return 0
+        # Delays are still left after skipped steps
+        num_of_step = int(-(-rest_cycle // self.accuracy_cycle)) - 1
+        cycle = num_of_step * self.accuracy_cycle
+        for hw in self.hw:
+            hw.cycle += cycle
+            if hw.core.current_trans != None:
+                hw.core.rest_trans_cycle -= cycle
+        cpu = self.cpu
+        if cpu:
+            cpu.cycle += cycle
+            isr = cpu.current_isr
+            if isr != None:
+                if isr.b_entering:
+                    isr.rest_entry_cycle -= cycle
+                else:
+                    isr.rest_trans_cycle -= cycle
+            elif cpu.rest_isr_cycle > 0:
+                cpu.rest_isr_cycle -= cycle
+            elif cpu.current_task != None:
+                if cpu.current_task.current_trans != None:
+                    cpu.current_task.rest_trans_cycle -= cycle
+            elif cpu.rest_task_cycle > 0:
+                cpu.rest_task_cycle -= cycle
+        self.cycle += cycle
+        return num_of_step
+
+    def get_wait_for_graph(self):
+        '''
+        Get wait-for graph of processes.
+        Return value is list of (process name, state, wait reason, list of process names)
+        (processes which can set the signal, send to/receive from the channel, or hold the resource)
+        '''
+        senders = {}
+        receivers = {}
+        signalers = {}
+        procs = self.get_processes()
+        for proc in procs:
+            for trans in self.get_transitions(proc):
+                channel = trans.get_link("channel", proc)
+                if channel:
+                    names = (senders if trans.b_send else receivers).setdefault(channel, [])
+                    if proc.name not in names:
+                        names.append(proc.name)
+                sig_task = trans.get_link("sig_task", proc)
+                if sig_task:
+                    names = signalers.setdefault(sig_task, [])
+                    if proc.name not in names:
+                        names.append(proc.name)
+        graph = []
+        for proc in procs:
+            task_state = getattr(proc, "task_state", None)
+            state = "%s@%s" % (task_state.name if task_state else "HW", proc.current_loc.name if proc.current_loc else None)
+            if task_state == define_p3s.TaskState.INACTIVE:
+                continue
+            if task_state == define_p3s.TaskState.WAITING and not isinstance(proc, ISR):
+                sig_id = proc.signal.wait_id
+                graph.append((proc.name, state, "signal %s" % getattr(sig_id, "name", sig_id), signalers.get(proc, [])))
+                continue
+            if proc.current_trans != None:
+                graph.append((proc.name, state, "transition %s" % type(proc.current_trans).__name__, []))
+                continue
+            for trans in proc.current_loc.transitions:
+                channel = trans.get_link("channel", proc)
+                if channel and trans.b_send:
+                    full = " (full)" if channel.is_full() else ""
+                    graph.append((proc.name, state, "send %s%s" % (channel.name, full), receivers.get(channel, [])))
+                elif channel:
+                    graph.append((proc.name, state, "recv %s" % channel.name, senders.get(channel, [])))
+                else:
+                    graph.append((proc.name, state, "guard %s" % type(trans).__name__, []))
+        for resource in self.resources:
+            for r in resource.reservations:
+                if r[4] > self.cycle:
+                    graph.append((r[0].name, "resource", "hold %s until %s" % (resource.name, r[4]), []))
+        return graph
+
+    def simulate(self, max_cycle=None):
+        '''
+        Start this Simulation.
+        Return value is finished cycle (None if not finished until max_cycle)
+            [1] max_cycle : Max cycle to be simulated (None: no limit)
+        '''
+        if not self.start():
+            return False
+        while True:
+            if self.step():
+                return self.finish_cycle
+            if max_cycle != None and self.cycle >= max_cycle:
+                return None
+            if self.b_skip_idle:
+                idle = self.num_of_idle_step
+                if idle > 0 and idle & (idle - 1) == 0:
+                    # Tried after 1, 2, 4, 8, ... steps without location change
+                    self.skip(max_cycle)
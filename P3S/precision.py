@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+
+''' Statistical early termination of stochastic P3S simulation
+
+ Samples of throughput or latency are collected while simulating, and
+ the simulation stops when the half width of confidence interval
+ (batch means after MSER warm-up deletion) falls below a threshold,
+ instead of always simulating a fixed number of iterations
+ (ex: NUM_OF_FRAME is set large enough and the run is cut short).
+   - throughput : interval cycles between completions of progress
+                  transition (ex: a frame is freed)
+   - latency    : cycles from start transition to end transition of
+                  the same frame (matched in FIFO order)
+
+ Usage:
+   collector = precision.SampleCollector("TransClupMpFree")
+   result = precision.simulate(build_model(), collector, relative=0.02)
+   collector.report()
+'''
+
+from P3S import p3s
+from P3S import session
+from P3S import stats
+
+
+class SampleCollector(p3s.Observer):
+
+    def __init__(self, progress, start=None, group=5, num_of_batch=20, confidence=0.95):
+        '''
+        Constructor of SampleCollector class.
+            [1] progress : Trans class name of progress point (end of latency)
+            [2] start : Trans class name of start of latency (None: interval of progress)
+            [3] group : number of samples of one group (MSER)
+            [4] num_of_batch : number of batches
+            [5] confidence : confidence level
+        '''
+        self.progress = progress
+        self.start = start
+        self.starts = []
+        self.last_cycle = None
+        self.samples = stats.BatchMeans("latency" if start else "interval", group, num_of_batch, confidence)
+
+    def trans_updated(self, proc, global_cycle):
+        name = type(proc.current_trans).__name__
+        if name == self.start:
+            self.starts.append(global_cycle)
+        if name != self.progress:
+            return
+        if self.start:
+            if self.starts:
+                self.samples.add(global_cycle - self.starts.pop(0))
+        else:
+            if self.last_cycle != None:
+                self.samples.add(global_cycle - self.last_cycle)
+            self.last_cycle = global_cycle
+
+    def report(self, prefix=""):
+        self.samples.report(prefix)
+
+
+class PrecisionStop():
+
+    def __init__(self, collector, half_width=None, relative=None):
+        '''
+        Constructor of PrecisionStop class (stop condition of Session).
+            [1] collector : SampleCollector class object
+            [2] half_width : threshold of half width (cycle)
+            [3] relative : threshold of half width relative to mean
+        '''
+        self.collector = collector
+        self.half_width = half_width
+        self.relative = relative
+        self.interval = None
+
+    def __call__(self, sim):
+        self.interval = self.collector.samples.get_interval()
+        if self.interval == None:
+            return False
+        mean, half = self.interval
+        if self.half_width != None and half > self.half_width:
+            return False
+        if self.relative != None and half > self.relative * abs(mean):
+            return False
+        return True
+
+
+def simulate(sim, collector, half_width=None, relative=0.05, slice_cycle=10000, max_cycle=None, wall_time=None):
+    '''
+    Simulate until the confidence interval is precise enough.
+    Return value is (stop condition, mean, half width) (mean/half width are None if not enough samples)
+        [1] sim : P3S class object
+        [2] collector : SampleCollector class object
+        [3] half_width : threshold of half width (cycle)
+        [4] relative : threshold of half width relative to mean
+        [5] slice_cycle : cycles between checks of precision
+        [6] max_cycle : Max cycle to be simulated
+        [7] wall_time : wall-time budget (sec)
+    '''
+    stop = PrecisionStop(collector, half_width, relative)
+    sim.add_observer(collector)
+    s = session.Session(sim, slice_cycle, max_cycle, wall_time, until=stop, b_events=False)
+    reason = None
+    for result in s:
+        reason = result.reason
+    sim.observers.remove(collector)
+    interval = collector.samples.get_interval()
+    if reason == "until":
+        reason = "precise"
+    return (reason,) + (interval if interval else (None, None))
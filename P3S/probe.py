@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+
+''' Time-series probes of P3S model variables
+
+ Probes read shared variables (ex: mbed_conf.MP_UNUSED), task states and
+ channel backlogs. Values are changed only by update actions, so they are
+ sampled when location of a Process changes, and regarded as constant
+ until the next sample. With period, they are sampled at most once per
+ period cycles to reduce overhead.
+ Each probe keeps min/max/time-weighted mean per time bucket. When the
+ number of buckets exceeds max_buckets, adjacent buckets are merged and
+ the bucket width is doubled (decimation), so a long run produces a
+ small time series.
+
+ Usage:
+   sampler = probe.Sampler(bucket_cycle=10, max_buckets=512)
+   sampler.add_var("mbed_conf", "MP_UNUSED")
+   sampler.add_task_state(app_task)
+   sampler.add_channel(channel)
+   sim.add_observer(sampler)
+   sim.simulate()
+   sampler.close(sim.finish_cycle)
+   sampler.report()
+   sampler.to_csv("probes.csv")
+'''
+
+import importlib
+
+from P3S import p3s
+
+
+class TimeSeries():
+
+    def __init__(self, name, bucket_cycle, max_buckets):
+        '''
+        Constructor of TimeSeries class.
+            [1] name : Name of TimeSeries class object
+            [2] bucket_cycle : initial width of one bucket (cycle)
+            [3] max_buckets : max number of buckets
+        '''
+        self.name = name
+        self.bucket_cycle = bucket_cycle
+        self.max_buckets = max_buckets
+        self.buckets = [] # [min, max, weighted sum, cycles] of each bucket (None: no sample)
+        self.last_cycle = None
+        self.last_value = None
+
+    def get_bucket(self, index):
+        while len(self.buckets) <= index:
+            self.buckets.append(None)
+        if self.buckets[index] == None:
+            self.buckets[index] = [None, None, 0.0, 0]
+        return self.buckets[index]
+
+    def decimate(self):
+        '''
+        Merge adjacent buckets and double bucket width.
+        '''
+        merged = []
+        for x in range(0, len(self.buckets), 2):
+            pair = [b for b in self.buckets[x:x + 2] if b != None]
+            if len(pair) == 0:
+                merged.append(None)
+                continue
+            mins = [b[0] for b in pair if b[0] != None]
+            maxs = [b[1] for b in pair if b[1] != None]
+            merged.append([min(mins) if mins else None, max(maxs) if maxs else None,
+                           sum(b[2] for b in pair), sum(b[3] for b in pair)])
+        self.buckets = merged
+        self.bucket_cycle *= 2
+
+    def extend(self, cycle):
+        '''
+        Hold last value until cycle.
+            [1] cycle : cycle
+        '''
+        start = self.last_cycle
+        value = self.last_value
+        while start < cycle:
+            index = int(start // self.bucket_cycle)
+            while index >= self.max_buckets:
+                self.decimate()
+                index = int(start // self.bucket_cycle)
+            end = min(cycle, (index + 1) * self.bucket_cycle)
+            bucket = self.get_bucket(index)
+            if bucket[0] == None or value < bucket[0]:
+                bucket[0] = value
+            if bucket[1] == None or value > bucket[1]:
+                bucket[1] = value
+            bucket[2] += value * (end - start)
+            bucket[3] += end - start
+            start = end
+        self.last_cycle = cycle
+
+    def add(self, cycle, value):
+        '''
+        Add sample value.
+            [1] cycle : cycle of the sample
+            [2] value : sample value
+        '''
+        if self.last_cycle == None:
+            self.last_cycle = cycle
+        elif cycle > self.last_cycle:
+            self.extend(cycle)
+        self.last_value = value
+
+    def get_series(self):
+        '''
+        Get list of (start cycle, min, max, mean) of buckets which have samples.
+        '''
+        series = []
+        for x, bucket in enumerate(self.buckets):
+            if bucket != None and bucket[3] > 0:
+                series.append((x * self.bucket_cycle, bucket[0], bucket[1], bucket[2] / bucket[3]))
+        return series
+
+
+class Probe():
+
+    def __init__(self, name, getter, series):
+        '''
+        Constructor of Probe class.
+            [1] name : Name of Probe class object
+            [2] getter : function which returns current value
+            [3] series : TimeSeries class object
+        '''
+        self.name = name
+        self.getter = getter
+        self.series = series
+
+
+class Sampler(p3s.Observer):
+
+    def __init__(self, bucket_cycle=10, max_buckets=512, period=None):
+        '''
+        Constructor of Sampler class.
+            [1] bucket_cycle : initial width of one bucket (cycle)
+            [2] max_buckets : max number of buckets of each probe
+            [3] period : min cycles between samples (None: sampled on every location change)
+        '''
+        self.bucket_cycle = bucket_cycle
+        self.max_buckets = max_buckets
+        self.period = period
+        self.probes = []
+        self.next_cycle = None
+        self.last_cycle = 0
+
+    def add(self, name, getter):
+        '''
+        Add probe.
+            [1] name : name of probe
+            [2] getter : function which returns current value
+        '''
+        probe = Probe(name, getter, TimeSeries(name, self.bucket_cycle, self.max_buckets))
+        self.probes.append(probe)
+        return probe
+
+    def add_var(self, module, var):
+        '''
+        Add probe of variable of module (ex: "mbed_conf", "MP_UNUSED").
+            [1] module : module or name of module
+            [2] var : name of variable
+        '''
+        if isinstance(module, str):
+            module = importlib.import_module(module)
+        return self.add(var, lambda: getattr(module, var))
+
+    def add_task_state(self, task):
+        '''
+        Add probe of task state (value of define_p3s.TaskState).
+            [1] task : Task class object
+        '''
+        return self.add(task.name + ".state", lambda: task.task_state.value)
+
+    def add_channel(self, channel, receiver=None):
+        '''
+        Add probe of number of data buffered in channel.
+            [1] channel : Channel class object
+            [2] receiver : Process class object to receive data
+                           (None: max of all receivers of broadcast channel)
+        '''
+        if receiver == None:
+            return self.add(channel.name + ".backlog", lambda: max(len(fifo) for fifo in channel.fifos.values()))
+        return self.add(channel.name + ".backlog", lambda: len(channel.get_fifo(receiver)))
+
+    def sample(self, global_cycle):
+        '''
+        Sample all probes.
+            [1] global_cycle : current cycle
+        '''
+        cycle = max(global_cycle, self.last_cycle)
+        self.last_cycle = cycle
+        for probe in self.probes:
+            probe.series.add(cycle, probe.getter())
+
+    def location_changed(self, proc, global_cycle):
+        if self.period != None:
+            if self.next_cycle != None and global_cycle < self.next_cycle:
+                return
+            self.next_cycle = global_cycle + self.period
+        self.sample(global_cycle)
+
+    def close(self, cycle):
+        '''
+        Sample all probes at end of simulation.
+            [1] cycle : finished cycle
+        '''
+        self.sample(cycle)
+
+    def report(self):
+        '''
+        Print summary of each probe.
+        '''
+        for probe in self.probes:
+            series = probe.series.get_series()
+            if len(series) == 0:
+                print("[%s] no sample" % probe.name)
+                continue
+            cycles = sum(b[3] for b in probe.series.buckets if b != None)
+            mean = sum(b[2] for b in probe.series.buckets if b != None) / cycles if cycles else 0.0
+            print("[%s] min %s, max %s, mean %.3f (%d buckets of %s cycle)" %
+                  (probe.name, min(s[1] for s in series), max(s[2] for s in series), mean,
+                   len(series), probe.series.bucket_cycle))
+
+    def to_csv(self, path):
+        '''
+        Write time series of all probes to CSV file.
+            [1] path : path of CSV file
+        '''
+        with open(path, "w") as f:
+            f.write("probe,start,end,min,max,mean\n")
+            for probe in self.probes:
+                width = probe.series.bucket_cycle
+                for start, lo, hi, mean in probe.series.get_series():
+                    f.write("%s,%s,%s,%s,%s,%.6f\n" % (probe.name, start, start + width, lo, hi, mean))
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+
+''' Sampled simulation of P3S models (SMARTS-style)
+
+ The workload is divided into units by a progress point (Trans class
+ name, ex: a frame is freed). The model is simulated in two modes:
+   - functional : delays of all transitions are scaled by ff_scale
+                  (default 0: timing is ignored, only the order of
+                  events is simulated) and rounded to integer cycles,
+                  with a larger accuracy cycle (models are interleaved
+                  coarsely), and steps in which no event can occur are
+                  skipped (P3S.skip())
+   - detailed   : normal timed simulation of CPU_Model/HW_Model
+ Units are sampled systematically: in every period units, the last
+ warmup + window units are simulated in detailed mode, and cycles per
+ unit are measured in the last window units (after warm-up).
+ Total cycles are estimated as (mean cycles per unit) x (number of
+ units), with a confidence interval from Student's t distribution over
+ the windows, and throughput is derived from it.
+
+ Note: a model which polls in a loop (self-transition without wait
+ signal) does not advance with zero delays. Use a small positive
+ ff_scale for such models.
+
+ Usage:
+   sampler = sampling.SampledSimulation(sim, "TransClupMpFree", period=50, warmup=2, window=3)
+   sampler.simulate()
+   sampler.report()
+'''
+
+import math
+import time
+
+from P3S import causal
+from P3S import p3s
+from P3S import stats
+
+FUNCTIONAL = "functional"
+DETAILED = "detailed"
+
+
+class SampledSimulation(p3s.Observer):
+
+    def __init__(self, sim, progress, period=50, warmup=2, window=3, ff_scale=0.0,
+                 ff_accuracy_cycle=100, confidence=0.95):
+        '''
+        Constructor of SampledSimulation class.
+            [1] sim : P3S class object
+            [2] progress : Trans class name of progress point (end of one unit)
+            [3] period : number of units of one sampling period
+            [4] warmup : number of detailed units before each window (not measured)
+            [5] window : number of measured units in each period
+            [6] ff_scale : scale factor of delays in functional mode
+            [7] ff_accuracy_cycle : accuracy cycle in functional mode (None: not changed)
+            [8] confidence : confidence level of estimate
+        '''
+        if period < warmup + window or window < 1:
+            raise ValueError("period must be >= warmup + window (window >= 1)")
+        self.sim = sim
+        self.progress = progress
+        self.period = period
+        self.warmup = warmup
+        self.window = window
+        self.ff_scale = ff_scale
+        self.ff_accuracy_cycle = ff_accuracy_cycle
+        self.confidence = confidence
+        self.mode = None
+        self.count = 0              # number of finished units
+        self.window_start = None    # cycle of start of current window
+        self.samples = []           # cycles per unit of each window
+        self.events = {FUNCTIONAL: 0, DETAILED: 0}
+        self.wall_time = 0.0
+        self.detailed_scale = dict(sim.delay_scale)
+        self.functional_scale = dict(sim.delay_scale)
+        for name in causal.get_trans_classes(sim):
+            self.functional_scale[name] = self.detailed_scale.get(name, 1) * ff_scale
+        self.detailed_accuracy_cycle = sim.accuracy_cycle
+        self.detailed_skip_idle = sim.b_skip_idle
+        self.detailed_round_delay = sim.b_round_delay
+
+    def get_mode(self, count):
+        '''
+        Get mode of unit.
+            [1] count : index of unit
+        '''
+        if count % self.period < self.period - self.warmup - self.window:
+            return FUNCTIONAL
+        return DETAILED
+
+    def set_mode(self, mode):
+        if mode == self.mode:
+            return
+        self.mode = mode
+        if mode == FUNCTIONAL:
+            self.sim.delay_scale = self.functional_scale
+            if self.ff_accuracy_cycle:
+                self.sim.accuracy_cycle = self.ff_accuracy_cycle
+            self.sim.b_skip_idle = True
+            self.sim.b_round_delay = True
+        else:
+            self.restore_mode()
+
+    def restore_mode(self):
+        self.sim.delay_scale = self.detailed_scale
+        self.sim.accuracy_cycle = self.detailed_accuracy_cycle
+        self.sim.b_skip_idle = self.detailed_skip_idle
+        self.sim.b_round_delay = self.detailed_round_delay
+
+    def location_changed(self, proc, global_cycle):
+        self.events[self.mode] += 1
+        if type(proc.current_trans).__name__ != self.progress:
+            return
+        if self.window_start != None and self.count % self.period == self.period - 1:
+            self.samples.append((global_cycle - self.window_start) / self.window)
+            self.window_start = None
+        self.count += 1
+        if self.count % self.period == self.period - self.window:
+            self.window_start = global_cycle
+        self.set_mode(self.get_mode(self.count))
+
+    def simulate(self, max_cycle=None):
+        '''
+        Start sampled simulation.
+        Return value is number of finished units.
+            [1] max_cycle : Max cycle to be simulated
+        '''
+        start = time.time()
+        self.set_mode(self.get_mode(0))
+        if self.period == self.window:
+            self.window_start = 0
+        self.sim.add_observer(self)
+        try:
+            self.sim.simulate(max_cycle)
+        finally:
+            self.sim.observers.remove(self)
+            self.restore_mode()
+        self.wall_time = time.time() - start
+        return self.count
+
+    def get_estimate(self):
+        '''
+        Get estimate of cycles.
+        Return value is (mean cycles per unit, half width of interval, estimated total cycles)
+        (None if there is no window)
+        '''
+        n = len(self.samples)
+        if n == 0:
+            return None
+        mean = sum(self.samples) / n
+        half = float("inf")
+        if n > 1:
+            var = sum((s - mean) ** 2 for s in self.samples) / (n - 1)
+            half = stats.get_t_quantile(self.confidence, n - 1) * math.sqrt(var / n)
+        return (mean, half, mean * self.count)
+
+    def get_throughput(self):
+        '''
+        Get estimate of throughput.
+        Return value is (units per ms, lower bound, upper bound)
+        '''
+        estimate = self.get_estimate()
+        if estimate == None or estimate[0] <= 0:
+            return None
+        mean, half, _ = estimate
+        clock = self.sim.cpu.clock if self.sim.cpu else self.sim.hw[0].clock
+        def per_ms(cycle):
+            return (clock * 1000.0 / cycle) if cycle > 0 else float("inf")
+        return (per_ms(mean), per_ms(mean + half), per_ms(mean - half))
+
+    def report(self):
+        '''
+        Print estimate.
+        '''
+        total = self.events[FUNCTIONAL] + self.events[DETAILED]
+        print("Units: %d (%d windows of %d units, period %d, warm-up %d)" %
+              (self.count, len(self.samples), self.window, self.period, self.warmup))
+        print("Detailed events: %d / %d (%.1f%%), wall time %.3f sec" %
+              (self.events[DETAILED], total, 100.0 * self.events[DETAILED] / total if total else 0.0, self.wall_time))
+        estimate = self.get_estimate()
+        if estimate == None:
+            print("No window is finished")
+            return
+        mean, half, cycles = estimate
+        print("Cycles per unit: %.3f +/- %.3f (%.0f%% confidence)" % (mean, half, 100 * self.confidence))
+        print("Total cycles: %.1f +/- %.1f" % (cycles, half * self.count))
+        throughput, lower, upper = self.get_throughput()
+        print("Throughput: %.3f units/ms [%.3f, %.3f]" % (throughput, lower, upper))
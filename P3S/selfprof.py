@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+
+''' Self-profiling of P3S simulation (opt-in)
+
+ Methods of the model are wrapped per object to count calls and measure
+ wall time of:
+   - engine phases   : P3S.step, CPU_Model.run, HW_Model.run,
+                       restart/select_trans/get_trans_delay of each Process class
+   - user callbacks  : guard/sync/update/get_delay of each Trans class
+ Both inclusive time and self time (excluding wrapped callees) are kept,
+ so time of P3S bookkeeping and time of user code can be told apart.
+ To keep overhead low, time is measured only in every sample-th step
+ (calls are always counted), and totals are estimated from the samples.
+
+ Usage:
+   profiler = selfprof.Profiler(sample=10)
+   profiler.install(sim)
+   sim.simulate()
+   profiler.uninstall()
+   profiler.report()
+'''
+
+from time import perf_counter
+
+# Marker of attribute which was not in instance dict
+_NONE = object()
+
+
+class Profiler():
+
+    def __init__(self, sample=1):
+        '''
+        Constructor of Profiler class.
+            [1] sample : time is measured in every sample-th step
+        '''
+        self.sample = sample
+        self.stats = {}     # (kind, name) : [calls, sampled calls, inclusive sec, self sec]
+        self.stack = []     # time of callees for each wrapped call in progress
+        self.wrapped = []   # (object, attribute name, original instance attribute)
+        self.num_of_step = 0
+        self.b_active = True
+
+    def wrap(self, obj, attr, key):
+        '''
+        Wrap method of object.
+            [1] obj : object
+            [2] attr : name of method
+            [3] key : (kind, name) of statistics
+        '''
+        if any(o is obj and a == attr for o, a, _ in self.wrapped):
+            return
+        func = getattr(obj, attr)
+        stat = self.stats.setdefault(key, [0, 0, 0.0, 0.0])
+        prof = self
+        def wrapper(*args):
+            stat[0] += 1
+            if not prof.b_active:
+                return func(*args)
+            prof.stack.append(0.0)
+            start = perf_counter()
+            try:
+                return func(*args)
+            finally:
+                elapsed = perf_counter() - start
+                child = prof.stack.pop()
+                stat[1] += 1
+                stat[2] += elapsed
+                stat[3] += elapsed - child
+                if prof.stack:
+                    prof.stack[-1] += elapsed
+        self.wrapped.append((obj, attr, obj.__dict__.get(attr, _NONE)))
+        setattr(obj, attr, wrapper)
+
+    def install(self, sim):
+        '''
+        Install instrumentation to the model.
+            [1] sim : P3S class object
+        '''
+        self.wrap(sim, "step", ("engine", "P3S.step"))
+        step = sim.step
+        prof = self
+        def sampled_step():
+            prof.num_of_step += 1
+            prof.b_active = (prof.num_of_step % prof.sample == 0)
+            return step()
+        self.wrapped.append((sim, "step", step))
+        sim.step = sampled_step
+        for model in ([sim.cpu] if sim.cpu else []) + sim.hw:
+            self.wrap(model, "run", ("engine", "%s.run" % type(model).__name__))
+        for proc in sim.get_processes():
+            cls = type(proc).__name__
+            for attr in ("restart", "select_trans", "get_trans_delay"):
+                self.wrap(proc, attr, ("engine", "%s.%s" % (cls, attr)))
+            for loc in proc.locations:
+                for trans in loc.transitions:
+                    for attr in ("guard", "sync", "update", "get_delay"):
+                        self.wrap(trans, attr, ("callback", "%s.%s" % (type(trans).__name__, attr)))
+
+    def uninstall(self):
+        '''
+        Remove instrumentation from the model.
+        '''
+        for obj, attr, original in reversed(self.wrapped):
+            if original is _NONE:
+                del obj.__dict__[attr]
+            else:
+                setattr(obj, attr, original)
+        self.wrapped = []
+        self.b_active = True
+
+    def get_estimate(self, key):
+        '''
+        Get estimated (inclusive sec, self sec) of all calls.
+            [1] key : (kind, name) of statistics
+        '''
+        calls, sampled, inclusive, own = self.stats[key]
+        if sampled == 0:
+            return (0.0, 0.0)
+        scale = calls / sampled
+        return (inclusive * scale, own * scale)
+
+    def report(self, num=20):
+        '''
+        Print hottest engine phases and user callbacks.
+            [1] num : number of lines
+        '''
+        keys = sorted(self.stats, key=lambda k: self.get_estimate(k)[1], reverse=True)
+        total = sum(self.get_estimate(k)[1] for k in keys)
+        print("Self-profile (sampled 1/%d steps, %d steps):" % (self.sample, self.num_of_step))
+        print("%-8s %-36s %9s %10s %10s %6s %9s" % ("kind", "name", "calls", "total(ms)", "self(ms)", "self%", "us/call"))
+        for key in keys[:num]:
+            calls, sampled, _, _ = self.stats[key]
+            inclusive, own = self.get_estimate(key)
+            print("%-8s %-36s %9d %10.3f %10.3f %5.1f%% %9.3f" %
+                  (key[0], key[1], calls, inclusive * 1000, own * 1000, (100.0 * own / total) if total > 0 else 0.0,
+                   (1e6 * inclusive / calls) if calls else 0.0))
+        for kind in ("engine", "callback"):
+            own = sum(self.get_estimate(k)[1] for k in keys if k[0] == kind)
+            print("%s: %.3f ms (%.1f%%)" % (kind, own * 1000, (100.0 * own / total) if total > 0 else 0.0))
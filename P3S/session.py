@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+
+''' Incremental simulation of P3S models
+
+ Session advances P3S in slices of caller-controlled cycles, and each
+ slice yields events (location change, signal, preemption) and metrics.
+ The Session stops when one of stop conditions is met:
+   - finished  : the model finished
+   - max_cycle : cycle limit
+   - wall_time : wall-time budget (sec)
+   - until     : predicate on P3S class object
+   - converged : convergence test on history of metrics
+   - cancelled : cancel() is called
+   - deadlock  : no event can occur (DeadlockError, kept in error)
+   - livelock  : no progress (DeadlockError with stall_cycle of P3S)
+   - error     : other exception is raised by the model (propagated)
+ Iteration can be paused (break out of the loop) and resumed later by
+ iterating the same Session again.
+
+ Usage:
+   session = session.Session(build_model(), 1000, wall_time=10.0,
+                             converged=session.Converged("cycle_per_loc", 5, 0.01))
+   for s in session:
+       print(s.cycle, len(s.events), s.metrics)
+
+   async for s in session.slices(): (asyncio)
+'''
+
+import asyncio
+import time
+
+from P3S import p3s
+
+
+class EventRecorder(p3s.Observer):
+
+    def __init__(self, sim):
+        '''
+        Constructor of EventRecorder class.
+        (cycle of signal event is the start of the step in which it is set)
+            [1] sim : P3S class object
+        '''
+        self.sim = sim
+        self.events = [] # (cycle, kind, name, detail)
+        self.num_of_loc = 0
+
+    def location_changed(self, proc, global_cycle):
+        self.num_of_loc += 1
+        self.events.append((global_cycle, "location", proc.name, proc.current_loc.name))
+
+    def signal_set(self, src_task, dst_task, sig_id):
+        self.events.append((self.sim.cycle, "signal", src_task.name if src_task else None, (dst_task.name, int(sig_id))))
+
+    def preempted(self, task, isr, global_cycle):
+        self.events.append((global_cycle, "preempt", task.name, isr.name))
+
+    def drain(self):
+        events = self.events
+        self.events = []
+        return events
+
+
+class Converged():
+
+    def __init__(self, name, window, tolerance):
+        '''
+        Constructor of Converged class (convergence test).
+        Converged if relative change of the metric in last window slices
+        is less than tolerance.
+            [1] name : name of metric
+            [2] window : number of slices
+            [3] tolerance : relative change
+        '''
+        self.name = name
+        self.window = window
+        self.tolerance = tolerance
+
+    def __call__(self, history):
+        if len(history) <= self.window:
+            return False
+        values = [metrics.get(self.name) for metrics in history[-(self.window + 1):]]
+        if None in values:
+            return False
+        base = max(abs(values[0]), 1e-12)
+        return max(abs(value - values[0]) for value in values) / base < self.tolerance
+
+
+class Slice():
+
+    def __init__(self, cycle, events, metrics, wall_time, reason):
+        '''
+        Constructor of Slice class (result of one slice).
+            [1] cycle : simulated cycle at end of the slice
+            [2] events : list of (cycle, kind, name, detail)
+            [3] metrics : dict of metric name : value
+            [4] wall_time : total wall time (sec) of the Session
+            [5] reason : stop condition (None if not stopped)
+        '''
+        self.cycle = cycle
+        self.events = events
+        self.metrics = metrics
+        self.wall_time = wall_time
+        self.reason = reason
+
+
+def get_default_metrics(sim, recorder):
+    '''
+    Get default metrics of Simulation.
+        [1] sim : P3S class object
+        [2] recorder : EventRecorder class object
+    '''
+    procs = sim.get_processes()
+    metrics = {"cycle": sim.cycle,
+               "locations": recorder.num_of_loc,
+               "cycle_per_loc": (sim.cycle / recorder.num_of_loc) if recorder.num_of_loc else None,
+               "finished": sum(1 for proc in procs if proc.b_finished)}
+    if sim.cpu:
+        metrics["cpu_cycle"] = sim.cpu.cycle
+    return metrics
+
+
+class Session():
+
+    def __init__(self, sim, slice_cycle, max_cycle=None, wall_time=None, until=None, converged=None,
+                 metrics=None, b_events=True):
+        '''
+        Constructor of Session class.
+            [1] sim : P3S class object
+            [2] slice_cycle : cycles of one slice
+            [3] max_cycle : Max cycle to be simulated
+            [4] wall_time : wall-time budget (sec)
+            [5] until : function(sim) which returns True to stop
+            [6] converged : function(history of metrics) which returns True to stop
+            [7] metrics : function(sim) which returns dict of metrics (added to default metrics)
+            [8] b_events : Whether events are recorded
+        '''
+        self.sim = sim
+        self.slice_cycle = slice_cycle
+        self.max_cycle = max_cycle
+        self.wall_time = wall_time
+        self.until = until
+        self.converged = converged
+        self.metrics = metrics
+        self.b_events = b_events
+        self.recorder = EventRecorder(sim)
+        self.history = []
+        self.elapsed = 0.0
+        self.reason = None
+        self.error = None # DeadlockError which stopped this Session
+        self.b_started = False
+        self.b_cancelled = False
+
+    def cancel(self):
+        '''
+        Cancel this Session (stopped at end of current slice).
+        '''
+        self.b_cancelled = True
+
+    def get_reason(self):
+        '''
+        Get stop condition which is met (None if not stopped).
+        '''
+        sim = self.sim
+        if sim.finish_cycle != None:
+            return "finished"
+        if self.error != None:
+            return self.error.kind
+        if self.b_cancelled:
+            return "cancelled"
+        if self.max_cycle != None and sim.cycle >= self.max_cycle:
+            return "max_cycle"
+        if self.wall_time != None and self.elapsed >= self.wall_time:
+            return "wall_time"
+        if self.until and self.until(sim):
+            return "until"
+        if self.converged and self.converged(self.history):
+            return "converged"
+        return None
+
+    def next_slice(self):
+        '''
+        Run one slice.
+        Return value is Slice class object (None if this Session has stopped)
+        '''
+        if self.reason != None:
+            return None
+        sim = self.sim
+        if not self.b_started:
+            if not sim.start():
+                self.reason = "finished"
+                return None
+            if self.b_events:
+                sim.add_observer(self.recorder)
+            self.b_started = True
+        start = time.time()
+        end_cycle = sim.cycle + self.slice_cycle
+        if self.max_cycle != None:
+            end_cycle = min(end_cycle, self.max_cycle)
+        self.reason = "error" # Kept if an exception is propagated
+        try:
+            try:
+                while sim.cycle < end_cycle and not self.b_cancelled:
+                    if sim.step():
+                        break
+            except p3s.DeadlockError as error:
+                # Events and metrics until detection are kept
+                self.error = error
+            self.elapsed += time.time() - start
+            metrics = get_default_metrics(sim, self.recorder)
+            if self.metrics:
+                metrics.update(self.metrics(sim))
+            self.history.append(metrics)
+            self.reason = self.get_reason()
+        finally:
+            if self.reason != None and self.b_events:
+                sim.observers.remove(self.recorder)
+        return Slice(sim.cycle if sim.finish_cycle == None else sim.finish_cycle,
+                     self.recorder.drain(), metrics, self.elapsed, self.reason)
+
+    def __iter__(self):
+        while True:
+            s = self.next_slice()
+            if s == None:
+                return
+            yield s
+
+    async def slices(self):
+        '''
+        Iterate slices asynchronously (event loop runs between slices).
+        '''
+        while True:
+            s = self.next_slice()
+            if s == None:
+                return
+            yield s
+            await asyncio.sleep(0)
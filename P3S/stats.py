@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+
+''' Statistics of P3S lib
+'''
+
+from statistics import NormalDist
+
+
+def get_t_quantile(confidence, dof):
+    '''
+    Get two-sided quantile of Student's t distribution (approximation).
+        [1] confidence : confidence level (ex: 0.95)
+        [2] dof : degrees of freedom
+    '''
+    z = NormalDist().inv_cdf(0.5 + confidence / 2.0)
+    return (z + (z ** 3 + z) / (4.0 * dof) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96.0 * dof ** 2)
+            + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384.0 * dof ** 3))
+
+def get_mser_truncation(values):
+    '''
+    Get number of initial values to be deleted as warm-up (MSER).
+    Truncation point which minimizes the marginal standard error is
+    searched in the first half of values.
+        [1] values : list of values (ex: means of 5 samples for MSER-5)
+    '''
+    n = len(values)
+    if n < 4:
+        return 0
+    best = None
+    best_d = 0
+    total = sum(values)
+    square = sum(v * v for v in values)
+    for d in range(n // 2 + 1):
+        m = n - d
+        mean = total / m
+        mser = (square / m - mean * mean) / m
+        if best == None or mser < best:
+            best = mser
+            best_d = d
+        total -= values[d]
+        square -= values[d] * values[d]
+    return best_d
+
+
+class Histogram():
+
+    def __init__(self, name, bin_width):
+        '''
+        Constructor of Histogram class.
+            [1] name      : Name of Histogram class object
+            [2] bin_width : width of one bin (cycle)
+        '''
+        self.name = name
+        self.bin_width = bin_width
+        self.bins = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        '''
+        Add sample value.
+            [1] value : sample value
+        '''
+        index = int(value // self.bin_width)
+        self.bins[index] = self.bins.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min == None or value < self.min:
+            self.min = value
+        if self.max == None or value > self.max:
+            self.max = value
+
+    def mean(self):
+        '''
+        Get mean of sample values.
+        '''
+        if self.count == 0:
+            return 0.0
+        return self.total / self.count
+
+    def percentile(self, p):
+        '''
+        Get lower bound of the bin which includes p-th percentile
+        (min if it is in the bin, 0 if there is no sample).
+            [1] p : percentile (0 - 100)
+        '''
+        if self.count == 0:
+            return 0
+        rank = self.count * p / 100.0
+        num = 0
+        for index in sorted(self.bins):
+            num += self.bins[index]
+            if num >= rank:
+                return max(index * self.bin_width, self.min)
+        return self.max
+
+    def report(self, prefix="", b_bins=False):
+        '''
+        Print summary (and bins) of this histogram.
+            [1] prefix : prefix string of each line
+            [2] b_bins : Whether all bins are printed (default: percentiles only)
+        '''
+        if self.count == 0:
+            print(prefix + "%s: no sample" % self.name)
+            return
+        print(prefix + "%s: count %d, min %d, mean %.2f, max %d" % (self.name, self.count, self.min, self.mean(), self.max))
+        print(prefix + "  p50 %s, p90 %s, p99 %s" % (self.percentile(50), self.percentile(90), self.percentile(99)))
+        if not b_bins:
+            return
+        for index in sorted(self.bins):
+            print(prefix + "  [%d, %d): %d" % (index * self.bin_width, (index + 1) * self.bin_width, self.bins[index]))
+
+
+class BatchMeans():
+
+    def __init__(self, name, group=5, num_of_batch=20, confidence=0.95):
+        '''
+        Constructor of BatchMeans class.
+        Samples are averaged in groups online, warm-up groups are deleted
+        by MSER, and the rest are divided into batches to compute
+        confidence interval of mean.
+            [1] name         : Name of BatchMeans class object
+            [2] group        : number of samples of one group (5: MSER-5)
+            [3] num_of_batch : number of batches
+            [4] confidence   : confidence level
+        '''
+        self.name = name
+        self.group = group
+        self.num_of_batch = num_of_batch
+        self.confidence = confidence
+        self.groups = []
+        self.count = 0
+        self.partial = 0.0
+        self.truncation = 0
+
+    def add(self, value):
+        '''
+        Add sample value.
+            [1] value : sample value
+        '''
+        self.count += 1
+        self.partial += value
+        if self.count % self.group == 0:
+            self.groups.append(self.partial / self.group)
+            self.partial = 0.0
+
+    def get_interval(self):
+        '''
+        Get (mean, half width) of confidence interval.
+        Return None if there are not enough samples.
+        '''
+        self.truncation = get_mser_truncation(self.groups)
+        values = self.groups[self.truncation:]
+        size = len(values) // self.num_of_batch
+        if size == 0:
+            return None
+        values = values[len(values) - size * self.num_of_batch:]
+        batches = [sum(values[x * size:(x + 1) * size]) / size for x in range(self.num_of_batch)]
+        mean = sum(batches) / self.num_of_batch
+        var = sum((b - mean) ** 2 for b in batches) / (self.num_of_batch - 1)
+        half = get_t_quantile(self.confidence, self.num_of_batch - 1) * (var / self.num_of_batch) ** 0.5
+        return (mean, half)
+
+    def report(self, prefix=""):
+        '''
+        Print confidence interval.
+            [1] prefix : prefix string of each line
+        '''
+        interval = self.get_interval()
+        if interval == None:
+            print(prefix + "%s: not enough samples (%d)" % (self.name, self.count))
+            return
+        print(prefix + "%s: mean %.3f +- %.3f (%d%%), samples %d, warm-up %d" %
+              (self.name, interval[0], interval[1], int(self.confidence * 100), self.count, self.truncation * self.group))
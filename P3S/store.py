@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+
+''' Persistent memoized results store of P3S simulations
+
+ Each simulation is keyed by a hash of the model definition (source of
+ the model module and the configuration module, and P3S version) and
+ the parameter values. Results are stored in a SQLite database, so
+ repeated points are served from the store, and an interrupted sweep
+ resumes where it stopped.
+ Points are claimed from the store by worker processes, so several
+ workers (or several hosts sharing the directory of the database) can
+ pull pending points from the same store. The default rollback journal
+ of SQLite is used (WAL does not work on network filesystems), so a
+ shared directory needs working file locks (ex: NFS with lockd).
+ A point left running by a killed worker on the same host is made
+ pending again when a sweep starts; one claimed by a worker on another
+ host is reclaimed after timeout.
+
+ Usage:
+   store = store.ResultStore("results.db")
+   sweep = store.Sweep(store, build_model, "mbed_conf")
+   results = sweep.run([{"MP_MAX": 3, "F_SIZE": 512}, {"MP_MAX": 5, "F_SIZE": 512}], jobs=4)
+
+   build_model : module level function to build P3S class object
+   "mbed_conf" : name of configuration module whose vars are overwritten
+                 by parameter values before build_model() is called
+'''
+
+import hashlib
+import importlib
+import inspect
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import sys
+import time
+
+from P3S import p3s
+
+STATE_PENDING = "pending"
+STATE_RUNNING = "running"
+STATE_DONE    = "done"
+STATE_FAILED  = "failed"
+
+
+def get_model_hash(build, config):
+    '''
+    Get hash of model definition.
+        [1] build : function to build P3S class object
+        [2] config : name of configuration module
+    '''
+    h = hashlib.sha256(p3s.__version__.encode())
+    for name in (build.__module__, config):
+        if name == None:
+            continue
+        module = sys.modules.get(name) or importlib.import_module(name)
+        try:
+            h.update(inspect.getsource(module).encode())
+        except (OSError, TypeError):
+            h.update(name.encode())
+    h.update(build.__name__.encode())
+    return h.hexdigest()
+
+def get_point_key(model_hash, params):
+    '''
+    Get key of simulation point.
+        [1] model_hash : hash of model definition
+        [2] params : dict of parameter name : value
+    '''
+    return hashlib.sha256((model_hash + json.dumps(params, sort_keys=True)).encode()).hexdigest()
+
+def run_point(build, config, params, max_cycle=None, collect=None, b_verbose=False):
+    '''
+    Simulate one point.
+    Return value is dict of result.
+        [1] build : function to build P3S class object
+        [2] config : name of configuration module
+        [3] params : dict of parameter name : value
+        [4] max_cycle : Max cycle to be simulated
+        [5] collect : function to return dict of statistics from P3S class object
+        [6] b_verbose : Whether location changes are printed
+    '''
+    saved = {}
+    if config != None:
+        module = importlib.import_module(config)
+        for name, value in params.items():
+            saved[name] = getattr(module, name, None)
+            setattr(module, name, value)
+    try:
+        start = time.time()
+        sim = build()
+        sim.b_verbose = b_verbose
+        deadlock = None
+        try:
+            finish_cycle = sim.simulate(max_cycle)
+        except p3s.DeadlockError as error:
+            # Point is not finished (statistics until detection are kept)
+            finish_cycle = None
+            deadlock = error.kind
+        result = {"finish": finish_cycle, "deadlock": deadlock, "wall_time": time.time() - start}
+        if sim.cpu:
+            for isr in sim.cpu.isrs:
+                result["latency_" + isr.name] = isr.latency_hist.mean()
+                result["p99_latency_" + isr.name] = isr.latency_hist.percentile(99)
+        for resource in sim.resources:
+            result["occupancy_" + resource.name] = (resource.busy_cycle / finish_cycle) if finish_cycle else None
+        if collect != None:
+            result.update(collect(sim))
+    finally:
+        # Restore configuration
+        for name, value in saved.items():
+            setattr(module, name, value)
+    return result
+
+
+class ResultStore():
+
+    def __init__(self, path, timeout=3600.0):
+        '''
+        Constructor of ResultStore class.
+            [1] path : path of SQLite database file
+            [2] timeout : sec after which a running point is regarded as abandoned
+        '''
+        self.path = path
+        self.timeout = timeout
+        self.conn = sqlite3.connect(path, timeout=60.0, isolation_level=None)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS points ("
+                          "key TEXT PRIMARY KEY, model TEXT, params TEXT, state TEXT,"
+                          "worker TEXT, claimed REAL, result TEXT)")
+
+    def close(self):
+        self.conn.close()
+
+    def add(self, model_hash, params):
+        '''
+        Add point to this store (ignored if it already exists).
+        Return value is key of the point
+            [1] model_hash : hash of model definition
+            [2] params : dict of parameter name : value
+        '''
+        key = get_point_key(model_hash, params)
+        self.conn.execute("INSERT OR IGNORE INTO points VALUES (?, ?, ?, ?, NULL, NULL, NULL)",
+                          (key, model_hash, json.dumps(params, sort_keys=True), STATE_PENDING))
+        return key
+
+    def get(self, key):
+        '''
+        Get result of point.
+        Return value is dict of result (None if not finished)
+            [1] key : key of the point
+        '''
+        row = self.conn.execute("SELECT state, result FROM points WHERE key = ?", (key,)).fetchone()
+        if row == None or row[0] != STATE_DONE:
+            return None
+        return json.loads(row[1])
+
+    def claim(self, model_hash, worker):
+        '''
+        Claim a pending (or abandoned) point of the model.
+        Return value is (key, params) (None if there is no pending point)
+            [1] model_hash : hash of model definition
+            [2] worker : name of worker
+        '''
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute("SELECT key, params FROM points WHERE model = ? AND "
+                                    "(state = ? OR (state = ? AND claimed < ?)) LIMIT 1",
+                                    (model_hash, STATE_PENDING, STATE_RUNNING, now - self.timeout)).fetchone()
+            if row != None:
+                self.conn.execute("UPDATE points SET state = ?, worker = ?, claimed = ? WHERE key = ?",
+                                  (STATE_RUNNING, worker, now, row[0]))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        if row == None:
+            return None
+        return (row[0], json.loads(row[1]))
+
+    def reclaim_stale(self, model_hash):
+        '''
+        Make running points of the model pending again if their workers
+        on this host are not alive.
+        Return value is the number of reclaimed points.
+            [1] model_hash : hash of model definition
+        '''
+        host = socket.gethostname()
+        rows = self.conn.execute("SELECT key, worker FROM points WHERE model = ? AND state = ?",
+                                 (model_hash, STATE_RUNNING)).fetchall()
+        num = 0
+        for key, worker in rows:
+            name, _, pid = (worker or "").rpartition(":")
+            if name != host or not pid.isdigit() or is_alive(int(pid)):
+                continue
+            cursor = self.conn.execute("UPDATE points SET state = ? WHERE key = ? AND state = ? AND worker = ?",
+                                       (STATE_PENDING, key, STATE_RUNNING, worker))
+            num += cursor.rowcount
+        return num
+
+    def finish(self, key, result, b_failed=False):
+        '''
+        Store result of point.
+            [1] key : key of the point
+            [2] result : dict of result
+            [3] b_failed : Whether the simulation failed
+        '''
+        self.conn.execute("UPDATE points SET state = ?, result = ? WHERE key = ?",
+                          (STATE_FAILED if b_failed else STATE_DONE, json.dumps(result), key))
+
+    def retry_failed(self, model_hash):
+        '''
+        Make failed points of the model pending again.
+            [1] model_hash : hash of model definition
+        '''
+        self.conn.execute("UPDATE points SET state = ? WHERE model = ? AND state = ?",
+                          (STATE_PENDING, model_hash, STATE_FAILED))
+
+    def count(self, model_hash):
+        '''
+        Get number of points of the model in each state.
+            [1] model_hash : hash of model definition
+        '''
+        rows = self.conn.execute("SELECT state, COUNT(*) FROM points WHERE model = ? GROUP BY state", (model_hash,))
+        return dict(rows.fetchall())
+
+
+def is_alive(pid):
+    '''
+    Whether process of this host is alive.
+        [1] pid : process ID
+    '''
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def run_worker(path, build, config, max_cycle=None, collect=None, timeout=3600.0):
+    '''
+    Simulate pending points of the model until no point is left.
+    Return value is the number of simulated points.
+        [1] path : path of SQLite database file
+        [2] build : function to build P3S class object
+        [3] config : name of configuration module
+        [4] max_cycle : Max cycle to be simulated
+        [5] collect : function to return dict of statistics from P3S class object
+        [6] timeout : sec after which a running point is regarded as abandoned
+    '''
+    store = ResultStore(path, timeout)
+    model_hash = get_model_hash(build, config)
+    worker = "%s:%d" % (socket.gethostname(), os.getpid())
+    store.reclaim_stale(model_hash)
+    num = 0
+    while True:
+        point = store.claim(model_hash, worker)
+        if point == None:
+            break
+        key, params = point
+        try:
+            result = run_point(build, config, params, max_cycle, collect)
+            store.finish(key, result)
+        except Exception as e:
+            store.finish(key, {"error": repr(e)}, True)
+        num += 1
+    store.close()
+    return num
+
+def _run_worker(args):
+    return run_worker(*args)
+
+
+class Sweep():
+
+    def __init__(self, store, build, config, max_cycle=None, collect=None):
+        '''
+        Constructor of Sweep class.
+            [1] store : ResultStore class object
+            [2] build : module level function to build P3S class object
+            [3] config : name of configuration module
+            [4] max_cycle : Max cycle to be simulated
+            [5] collect : module level function to return dict of statistics from P3S class object
+        '''
+        self.store = store
+        self.build = build
+        self.config = config
+        self.max_cycle = max_cycle
+        self.collect = collect
+        self.model_hash = get_model_hash(build, config)
+
+    def run(self, points, jobs=1):
+        '''
+        Run sweep.
+        Points already in the store are not simulated again, and points left
+        running by dead workers of this host are simulated again.
+        Return value is list of (params, result)
+        (result is None if failed, or still claimed by a worker of another host)
+            [1] points : list of dict of parameter name : value
+            [2] jobs : number of worker processes
+        '''
+        keys = [self.store.add(self.model_hash, params) for params in points]
+        args = (self.store.path, self.build, self.config, self.max_cycle, self.collect, self.store.timeout)
+        if jobs > 1:
+            with multiprocessing.Pool(jobs) as pool:
+                pool.map(_run_worker, [args] * jobs)
+        else:
+            run_worker(*args)
+        return [(params, self.store.get(key)) for params, key in zip(points, keys)]
@@ -0,0 +1,388 @@
+#!/usr/bin/env python
+
+''' Level-of-detail Gantt timeline of P3S simulation
+
+ Location changes of all processes (tasks, ISRs, HW cores) are recorded
+ to a binary trace file (or converted from the verbose output lines
+ "@TASK C:n : change location to X"), and multi-resolution summaries
+ are built from it in one streaming pass:
+   - level 0 : per bucket of base cycles and per process, the dominant
+               location (longest occupancy), the last location and
+               the number of location changes
+   - level k : fanout buckets of level k-1 are merged
+ A view of any range is rendered from the coarsest level which is fine
+ enough for the number of columns, or from the raw trace (binary
+ search on mmap) when zoomed in further than level 0. The trace and
+ summaries are memory-mapped, and never loaded into memory.
+ Output is SVG or text for terminal.
+
+ Trace files:
+   <path>       : records of (cycle: double, process: uint16, location: uint16)
+   <path>.json  : names of processes and locations, finished cycle
+   <path>.lod<k>: summary of level k
+
+ Usage:
+   recorder = timeline.TraceRecorder("run.trace")
+   sim.add_observer(recorder)
+   sim.simulate()
+   recorder.close(sim.finish_cycle)
+   timeline.build_summaries("run.trace")
+   view = timeline.Timeline("run.trace")
+   print(view.render_text(0, view.end_cycle, 100))
+   view.render_svg(0, 10000, 1200, "run.svg")
+'''
+
+import bisect
+import json
+import mmap
+import os
+import re
+import struct
+
+from P3S import p3s
+
+RECORD = struct.Struct("<dHH")      # cycle, process, location
+SUMMARY = struct.Struct("<HHfI")    # dominant location, last location, occupancy, changes
+NO_LOC = 0xFFFF
+LOG_LINE = re.compile(r"^@(\S+) C:([0-9.]+) : change location to (.+?)\s*$")
+SYMBOLS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+
+
+class TraceRecorder(p3s.Observer):
+
+    def __init__(self, path):
+        '''
+        Constructor of TraceRecorder class.
+            [1] path : path of trace file
+        '''
+        self.path = path
+        self.file = open(path, "wb")
+        self.procs = {}     # name : index
+        self.locs = {}      # name : index
+        self.last_cycle = 0
+
+    def record(self, proc_name, cycle, loc_name):
+        '''
+        Record location change.
+            [1] proc_name : name of Process
+            [2] cycle : cycle of location change
+            [3] loc_name : name of new location
+        '''
+        p = self.procs.setdefault(proc_name, len(self.procs))
+        l = self.locs.setdefault(loc_name, len(self.locs))
+        # HW/CPU models run in turn, so cycle may go back within accuracy cycle
+        self.last_cycle = max(self.last_cycle, cycle)
+        self.file.write(RECORD.pack(self.last_cycle, p, l))
+
+    def location_changed(self, proc, global_cycle):
+        self.record(proc.name, global_cycle, proc.current_loc.name)
+
+    def close(self, finish_cycle=None):
+        '''
+        Close trace file and write its names.
+            [1] finish_cycle : finished cycle (None: last recorded cycle)
+        '''
+        self.file.close()
+        header = {"procs": sorted(self.procs, key=self.procs.get),
+                  "locs": sorted(self.locs, key=self.locs.get),
+                  "end": max(finish_cycle if finish_cycle != None else 0, self.last_cycle)}
+        with open(self.path + ".json", "w") as f:
+            json.dump(header, f)
+
+
+def convert_log(log_path, path):
+    '''
+    Convert verbose output of simulation to trace file.
+        [1] log_path : path of output text
+        [2] path : path of trace file
+    '''
+    recorder = TraceRecorder(path)
+    with open(log_path, errors="replace") as f:
+        for line in f:
+            m = LOG_LINE.match(line)
+            if m:
+                recorder.record(m.group(1), float(m.group(2)), m.group(3))
+    recorder.close()
+    return recorder
+
+def load_header(path):
+    with open(path + ".json") as f:
+        return json.load(f)
+
+def get_dominant(occupancy):
+    if len(occupancy) == 0:
+        return (NO_LOC, 0.0)
+    loc = max(occupancy, key=occupancy.get)
+    return (loc, occupancy[loc])
+
+def build_summaries(path, max_buckets=1 << 16, fanout=4):
+    '''
+    Build multi-resolution summaries of trace file (streaming).
+    Return value is list of bucket cycle of each level.
+        [1] path : path of trace file
+        [2] max_buckets : max number of buckets of level 0
+                          (buckets are not finer than the records of the trace)
+        [3] fanout : number of buckets merged into one bucket of next level
+    '''
+    header = load_header(path)
+    num = len(header["procs"])
+    end = header["end"]
+    base = max(1, -(-int(end) // max_buckets))
+    # Level 0 is not finer than the trace (not larger than the raw trace)
+    num_of_record = os.path.getsize(path) // RECORD.size
+    base = max(base, -(-int(end) * num // max(1, num_of_record)))
+    widths = [base]
+    # Level 0
+    cur_loc = [NO_LOC] * num
+    cur_start = [0.0] * num
+    occupancy = [{} for _ in range(num)]
+    changes = [0] * num
+    bucket = 0
+    with open(path + ".lod0", "wb") as out:
+        def flush(until, b_final=False):
+            nonlocal bucket
+            while (bucket + 1) * base <= until or (b_final and bucket * base < end):
+                bucket_end = min((bucket + 1) * base, end) if b_final else (bucket + 1) * base
+                for p in range(num):
+                    if cur_loc[p] != NO_LOC:
+                        occ = occupancy[p]
+                        occ[cur_loc[p]] = occ.get(cur_loc[p], 0.0) + bucket_end - max(cur_start[p], bucket * base)
+                    dominant, time = get_dominant(occupancy[p])
+                    out.write(SUMMARY.pack(dominant, cur_loc[p], time, changes[p]))
+                    occupancy[p] = {}
+                    changes[p] = 0
+                    cur_start[p] = max(cur_start[p], bucket_end)
+                bucket += 1
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(RECORD.size * 4096)
+                if not chunk:
+                    break
+                for cycle, p, l in RECORD.iter_unpack(chunk):
+                    flush(cycle)
+                    if cur_loc[p] != NO_LOC:
+                        occ = occupancy[p]
+                        occ[cur_loc[p]] = occ.get(cur_loc[p], 0.0) + cycle - max(cur_start[p], bucket * base)
+                    cur_loc[p] = l
+                    cur_start[p] = cycle
+                    changes[p] += 1
+        flush(end, True)
+    # Coarser levels
+    level = 0
+    while os.path.getsize("%s.lod%d" % (path, level)) > SUMMARY.size * num:
+        with open("%s.lod%d" % (path, level), "rb") as f, open("%s.lod%d" % (path, level + 1), "wb") as out:
+            while True:
+                chunk = f.read(SUMMARY.size * num * fanout)
+                if not chunk:
+                    break
+                records = list(SUMMARY.iter_unpack(chunk))
+                for p in range(num):
+                    occ = {}
+                    last = NO_LOC
+                    count = 0
+                    for x in range(p, len(records), num):
+                        dominant, last, time, n = records[x]
+                        if dominant != NO_LOC:
+                            occ[dominant] = occ.get(dominant, 0.0) + time
+                        count += n
+                    dominant, time = get_dominant(occ)
+                    out.write(SUMMARY.pack(dominant, last, time, count))
+        level += 1
+        widths.append(widths[-1] * fanout)
+    header["widths"] = widths
+    with open(path + ".json", "w") as f:
+        json.dump(header, f)
+    return widths
+
+
+class Timeline():
+
+    def __init__(self, path):
+        '''
+        Constructor of Timeline class.
+            [1] path : path of trace file (summaries must be built)
+        '''
+        header = load_header(path)
+        self.procs = header["procs"]
+        self.locs = header["locs"]
+        self.end_cycle = header["end"]
+        self.widths = header["widths"]
+        self.files = []
+        self.maps = []
+        for name in [path] + ["%s.lod%d" % (path, x) for x in range(len(self.widths))]:
+            f = open(name, "rb")
+            self.files.append(f)
+            self.maps.append(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(name) > 0 else b"")
+        self.trace = self.maps[0]
+        self.levels = self.maps[1:]
+
+    def close(self):
+        for m in self.maps:
+            if isinstance(m, mmap.mmap):
+                m.close()
+        for f in self.files:
+            f.close()
+
+    def get_summary(self, level, bucket, p):
+        data = self.levels[level]
+        offset = (bucket * len(self.procs) + p) * SUMMARY.size
+        if offset + SUMMARY.size > len(data):
+            return None
+        return SUMMARY.unpack_from(data, offset)
+
+    def find_record(self, cycle):
+        '''
+        Get index of first record at or after cycle (binary search).
+            [1] cycle : cycle
+        '''
+        num = len(self.trace) // RECORD.size
+        class Cycles():
+            def __len__(s):
+                return num
+            def __getitem__(s, x):
+                return RECORD.unpack_from(self.trace, x * RECORD.size)[0]
+        return bisect.bisect_left(Cycles(), cycle)
+
+    def query(self, start, end, columns):
+        '''
+        Get view of range.
+        Return value is list (for each process) of list (for each column) of (location index, changes)
+            [1] start : start cycle
+            [2] end : end cycle
+            [3] columns : number of columns
+        '''
+        step = (end - start) / columns
+        level = None
+        for x, width in enumerate(self.widths):
+            if width <= step:
+                level = x
+        if level == None:
+            return self.query_raw(start, end, columns)
+        width = self.widths[level]
+        view = []
+        for p in range(len(self.procs)):
+            row = []
+            for c in range(columns):
+                first = int((start + c * step) // width)
+                last = max(first + 1, int((start + (c + 1) * step) // width))
+                occ = {}
+                count = 0
+                for bucket in range(first, last):
+                    summary = self.get_summary(level, bucket, p)
+                    if summary == None:
+                        break
+                    if summary[0] != NO_LOC:
+                        occ[summary[0]] = occ.get(summary[0], 0.0) + summary[2]
+                    count += summary[3]
+                row.append((get_dominant(occ)[0], count))
+            view.append(row)
+        return view
+
+    def query_raw(self, start, end, columns):
+        '''
+        Get view of range from raw trace (see query()).
+        '''
+        num = len(self.procs)
+        step = (end - start) / columns
+        base = self.widths[0]
+        bucket = int(start // base)
+        # Location at start of the bucket is the last location of previous bucket
+        cur_loc = [NO_LOC] * num
+        if bucket > 0:
+            for p in range(num):
+                summary = self.get_summary(0, bucket - 1, p)
+                if summary:
+                    cur_loc[p] = summary[1]
+        cur_start = [float(bucket * base)] * num
+        occupancy = [[{} for _ in range(columns)] for _ in range(num)]
+        changes = [[0] * columns for _ in range(num)]
+        def add(p, loc, s, e):
+            s = max(s, start)
+            e = min(e, end)
+            if loc == NO_LOC or s >= e:
+                return
+            # Column index is advanced explicitly (boundaries may be rounded)
+            c = min(int((s - start) // step), columns - 1)
+            while s < e:
+                col_end = e if c >= columns - 1 else min(e, start + (c + 1) * step)
+                if col_end > s:
+                    occ = occupancy[p][c]
+                    occ[loc] = occ.get(loc, 0.0) + col_end - s
+                    s = col_end
+                c += 1
+        offset = self.find_record(bucket * base) * RECORD.size
+        while offset + RECORD.size <= len(self.trace):
+            cycle, p, l = RECORD.unpack_from(self.trace, offset)
+            if cycle >= end:
+                break
+            add(p, cur_loc[p], cur_start[p], cycle)
+            if cycle >= start:
+                changes[p][min(int((cycle - start) // step), columns - 1)] += 1
+            cur_loc[p] = l
+            cur_start[p] = cycle
+            offset += RECORD.size
+        for p in range(num):
+            add(p, cur_loc[p], cur_start[p], min(end, self.end_cycle))
+        return [[(get_dominant(occupancy[p][c])[0], changes[p][c]) for c in range(columns)] for p in range(num)]
+
+    def render_text(self, start, end, columns=80):
+        '''
+        Render range as text (one row per process, one symbol per location).
+            [1] start : start cycle
+            [2] end : end cycle
+            [3] columns : number of columns
+        '''
+        view = self.query(start, end, columns)
+        label = max(len(name) for name in self.procs) if self.procs else 0
+        lines = ["%s C:%s - %s (%s cycle/column)" % (" " * label, start, end, (end - start) / columns)]
+        used = set()
+        for name, row in zip(self.procs, view):
+            text = ""
+            for loc, count in row:
+                if loc == NO_LOC:
+                    text += " "
+                else:
+                    used.add(loc)
+                    text += SYMBOLS[loc % len(SYMBOLS)]
+            lines.append("%-*s |%s|" % (label, name, text))
+        for loc in sorted(used):
+            lines.append("  %s : %s" % (SYMBOLS[loc % len(SYMBOLS)], self.locs[loc]))
+        return "\n".join(lines)
+
+    def get_color(self, loc):
+        h = (loc * 137) % 360
+        return "hsl(%d,60%%,60%%)" % h
+
+    def render_svg(self, start, end, width, path, row_height=20):
+        '''
+        Render range as SVG file.
+            [1] start : start cycle
+            [2] end : end cycle
+            [3] width : width (pixels) of timeline (one column per pixel)
+            [4] path : path of SVG file
+            [5] row_height : height (pixels) of one process
+        '''
+        view = self.query(start, end, width)
+        label = 8 * max(len(name) for name in self.procs) + 10 if self.procs else 0
+        step = (end - start) / width
+        with open(path, "w") as f:
+            f.write('<svg xmlns="http://www.w3.org/2000/svg" width="%d" height="%d" font-family="monospace" font-size="12">\n'
+                    % (label + width, row_height * (len(self.procs) + 1)))
+            f.write('<text x="0" y="%d">C:%s - %s</text>\n' % (row_height - 6, start, end))
+            for y, (name, row) in enumerate(zip(self.procs, view)):
+                top = row_height * (y + 1)
+                f.write('<text x="0" y="%d">%s</text>\n' % (top + row_height - 6, name))
+                x = 0
+                while x < len(row):
+                    loc = row[x][0]
+                    run = x
+                    count = 0
+                    while run < len(row) and row[run][0] == loc:
+                        count += row[run][1]
+                        run += 1
+                    if loc != NO_LOC:
+                        f.write('<rect x="%d" y="%d" width="%d" height="%d" fill="%s"><title>%s C:%s-%s (%d changes)</title></rect>\n'
+                                % (label + x, top + 2, run - x, row_height - 4, self.get_color(loc), self.locs[loc],
+                                   start + x * step, start + run * step, count))
+                    x = run
+            f.write("</svg>\n")
@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+
+''' Diff of two P3S timeline traces
+
+ Two traces (timeline.TraceRecorder, or timeline.convert_log of verbose
+ output) are streamed from disk in cycle order, and location changes of
+ each process are aligned by their sequence number. Only events of the
+ run which is ahead are buffered, so memory is bounded by the skew of
+ the two runs, not by their length.
+ Reported:
+   - first control-flow divergence (a process changes to another location,
+     or one run has more location changes) with the preceding locations
+   - per-transition cycle deltas (time from the location change to the
+     next one, for each from -> to pair of each process)
+   - per-task cycle deltas, decomposed as
+       start offset + sum of transition deltas + tail (or unaligned rest)
+     which adds up to the difference of finished cycles for each process
+
+ Usage:
+   diff = tracediff.TraceDiff("before.trace", "after.trace")
+   diff.run()
+   diff.report()
+'''
+
+import collections
+import mmap
+import os
+
+from P3S import timeline
+
+
+def iter_records(path, chunk_size=1 << 16):
+    '''
+    Read records of trace file.
+    Yield value is (cycle, name of process, name of location)
+        [1] path : path of trace file
+        [2] chunk_size : number of records read at once
+    '''
+    header = timeline.load_header(path)
+    procs = header["procs"]
+    locs = header["locs"]
+    size = os.path.getsize(path)
+    if size == 0:
+        return
+    step = timeline.RECORD.size * chunk_size
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            for offset in range(0, size - size % timeline.RECORD.size, step):
+                for cycle, p, l in timeline.RECORD.iter_unpack(m[offset:min(offset + step, size - size % timeline.RECORD.size)]):
+                    yield (cycle, procs[p], locs[l])
+
+
+class Divergence():
+
+    def __init__(self, proc, index, event_a, event_b, context):
+        '''
+        Constructor of Divergence class.
+            [1] proc : name of process
+            [2] index : sequence number of location change in the process
+            [3] event_a : (cycle, location) of run A (None: no more change)
+            [4] event_b : (cycle, location) of run B (None: no more change)
+            [5] context : list of preceding (location, cycle A, cycle B)
+        '''
+        self.proc = proc
+        self.index = index
+        self.event_a = event_a
+        self.event_b = event_b
+        self.context = context
+
+    def get_cycle(self):
+        return min(e[0] for e in (self.event_a, self.event_b) if e != None)
+
+
+class TraceDiff():
+
+    def __init__(self, path_a, path_b, context=5):
+        '''
+        Constructor of TraceDiff class.
+            [1] path_a : path of trace file of reference run
+            [2] path_b : path of trace file of compared run
+            [3] context : number of preceding locations kept for divergence
+        '''
+        self.paths = (path_a, path_b)
+        self.ends = (timeline.load_header(path_a)["end"], timeline.load_header(path_b)["end"])
+        self.context = context
+        self.divergences = {}   # process : Divergence
+        self.transitions = {}   # (process, from location, to location) : [count, sum of cycle A, sum of cycle B]
+        self.offsets = {}       # process : cycle B - cycle A of first location change
+        self.tails = {}         # process : delta of the rest after last aligned change
+        self.num_of_event = [0, 0]
+
+    def align(self, proc, event_a, event_b, last, recent, index):
+        if event_a[1] != event_b[1]:
+            self.divergences[proc] = Divergence(proc, index[proc], event_a, event_b, list(recent[proc]))
+            return
+        if proc in last:
+            loc, cycle_a, cycle_b = last[proc]
+            stat = self.transitions.setdefault((proc, loc, event_a[1]), [0, 0.0, 0.0])
+            stat[0] += 1
+            stat[1] += event_a[0] - cycle_a
+            stat[2] += event_b[0] - cycle_b
+        else:
+            self.offsets[proc] = event_b[0] - event_a[0]
+        last[proc] = (event_a[1], event_a[0], event_b[0])
+        recent[proc].append(last[proc])
+        index[proc] += 1
+
+    def run(self):
+        '''
+        Align and compare two traces.
+        Return True if control flows of all processes are identical.
+        '''
+        streams = [iter_records(path) for path in self.paths]
+        heads = [next(s, None) for s in streams]
+        pending = collections.defaultdict(lambda: (collections.deque(), collections.deque()))
+        last = {}
+        recent = collections.defaultdict(lambda: collections.deque(maxlen=self.context))
+        index = collections.defaultdict(int)
+        while heads[0] != None or heads[1] != None:
+            # Merge two streams in cycle order
+            if heads[1] == None or (heads[0] != None and heads[0][0] <= heads[1][0]):
+                x = 0
+            else:
+                x = 1
+            cycle, proc, loc = heads[x]
+            heads[x] = next(streams[x], None)
+            self.num_of_event[x] += 1
+            if proc in self.divergences:
+                continue
+            queues = pending[proc]
+            queues[x].append((cycle, loc))
+            while queues[0] and queues[1] and proc not in self.divergences:
+                self.align(proc, queues[0].popleft(), queues[1].popleft(), last, recent, index)
+        for proc, queues in pending.items():
+            if proc not in self.divergences and (queues[0] or queues[1]):
+                event_a = queues[0][0] if queues[0] else None
+                event_b = queues[1][0] if queues[1] else None
+                self.divergences[proc] = Divergence(proc, index[proc], event_a, event_b, list(recent[proc]))
+        for proc in set(self.offsets) | set(self.divergences):
+            if proc in last:
+                _, cycle_a, cycle_b = last[proc]
+            else:
+                cycle_a = cycle_b = 0
+                self.offsets[proc] = 0
+            self.tails[proc] = (self.ends[1] - cycle_b) - (self.ends[0] - cycle_a)
+        return len(self.divergences) == 0
+
+    def get_first_divergence(self):
+        if len(self.divergences) == 0:
+            return None
+        return min(self.divergences.values(), key=lambda d: (d.get_cycle(), d.proc))
+
+    def get_task_deltas(self):
+        '''
+        Get cycle deltas of each process.
+        Return value is dict of process : (start offset, sum of transition deltas, tail)
+        '''
+        deltas = {}
+        for proc in self.tails:
+            trans = sum(s[2] - s[1] for (p, _, _), s in self.transitions.items() if p == proc)
+            deltas[proc] = (self.offsets[proc], trans, self.tails[proc])
+        return deltas
+
+    def report(self, num_of_trans=10):
+        '''
+        Print result of diff.
+            [1] num_of_trans : number of transitions printed (largest deltas first)
+        '''
+        print("Finished cycle: %s -> %s (%+g)" % (self.ends[0], self.ends[1], self.ends[1] - self.ends[0]))
+        print("Location changes: %d -> %d" % tuple(self.num_of_event))
+        first = self.get_first_divergence()
+        if first == None:
+            print("Control flow: identical")
+        else:
+            print("First divergence: %s, change %d" % (first.proc, first.index))
+            for loc, cycle_a, cycle_b in first.context:
+                print("    %-24s C:%s / C:%s" % (loc, cycle_a, cycle_b))
+            for name, event in (("A", first.event_a), ("B", first.event_b)):
+                print("  %s> %s" % (name, ("%-24s C:%s" % (event[1], event[0])) if event else "(no more change)"))
+            if len(self.divergences) > 1:
+                print("  (%d processes diverged)" % len(self.divergences))
+        print("%-16s %12s %12s %12s %12s" % ("Process", "offset", "transitions", "tail", "total"))
+        for proc, (offset, trans, tail) in sorted(self.get_task_deltas().items()):
+            label = tail if proc not in self.divergences else "%g*" % tail
+            print("%-16s %+12g %+12g %12s %+12g" % (proc, offset, trans, label, offset + trans + tail))
+        if self.divergences:
+            print("  (*: rest after divergence)")
+        print("%-16s %-36s %6s %10s %10s %12s" % ("Process", "Transition", "count", "mean A", "mean B", "delta"))
+        items = sorted(self.transitions.items(), key=lambda i: -abs(i[1][2] - i[1][1]))
+        for (proc, src, dst), (count, sum_a, sum_b) in items[:num_of_trans]:
+            print("%-16s %-36s %6d %10.2f %10.2f %+12g" %
+                  (proc, src + " -> " + dst, count, sum_a / count, sum_b / count, sum_b - sum_a))
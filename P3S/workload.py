@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+
+''' Streaming trace-driven workload of P3S models
+
+ Frame arrival times and sizes are streamed from a recorded trace file,
+ so hours of captured traffic can be replayed without loading them all
+ into memory.
+   - text format   : "<arrival time> <size>" per line ('#' is comment),
+                     read in chunks
+   - binary format : records of little-endian int64 arrival time and
+                     uint32 size, memory-mapped
+ TraceSource is a Process which sends (arrival cycle, size) of each frame
+ to a Channel at its arrival cycle. It is run by HW_Model (ex: a network
+ interface), and tasks or HW models receive frames by Trans with the
+ Channel. If the Channel is full, the frame waits (backpressure) or is
+ dropped (b_drop).
+ TraceSource never finishes the simulation. It stays at "EOF" location
+ after the last frame.
+
+ Usage:
+   src = workload.TraceSource("NIC", workload.TraceReader("capture.txt", scale=96), channel)
+   sim.add_hw(p3s.HW_Model("NIC", 96, src))
+'''
+
+import mmap
+import struct
+
+from P3S import p3s
+
+RECORD = struct.Struct("<qI") # arrival time, size
+
+
+class TraceReader():
+
+    def __init__(self, path, scale=1, b_binary=False, chunk_size=1 << 16):
+        '''
+        Constructor of TraceReader class.
+            [1] path : path of trace file
+            [2] scale : cycles per time unit of trace (ex: 96 for usec on 96MHz)
+            [3] b_binary : Whether trace file is binary format
+            [4] chunk_size : bytes read at once (text format)
+        '''
+        self.path = path
+        self.scale = scale
+        self.b_binary = b_binary
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        '''
+        Iterate (arrival cycle, size) of frames.
+        '''
+        records = self.read_binary() if self.b_binary else self.read_text()
+        for time, size in records:
+            yield (int(time * self.scale), size)
+
+    def read_text(self):
+        with open(self.path, "rb") as f:
+            rest = b""
+            while True:
+                chunk = f.read(self.chunk_size)
+                if not chunk:
+                    break
+                lines = (rest + chunk).split(b"\n")
+                rest = lines.pop()
+                for line in lines:
+                    record = self.parse_line(line)
+                    if record:
+                        yield record
+            record = self.parse_line(rest)
+            if record:
+                yield record
+
+    def parse_line(self, line):
+        line = line.split(b"#")[0].split()
+        if len(line) < 2:
+            return None
+        return (float(line[0]), int(line[1]))
+
+    def read_binary(self):
+        with open(self.path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                for offset in range(0, len(m) - RECORD.size + 1, RECORD.size):
+                    yield RECORD.unpack_from(m, offset)
+
+
+def write_trace(path, records, b_binary=False):
+    '''
+    Write trace file.
+        [1] path : path of trace file
+        [2] records : iterable of (arrival time, size)
+        [3] b_binary : Whether trace file is binary format
+    '''
+    with open(path, "wb") as f:
+        for time, size in records:
+            if b_binary:
+                f.write(RECORD.pack(int(time), size))
+            else:
+                f.write(b"%r %d\n" % (time, size))
+
+
+class TransTraceArrival(p3s.Trans):
+    def guard(self, global_cycle):
+        proc = self.proc
+        if proc.pending == None or proc.pending[0] > global_cycle:
+            return False
+        return proc.b_drop or not proc.channel.is_full()
+    def get_next_cycle(self, global_cycle):
+        proc = self.proc
+        if proc.pending == None or proc.pending[0] <= global_cycle:
+            return None
+        return proc.pending[0]
+    def update(self, global_cycle):
+        self.proc.arrive(global_cycle)
+        return False
+
+class TransTraceEnd(p3s.Trans):
+    def guard(self, global_cycle):
+        return self.proc.pending == None
+
+
+class TraceSource(p3s.Process):
+
+    def __init__(self, name, reader, channel, b_drop=False, size_delay=0):
+        '''
+        Constructor of TraceSource class.
+            [1] name : Name of TraceSource class object
+            [2] reader : iterable of (arrival cycle, size) (ex: TraceReader class object)
+            [3] channel : Channel class object to which frames are sent
+            [4] b_drop : Whether frame is dropped if channel is full (False: wait)
+            [5] size_delay : transfer delay cycles per byte (None: Channel link model)
+        '''
+        super().__init__(name)
+        self.records = iter(reader)
+        self.channel = channel
+        self.b_drop = b_drop
+        self.size_delay = size_delay
+        self.num_of_frame = 0
+        self.num_of_drop = 0
+        self.total_size = 0
+        self.pending = next(self.records, None)
+        loc_arrival = p3s.Location("ARRIVAL", False)
+        loc_eof = p3s.Location("EOF", False)
+        loc_arrival.add_trans(TransTraceArrival(self, None, True, loc_arrival, None))
+        loc_arrival.add_trans(TransTraceEnd(self, None, True, loc_eof, None))
+        self.add_location(loc_arrival, True)
+        self.add_location(loc_eof, False)
+
+    def arrive(self, global_cycle):
+        '''
+        Send pending frame to channel, and read next frame.
+            [1] global_cycle : current cycle
+        '''
+        cycle, size = self.pending
+        delay = None if self.size_delay == None else size * self.size_delay
+        if self.channel.send((cycle, size), global_cycle, delay, size):
+            self.num_of_frame += 1
+            self.total_size += size
+        else:
+            self.num_of_drop += 1
+        self.pending = next(self.records, None)
+
+    def report(self):
+        '''
+        Print statistics of this source.
+        '''
+        print("[%s] frames: %d, bytes: %d, dropped: %d" % (self.name, self.num_of_frame, self.total_size, self.num_of_drop))
@@ -38,3 +38,11 @@ MP_UNUSED = MP_MAX # Free size of Memory Pool
 FQ_UNUSED = FQ_MAX # Free size of Frame Queue
 CQ_UNUSED = CQ_MAX # Free size of Cleanup Queue
 
+def reset():
+    '''
+    Reset GLOBAL vars to initial values.
+    '''
+    global MP_UNUSED, FQ_UNUSED, CQ_UNUSED
+    MP_UNUSED = MP_MAX
+    FQ_UNUSED = FQ_MAX
+    CQ_UNUSED = CQ_MAX
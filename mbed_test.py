@@ -203,8 +203,14 @@ class CleanupTask(p3s.Task):
         super().__init__(name, priority)
         self.rest_of_frame = mbed_conf.NUM_OF_FRAME
 
-# main
-if __name__ == "__main__":
+# model
+def build_model():
+    '''
+    Build simulation model.
+    Return value is P3S class object
+    '''
+
+    mbed_conf.reset()
 
     app_task = ApplicationTask("APP_TASK", mbed_conf.APP_TASK_PRIORITY)
     cksm_task = p3s.Task("CKSM_TASK", mbed_conf.CKSM_TASK_PRIORITY)
@@ -279,8 +285,12 @@ if __name__ == "__main__":
     sim = p3s.P3S(1)
     sim.add_cpu(cpu)
 
-    sim.simulate()
+    return sim
 
-    print("Simulation End.")
+# main
+if __name__ == "__main__":
 
+    sim = build_model()
+    sim.simulate()
 
+    print("Simulation End.")
@@ -228,8 +228,14 @@ class TransHwCalc(p3s.Trans):
     def update(self, current_cycle):
         self.channel.send(1, current_cycle, mbed_conf.CH_SEND_DELAY)
 
-# main
-if __name__ == "__main__":
+# model
+def build_model():
+    '''
+    Build simulation model.
+    Return value is P3S class object
+    '''
+
+    mbed_conf.reset()
 
     app_task = ApplicationTask("APP_TASK", mbed_conf.APP_TASK_PRIORITY)
     cksm_task = p3s.Task("CKSM_TASK", mbed_conf.CKSM_TASK_PRIORITY)
@@ -329,8 +335,12 @@ if __name__ == "__main__":
     sim.add_cpu(cpu)
     sim.add_hw(cksm_hw)
 
-    sim.simulate()
+    return sim
 
-    print("Simulation End.")
+# main
+if __name__ == "__main__":
 
+    sim = build_model()
+    sim.simulate()
 
+    print("Simulation End.")
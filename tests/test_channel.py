@@ -0,0 +1,72 @@
+import pytest
+
+from P3S import p3s
+
+
+def test_fifo_order_and_backpressure():
+    ch = p3s.Channel("CH", depth=2)
+    assert ch.send("a", 0, 0)
+    assert ch.send("b", 0, 0)
+    assert ch.is_full()
+    assert not ch.send("c", 0, 0)
+    sender = p3s.Trans(p3s.Process("SRC"), ch, True, None, None)
+    assert not sender.guard(0)
+    assert ch.recv() == "a"
+    assert sender.guard(0)
+    assert ch.recv() == "b"
+    assert ch.recv() is None
+
+def test_transfers_are_serialized_on_link():
+    ch = p3s.Channel("LINK", depth=4, bandwidth=4, latency=3)
+    assert ch.get_transfer_delay(8) == 5
+    ch.send("a", 0, size=8)
+    ch.send("b", 1, size=4)
+    # "b" waits until "a" leaves the link at cycle 2
+    assert [arrival for _, arrival in ch.get_fifo()] == [5, 6]
+    assert not ch.is_arrived(4)
+    assert ch.is_arrived(5)
+    # Explicit delay bypasses the link model
+    ch.send("c", 1, delay=1)
+    assert ch.get_fifo()[-1][1] == 2
+
+def test_broadcast_to_receivers():
+    ch = p3s.Channel("BC", depth=1)
+    rx1 = p3s.Process("RX1")
+    rx2 = p3s.Process("RX2")
+    ch.add_receiver(rx1)
+    ch.add_receiver(rx2)
+    ch.send("x", 0, 0)
+    assert ch.recv(rx1) == "x"
+    # Slowest receiver keeps the channel full
+    assert ch.is_full()
+    assert ch.is_arrived(0, rx2)
+    assert ch.recv(rx2) == "x"
+    assert not ch.is_full()
+
+def test_unknown_receiver_of_broadcast():
+    ch = p3s.Channel("BC", depth=2)
+    rx1 = p3s.Process("RX1")
+    ch.add_receiver(rx1)
+    ch.send("x", 0, 0)
+    # Only one FIFO: receiver can be omitted
+    assert ch.is_arrived(0)
+    ch.add_receiver(p3s.Process("RX2"))
+    with pytest.raises(ValueError):
+        ch.recv()
+    with pytest.raises(ValueError):
+        ch.recv(p3s.Process("RX3"))
+
+def test_guard_follows_added_receiver():
+    ch = p3s.Channel("BC", depth=2)
+    rx = p3s.Process("RX")
+    recv = p3s.Trans(rx, ch, False, None, None)
+    ch.send("x", 0, 0)
+    assert recv.guard(0)
+    # FIFO cached by the guard is dropped when receivers are added
+    ch.add_receiver(rx)
+    ch.add_receiver(p3s.Process("RX2"))
+    assert not recv.guard(0)
+    ch.send("y", 1, 0)
+    assert recv.guard(1)
+    assert ch.recv(rx) == "y"
+    assert not recv.guard(1)
@@ -0,0 +1,34 @@
+from P3S import codegen
+from P3S import equiv
+from P3S import p3s
+
+
+class TransCounter(p3s.Observer):
+
+    def __init__(self):
+        self.num = 0
+
+    def trans_started(self, proc, global_cycle):
+        self.num += 1
+
+
+def run(build, b_codegen, observer=None):
+    sim = build()
+    sim.b_verbose = False
+    if b_codegen:
+        codegen.compile_model(sim)
+    if observer:
+        sim.add_observer(observer)
+    return sim.simulate(100000)
+
+def test_codegen_without_observers():
+    for seed in range(20):
+        build = equiv.generate_model(seed)
+        assert run(build, True) == run(build, False)
+
+def test_observer_added_after_compile():
+    build = equiv.generate_model(0)
+    generic = TransCounter()
+    compiled = TransCounter()
+    assert run(build, True, compiled) == run(build, False, generic)
+    assert compiled.num == generic.num > 0
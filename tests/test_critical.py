@@ -0,0 +1,18 @@
+import mbed_conf
+import mbed_x2_test
+from P3S import critical
+
+
+def test_critical_path_has_no_slack():
+    mbed_conf.reset()
+    sim = mbed_x2_test.build_model()
+    sim.b_verbose = False
+    recorder = critical.CriticalPathRecorder()
+    sim.add_observer(recorder)
+    sim.simulate()
+    path = recorder.analyze()
+    assert path[-1][0].end == recorder.finish_cycle
+    # Gaps on the path (channel latency, scheduling wait) are not slack
+    assert any(node.start > prev.end for (prev, k), (node, _) in zip(path, path[1:]))
+    assert all(node.slack == 0 for node, kind in path)
+    assert all(node.slack >= 0 for node in recorder.nodes)
@@ -0,0 +1,140 @@
+import pytest
+
+from P3S import explore
+from P3S import p3s
+from P3S import session
+from P3S import store
+from P3S import workload
+
+
+class TransRecv(p3s.Trans):
+    def sync(self):
+        self.channel.recv()
+
+def build_model(num_of_frame):
+    sim = p3s.P3S(1)
+    sim.b_verbose = False
+    channel = p3s.Channel("NIC_RX", 4)
+    src = workload.TraceSource("NIC", [(0, 64), (100, 64), (200, 64)], channel)
+    sink = p3s.Process("SINK")
+    locs = [p3s.Location("RECV%d" % x, False) for x in range(num_of_frame)]
+    locs.append(p3s.Location("END", True))
+    for x, loc in enumerate(locs[:-1]):
+        loc.add_trans(TransRecv(sink, channel, False, locs[x + 1], None))
+    for x, loc in enumerate(locs):
+        sink.add_location(loc, x == 0)
+    sim.add_hw(p3s.HW_Model("NIC", 100, src))
+    sim.add_hw(p3s.HW_Model("SINK", 100, sink))
+    return sim, src
+
+def test_trace_source_is_not_deadlock():
+    sim, src = build_model(3)
+    sim.simulate()
+    assert src.num_of_frame == 3
+    assert sim.finish_cycle >= 200
+
+def test_deadlock_after_last_frame():
+    sim, _ = build_model(4)
+    with pytest.raises(p3s.DeadlockError) as error:
+        sim.simulate()
+    assert error.value.kind == "deadlock"
+    assert error.value.cycle >= 200
+
+def test_drivers_record_deadlock():
+    explorer = explore.Explorer(lambda: build_model(4)[0])
+    assert explorer.explore() == None
+    assert explorer.num_of_unfinished == 1
+    assert explorer.num_of_deadlock == 1
+    result = store.run_point(lambda: build_model(4)[0], None, {})
+    assert result["finish"] == None
+    assert result["deadlock"] == "deadlock"
+
+def test_session_stops_on_deadlock():
+    sim, _ = build_model(4)
+    s = session.Session(sim, 1000)
+    slices = list(s)
+    assert slices[-1].reason == "deadlock"
+    assert s.error.cycle >= 200
+    assert any(kind == "location" for _, kind, _, _ in slices[-1].events)
+    assert s.recorder not in sim.observers
+
+def test_session_detaches_recorder_on_error():
+    sim, _ = build_model(3)
+    def fail(sim):
+        raise RuntimeError("metrics")
+    s = session.Session(sim, 50, metrics=fail)
+    with pytest.raises(RuntimeError):
+        s.next_slice()
+    assert s.reason == "error"
+    assert s.recorder not in sim.observers
+    assert s.next_slice() == None
+
+def test_wait_for_graph_of_channel_cycle():
+    sim = p3s.P3S(1)
+    sim.b_verbose = False
+    a2b = p3s.Channel("A2B")
+    b2a = p3s.Channel("B2A")
+    for name, rx, tx in (("A", b2a, a2b), ("B", a2b, b2a)):
+        proc = p3s.Process(name)
+        loc_wait = p3s.Location(name + "_WAIT", False)
+        loc_send = p3s.Location(name + "_SEND", False)
+        loc_wait.add_trans(TransRecv(proc, rx, False, loc_send, None))
+        loc_send.add_trans(p3s.Trans(proc, tx, True, loc_wait, None))
+        proc.add_location(loc_wait, True)
+        proc.add_location(loc_send, False)
+        sim.add_hw(p3s.HW_Model(name, 100, proc))
+    with pytest.raises(p3s.DeadlockError) as error:
+        sim.simulate(1000)
+    assert error.value.cycle == 1
+    assert ("A", "HW@A_WAIT", "recv B2A", ["B"]) in error.value.graph
+    assert ("B", "HW@B_WAIT", "recv A2B", ["A"]) in error.value.graph
+
+class TransSpin(p3s.Trans):
+    def get_delay(self):
+        return 1
+
+def test_livelock_without_progress():
+    sim = p3s.P3S(1)
+    sim.b_verbose = False
+    sim.stall_cycle = 50
+    sim.progress = "TransDone"
+    proc = p3s.Process("POLL")
+    loc = p3s.Location("POLL", False)
+    loc.add_trans(TransSpin(proc, None, False, loc, None))
+    proc.add_location(loc, True)
+    sim.add_hw(p3s.HW_Model("POLL", 100, proc))
+    with pytest.raises(p3s.DeadlockError) as error:
+        sim.simulate(1000)
+    assert error.value.kind == "livelock"
+    assert error.value.cycle == 50
+
+class TransTimer(p3s.Trans):
+    b_time_guard = True
+    def guard(self, global_cycle):
+        return global_cycle >= 50
+
+class TransUntimed(p3s.Trans):
+    def guard(self, global_cycle):
+        return global_cycle >= 50
+
+def run_timer(trans_class):
+    sim = p3s.P3S(1)
+    sim.b_verbose = False
+    proc = p3s.Process("TIMER")
+    loc_wait = p3s.Location("WAIT", False)
+    loc_end = p3s.Location("END", True)
+    loc_wait.add_trans(trans_class(proc, None, False, loc_end, None))
+    proc.add_location(loc_wait, True)
+    proc.add_location(loc_end, False)
+    sim.add_hw(p3s.HW_Model("TIMER", 100, proc))
+    sim.simulate(1000)
+    return sim
+
+def test_time_guard_is_not_deadlock():
+    assert run_timer(TransTimer).finish_cycle >= 50
+
+def test_guard_is_not_time_dependent_by_default():
+    with pytest.raises(p3s.DeadlockError) as error:
+        run_timer(TransUntimed)
+    assert error.value.kind == "deadlock"
+    assert error.value.cycle < 50
@@ -0,0 +1,94 @@
+from P3S import p3s
+
+
+class TransWork(p3s.Trans):
+    def __init__(self, proc, to_location, delay):
+        super().__init__(proc, None, False, to_location, None)
+        self.delay = delay
+    def get_delay(self):
+        return self.delay
+
+class TransFire(p3s.Trans):
+    def __init__(self, proc, channels, to_location, delay):
+        super().__init__(proc, None, True, to_location, None)
+        self.channels = channels
+        self.delay = delay
+    def get_delay(self):
+        return self.delay
+    def update(self, global_cycle):
+        for channel in self.channels:
+            channel.send(1, global_cycle, 0)
+        return False
+
+class TransHandle(TransWork):
+    def sync(self):
+        self.channel.recv()
+    def update(self, global_cycle):
+        self.proc.b_finished = True
+        return False
+
+
+def run_model(priorities, tail_chain_cycle=None, fire_cycle=10, tail_chain=None):
+    '''
+    Task of 200 cycles preempted by ISRs (entry 12, body 20, exit 10)
+    which become pending at fire_cycle.
+    '''
+    sim = p3s.P3S(1)
+    sim.b_verbose = False
+    cpu = p3s.CPU_Model("CPU", 100, tail_chain_cycle)
+    task = p3s.Task("MAIN", 1)
+    loc_run = p3s.Location("RUN", False)
+    loc_end = p3s.Location("END", True)
+    loc_run.add_trans(TransWork(task, loc_end, 200))
+    task.add_location(loc_run, True)
+    task.add_location(loc_end, False)
+    cpu.add_task(task)
+    channels = []
+    for priority in priorities:
+        channel = p3s.Channel("IRQ%d" % priority)
+        isr = p3s.ISR("ISR%d" % priority, priority, 12, 10)
+        loc = p3s.Location("ISR%d_INIT" % priority, False)
+        handle = TransHandle(isr, loc, 20)
+        handle.channel = channel
+        loc.add_trans(handle)
+        isr.add_location(loc, True)
+        cpu.add_isr(isr)
+        channels.append(channel)
+    hw = p3s.Process("TIMER")
+    loc_wait = p3s.Location("WAIT", False)
+    loc_done = p3s.Location("DONE", False)
+    loc_wait.add_trans(TransFire(hw, channels, loc_done, fire_cycle))
+    hw.add_location(loc_wait, True)
+    hw.add_location(loc_done, False)
+    sim.add_hw(p3s.HW_Model("TIMER", 100, hw))
+    sim.add_cpu(cpu)
+    cpu.tail_chain = tail_chain
+    sim.simulate()
+    return cpu, dict((isr.name, isr) for isr in cpu.isrs)
+
+def test_entry_and_exit_cost():
+    cpu, isrs = run_model([5])
+    isr = isrs["ISR5"]
+    assert (isr.latency_hist.min, isr.latency_hist.max) == (12, 12)
+    assert (isr.exec_hist.min, isr.exec_hist.max) == (20, 20)
+    assert cpu.cycle == 200 + 12 + 20 + 10
+
+def test_back_to_back_without_tail_chaining():
+    cpu, isrs = run_model([5, 3])
+    assert isrs["ISR3"].latency_hist.min == 12 + 20 + 10 + 12
+    assert cpu.cycle == 200 + 2 * (12 + 20 + 10)
+
+def test_tail_chaining():
+    cpu, isrs = run_model([5, 3], tail_chain_cycle=6)
+    assert isrs["ISR5"].latency_hist.min == 12
+    assert isrs["ISR3"].latency_hist.min == 12 + 20 + 6
+    assert cpu.cycle == 200 + 12 + 20 + 6 + 20 + 10
+
+def test_tail_chain_is_dropped_if_not_entered_at_once():
+    # ISR which was pending at return does not enter: exit cost is paid,
+    # and the later ISR is not charged as tail-chained
+    stale = p3s.ISR("STALE", 9, 12, 10)
+    cpu, isrs = run_model([5], tail_chain_cycle=6, fire_cycle=50, tail_chain=(stale, 10))
+    assert cpu.tail_chain == None
+    assert isrs["ISR5"].latency_hist.min == 12
+    assert cpu.cycle == 10 + 200 + 12 + 20 + 10
@@ -0,0 +1,22 @@
+from P3S import define_p3s
+from P3S import p3s
+
+
+def test_priority_push_back_keeps_order():
+    bus = p3s.Resource("BUS", 1, define_p3s.ArbitrationPolicy.PRIORITY)
+    low = [p3s.Task(name, 0) for name in "ABCD"]
+    for task in low:
+        task.rest_trans_cycle = bus.reserve(task, 0, 0, 4)
+    bus.reserve(p3s.Task("H", 5), 1, 0, 4)
+    slots = [(r[0].name, r[3], r[4]) for r in bus.reservations]
+    assert slots == [("A", 0, 4), ("H", 4, 8), ("B", 8, 12), ("C", 12, 16), ("D", 16, 20)]
+    # Pushed-back transitions finish at the end of their new slots
+    assert [t.rest_trans_cycle for t in low[1:]] == [12, 16, 20]
+    assert bus.wait_cycle == (4 + 8 + 12) + 3 + 3 * 4
+    assert bus.max_wait_cycle == 16
+
+def test_fifo_no_overlap():
+    bus = p3s.Resource("BUS", 2)
+    for x in range(4):
+        bus.reserve(p3s.Task("T%d" % x, x), 0, 0, 4)
+    assert [(r[3], r[4]) for r in bus.reservations] == [(0, 2), (2, 4), (4, 6), (6, 8)]
@@ -0,0 +1,46 @@
+from P3S import equiv
+from P3S import p3s
+from P3S import sampling
+
+
+class TransWait(p3s.Trans):
+
+    def get_delay(self):
+        return 1000
+
+
+def skip_idle(sim):
+    sim.b_skip_idle = True
+
+def build_wait():
+    sim = p3s.P3S(1)
+    sim.b_verbose = False
+    proc = p3s.Process("HW")
+    loc_start = p3s.Location("START", False)
+    loc_end = p3s.Location("END", True)
+    loc_start.add_trans(TransWait(proc, None, False, loc_end, None))
+    proc.add_location(loc_start, True)
+    proc.add_location(loc_end, False)
+    sim.add_hw(p3s.HW_Model("HW", 100, proc))
+    return sim
+
+def test_skip_is_equivalent():
+    assert equiv.fuzz(30, engine_a="generic", engine_b=skip_idle, b_verbose=False) == []
+
+def test_skip_steps_without_event():
+    finish_cycle = build_wait().simulate()
+    sim = build_wait()
+    steps = []
+    step = sim.step
+    sim.step = lambda: steps.append(None) or step()
+    skip_idle(sim)
+    assert sim.simulate() == finish_cycle == 1000
+    assert len(steps) < 10
+
+def test_functional_delays_are_rounded():
+    sim = equiv.generate_model(3)()
+    sim.b_verbose = False
+    sampler = sampling.SampledSimulation(sim, "TransWork", period=10, warmup=1, window=2, ff_scale=0.3)
+    assert sampler.simulate(100000) > 0
+    assert isinstance(sim.finish_cycle, int)
+    assert not sim.b_skip_idle and not sim.b_round_delay
@@ -0,0 +1,20 @@
+from P3S import stats
+
+
+def test_percentile_is_in_bin():
+    hist = stats.Histogram("H", 1)
+    assert hist.percentile(50) == 0
+    for value in (5, 5, 5, 10):
+        hist.add(value)
+    assert hist.percentile(50) == 5
+    assert hist.percentile(90) == 10
+    assert isinstance(hist.percentile(50), int)
+
+def test_percentile_of_wide_bins():
+    hist = stats.Histogram("H", 10)
+    for value in (3, 12, 17, 25):
+        hist.add(value)
+    # Lower bound of the bin, not less than min
+    assert hist.percentile(25) == 3
+    assert hist.percentile(50) == 10
+    assert hist.percentile(100) == 20
@@ -0,0 +1,46 @@
+import os
+
+import mbed_conf
+import mbed_x2_test
+from P3S import timeline
+
+
+def make_trace(tmp_path):
+    mbed_conf.reset()
+    path = str(tmp_path / "run.trace")
+    sim = mbed_x2_test.build_model()
+    sim.b_verbose = False
+    recorder = timeline.TraceRecorder(path)
+    sim.add_observer(recorder)
+    sim.simulate()
+    recorder.close(sim.finish_cycle)
+    timeline.build_summaries(path)
+    return path
+
+def test_sub_cycle_zoom(tmp_path):
+    path = make_trace(tmp_path)
+    view = timeline.Timeline(path)
+    try:
+        text = view.render_text(0, 50, 200)
+        assert len(text.splitlines()) >= len(view.procs)
+        view.render_svg(0, view.end_cycle, 800, str(tmp_path / "run.svg"))
+        assert os.path.getsize(str(tmp_path / "run.svg")) > 0
+        # Occupancy of every column is covered at sub-cycle resolution
+        rows = view.query(0, view.end_cycle, 800)
+        assert all(len(row) == 800 for row in rows)
+    finally:
+        view.close()
+
+def test_summary_not_larger_than_trace(tmp_path):
+    path = make_trace(tmp_path)
+    assert os.path.getsize(path + ".lod0") <= os.path.getsize(path)
+
+def test_summary_matches_raw(tmp_path):
+    path = make_trace(tmp_path)
+    view = timeline.Timeline(path)
+    try:
+        columns = int(view.end_cycle // view.widths[0])
+        end = columns * view.widths[0]
+        assert view.query(0, end, columns) == view.query_raw(0, end, columns)
+    finally:
+        view.close()